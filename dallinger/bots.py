@@ -1,19 +1,24 @@
 """Bots."""
 
+import atexit
 import json
 import logging
 import random
 import uuid
+from timeit import default_timer
 
 from cached_property import cached_property
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from six.moves import urllib
 import gevent
+import gevent.lock
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
 logger = logging.getLogger(__file__)
@@ -30,6 +35,150 @@ CAPABILITY_MAP = {
 }
 
 
+# Bots in the same process share one pool of keep-alive connections.
+HTTP_POOL_SIZE = 100
+_http_session = None
+
+
+def http_session():
+    """Return the requests session shared by the bots in this process."""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _http_session = session
+    return _http_session
+
+
+def create_driver(driver_type, driver_url=None):
+    """Start a Selenium WebDriver of the given type, locally or on the
+    Selenium server at ``driver_url``.
+    """
+    driver = None
+    if driver_url:
+        capabilities = CAPABILITY_MAP.get(driver_type.lower())
+        if capabilities is None:
+            raise ValueError(
+                "Unsupported remote webdriver_type: {}".format(driver_type)
+            )
+        driver = webdriver.Remote(
+            desired_capabilities=capabilities, command_executor=driver_url
+        )
+    else:
+        driver_class = DRIVER_MAP.get(driver_type.lower())
+        if driver_class is not None:
+            driver = driver_class()
+
+    if driver is None:
+        raise ValueError("Unsupported webdriver_type: {}".format(driver_type))
+
+    driver.set_window_size(1024, 768)
+    logger.info("Created {} webdriver.".format(driver_type))
+    return driver
+
+
+class DriverPool(object):
+    """Warm webdrivers shared by the bots in a worker process.
+
+    At most ``size`` drivers are in use at once; further bots wait for one to
+    be released. Released drivers are reset (extra windows closed, storage
+    and cookies cleared) and kept for the next bot. Drivers which fail a
+    health check, or can't be reset, are quit and replaced.
+    """
+
+    def __init__(self, size, driver_type, driver_url=None):
+        self.size = size
+        self.driver_type = driver_type
+        self.driver_url = driver_url
+        self.idle = []
+        self.slots = gevent.lock.BoundedSemaphore(size)
+
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            while self.idle:
+                driver = self.idle.pop()
+                if self.is_healthy(driver):
+                    return driver
+                self.discard(driver)
+            return create_driver(self.driver_type, self.driver_url)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, driver):
+        try:
+            self.reset(driver)
+        except WebDriverException:
+            logger.warning("Could not reset webdriver, discarding it.")
+            self.discard(driver)
+        else:
+            self.idle.append(driver)
+        finally:
+            self.slots.release()
+
+    def is_healthy(self, driver):
+        try:
+            driver.current_url
+        except WebDriverException:
+            return False
+        return True
+
+    def reset(self, driver):
+        """Return a driver to the state of a new one."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.execute_script(
+            "try { window.localStorage.clear(); window.sessionStorage.clear(); }"
+            " catch (e) {}"
+        )
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+        driver.set_window_size(1024, 768)
+
+    def discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            logger.exception("Error quitting webdriver.")
+
+    def close(self):
+        """Quit every idle driver."""
+        while self.idle:
+            self.discard(self.idle.pop())
+
+
+_driver_pool = None
+
+
+def driver_pool():
+    """Return the process's :class:`DriverPool`, or None if the
+    ``webdriver_pool_size`` configuration value doesn't enable pooling.
+    """
+    global _driver_pool
+    if _driver_pool is None:
+        from dallinger.config import get_config
+
+        config = get_config()
+        if not config.ready:
+            config.load()
+        size = config.get("webdriver_pool_size", 0)
+        if size < 1:
+            return None
+        _driver_pool = DriverPool(
+            size, config.get("webdriver_type"), config.get("webdriver_url", None)
+        )
+        atexit.register(_driver_pool.close)
+    return _driver_pool
+
+
 class BotBase(object):
     """A base class for bots that works with the built-in demos.
 
@@ -67,36 +216,32 @@ class BotBase(object):
     @cached_property
     def driver(self):
         """Returns a Selenium WebDriver instance of the type requested in the
-        configuration."""
+        configuration. If ``webdriver_pool_size`` is set, the driver comes
+        from a pool of warm drivers shared with the other bots in this
+        process."""
+        pool = driver_pool()
+        if pool is not None:
+            return pool.acquire()
+
         from dallinger.config import get_config
 
         config = get_config()
         if not config.ready:
             config.load()
-        driver_url = config.get("webdriver_url", None)
-        driver_type = config.get("webdriver_type")
-        driver = None
-
-        if driver_url:
-            capabilities = CAPABILITY_MAP.get(driver_type.lower())
-            if capabilities is None:
-                raise ValueError(
-                    "Unsupported remote webdriver_type: {}".format(driver_type)
-                )
-            driver = webdriver.Remote(
-                desired_capabilities=capabilities, command_executor=driver_url
-            )
-        else:
-            driver_class = DRIVER_MAP.get(driver_type.lower())
-            if driver_class is not None:
-                driver = driver_class()
+        return create_driver(
+            config.get("webdriver_type"), config.get("webdriver_url", None)
+        )
 
-        if driver is None:
-            raise ValueError("Unsupported webdriver_type: {}".format(driver_type))
-
-        driver.set_window_size(1024, 768)
-        logger.info("Created {} webdriver.".format(driver_type))
-        return driver
+    def release_driver(self):
+        """Return the driver to the pool, or quit it if drivers aren't pooled."""
+        if "driver" not in self.__dict__:
+            return
+        driver = self.__dict__.pop("driver")
+        pool = driver_pool()
+        if pool is None:
+            driver.quit()
+        else:
+            pool.release(driver)
 
     def sign_up(self):
         """Accept HIT, give consent and start experiment.
@@ -194,19 +339,48 @@ class BotBase(object):
             else:
                 self.complete_experiment("worker_failed")
         finally:
-            self.driver.quit()
+            self.release_driver()
 
 
 class HighPerformanceBotBase(BotBase):
     """A base class for bots that do not interact using a real browser.
 
     Instead, this kind of bot makes requests directly to the experiment server.
+    Requests share a pool of keep-alive connections with the other bots in
+    the same process. Failed requests are retried after an exponentially
+    growing, randomized delay, until the bot's retry budget is spent.
     """
 
+    #: Seconds to wait before retrying a failed request for the first time.
+    #: The delay doubles with each consecutive failure.
+    retry_delay = 1.0
+
+    #: The longest delay, in seconds, between retries.
+    max_retry_delay = 30.0
+
+    #: Delays are randomized by up to this fraction in either direction, so
+    #: that bots which fail together don't retry together.
+    retry_jitter = 0.5
+
+    #: The total number of retries a bot may make before giving up.
+    retry_budget = 50
+
+    #: Seconds to wait for the experiment server to respond.
+    request_timeout = 30.0
+
+    retries_used = 0
+
+    #: Set by ``dallinger load_test`` to collect the timing of every request.
+    stats = None
+
     @property
     def driver(self):
         raise NotImplementedError
 
+    @property
+    def session(self):
+        return http_session()
+
     @property
     def host(self):
         parsed = urllib.parse.urlparse(self.URL)
@@ -230,29 +404,22 @@ class HighPerformanceBotBase(BotBase):
         """
         self.log("Bot player signing up.")
         self.subscribe_to_quorum_channel()
+        attempt = 0
         while True:
             url = (
-                "{host}/participant/{self.worker_id}/"
+                "/participant/{self.worker_id}/"
                 "{self.hit_id}/{self.assignment_id}/"
                 "debug?fingerprint_hash={hash}&recruiter=bots:{bot_name}".format(
-                    host=self.host,
-                    self=self,
-                    hash=uuid.uuid4().hex,
-                    bot_name=self.__class__.__name__,
+                    self=self, hash=uuid.uuid4().hex, bot_name=self.__class__.__name__
                 )
             )
-            try:
-                result = requests.post(url)
-                result.raise_for_status()
-            except RequestException:
-                self.stochastic_sleep()
-                continue
-
-            if result.json()["status"] == "error":
-                self.stochastic_sleep()
+            data = self.post_json(url)
+            if data["status"] == "error":
+                self.retry(attempt, RequestException(data.get("message", "")))
+                attempt += 1
                 continue
 
-            self.on_signup(result.json())
+            self.on_signup(data)
             return True
 
     def sign_off(self):
@@ -270,21 +437,61 @@ class HighPerformanceBotBase(BotBase):
         or /worker_failed endpoints.
         """
         self.log("Bot player completing experiment. Status: {}".format(status))
+        url = "/{status}?participant_id={participant_id}".format(
+            participant_id=self.participant_id, status=status
+        )
+        return self.request("GET", url)
+
+    def request(self, method, url, **kwargs):
+        """Make a request to the experiment server, retrying on failure.
+
+        ``url`` may be a path on the experiment server. Returns the response,
+        or raises the last error once the retry budget is spent.
+        """
+        if url.startswith("/"):
+            url = self.host + url
+        kwargs.setdefault("timeout", self.request_timeout)
+        attempt = 0
         while True:
-            url = "{host}/{status}?participant_id={participant_id}".format(
-                host=self.host, participant_id=self.participant_id, status=status
-            )
+            started = default_timer()
             try:
-                result = requests.get(url)
-                result.raise_for_status()
-            except RequestException:
-                self.stochastic_sleep()
+                response = self.session.request(method, url, **kwargs)
+                response.raise_for_status()
+            except RequestException as error:
+                if self.stats is not None:
+                    self.stats.record(method, url, default_timer() - started, False)
+                self.retry(attempt, error)
+                attempt += 1
                 continue
-            return result
+            if self.stats is not None:
+                self.stats.record(method, url, default_timer() - started)
+            return response
+
+    def get_json(self, url, **kwargs):
+        """GET ``url`` and return its decoded JSON body."""
+        return self.request("GET", url, **kwargs).json()
+
+    def post_json(self, url, data=None, **kwargs):
+        """POST ``data`` to ``url`` and return the decoded JSON response."""
+        return self.request("POST", url, data=data, **kwargs).json()
+
+    def retry(self, attempt, error):
+        """Wait before retrying after ``attempt`` consecutive failures, or
+        raise ``error`` if the retry budget is spent.
+        """
+        if self.retries_used >= self.retry_budget:
+            self.log("Retry budget spent, giving up: {!r}".format(error))
+            raise error
+        self.retries_used += 1
+        self.stochastic_sleep(attempt)
+
+    def retry_wait(self, attempt):
+        """Return the randomized backoff delay for a retry."""
+        delay = min(self.retry_delay * 2 ** attempt, self.max_retry_delay)
+        return delay * random.uniform(1 - self.retry_jitter, 1 + self.retry_jitter)
 
-    def stochastic_sleep(self):
-        delay = max(1.0 / random.expovariate(0.5), 10.0)
-        gevent.sleep(delay)
+    def stochastic_sleep(self, attempt=0):
+        gevent.sleep(self.retry_wait(attempt))
 
     def subscribe_to_quorum_channel(self):
         """In case the experiment enforces a quorum, listen for notifications
@@ -308,19 +515,26 @@ class HighPerformanceBotBase(BotBase):
 
         Answers the questions in the base questionnaire.
         """
-        while True:
-            data = {
-                "question": "questionnaire",
-                "number": 1,
-                "response": json.dumps(self.question_responses),
-            }
-            url = "{host}/question/{self.participant_id}".format(
-                host=self.host, self=self
-            )
-            try:
-                result = requests.post(url, data=data)
-                result.raise_for_status()
-            except RequestException:
-                self.stochastic_sleep()
-                continue
-            return True
+        data = {
+            "question": "questionnaire",
+            "number": 1,
+            "response": json.dumps(self.question_responses),
+        }
+        self.request("POST", "/question/{}".format(self.participant_id), data=data)
+        return True
+
+
+def run_bots(bots):
+    """Run several bots concurrently, each in its own greenlet.
+
+    :class:`~dallinger.recruiters.BotRecruiter` uses this to run a batch of
+    bots from a single rq job. Failures are logged for every bot, and the
+    first one is re-raised once all the bots have finished.
+    """
+    greenlets = [gevent.spawn(bot.run_experiment) for bot in bots]
+    gevent.joinall(greenlets)
+    failures = [g.exception for g in greenlets if not g.successful()]
+    for exception in failures:
+        logger.error("Bot failed: {!r}".format(exception))
+    if failures:
+        raise failures[0]
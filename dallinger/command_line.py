@@ -19,6 +19,7 @@ import time
 import webbrowser
 
 import click
+import redis
 import requests
 from rq import Worker, Connection
 
@@ -706,10 +707,55 @@ def awaken(app, databaseurl):
 @click.option("--app", default=None, callback=verify_id, help="Experiment id")
 @click.option("--local", is_flag=True, flag_value=True, help="Export local data")
 @click.option("--no-scrub", is_flag=True, flag_value=True, help="Scrub PII")
-def export(app, local, no_scrub):
+@click.option(
+    "--parquet", is_flag=True, flag_value=True, help="Also export Parquet files"
+)
+@click.option(
+    "--since",
+    default=None,
+    type=click.Path(exists=True),
+    help="Only export what changed since this earlier export",
+)
+@click.option(
+    "--network", type=int, multiple=True, help="Only export this network (repeatable)"
+)
+@click.option("--network-role", default=None, help="Only export networks in this role")
+@click.option(
+    "--participant-status",
+    multiple=True,
+    help="Only export participants with this status (repeatable)",
+)
+@click.option("--start", default=None, help="Only export what happened from this time")
+@click.option("--end", default=None, help="Only export what happened until this time")
+def export(
+    app,
+    local,
+    no_scrub,
+    parquet,
+    since,
+    network,
+    network_role,
+    participant_status,
+    start,
+    end,
+):
     """Export the data."""
     log(header, chevrons=False)
-    data.export(str(app), local=local, scrub_pii=(not no_scrub))
+    subset = data.ExportFilter(
+        network_ids=network,
+        network_role=network_role,
+        participant_status=participant_status,
+        start=start,
+        end=end,
+    )
+    data.export(
+        str(app),
+        local=local,
+        scrub_pii=(not no_scrub),
+        parquet=parquet,
+        since=since,
+        subset=subset or None,
+    )
 
 
 @dallinger.command()
@@ -795,6 +841,102 @@ def bot(app, debug):
     bot.run_experiment()
 
 
+def verify_positive(ctx, param, value):
+    if value is not None and not value > 0:
+        raise click.BadParameter("must be greater than 0")
+    return value
+
+
+@dallinger.command()
+@click.option("--app", default=None, help="Experiment id")
+@click.option("--debug", default=None, help="Local debug server url")
+@click.option("--bots", default=100, type=int, help="Number of bots to run")
+@click.option(
+    "--rate",
+    default=None,
+    type=float,
+    help="Bots started per second, on average (default: all at once)",
+)
+@click.option(
+    "--trace",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Replay the traffic recorded in an exported data zip instead of bots",
+)
+@click.option(
+    "--speed",
+    default=1.0,
+    type=float,
+    callback=verify_positive,
+    help="Time compression of a --trace replay",
+)
+def load_test(app, debug, bots, rate, trace, speed):
+    """Run many HTTP bots from this process and report server latencies."""
+    from dallinger import loadtest
+    from dallinger.bots import HighPerformanceBotBase
+
+    if not loadtest.io_patched():
+        # Too late to patch network I/O in this process, requests and ssl
+        # have been imported already
+        if "load_test" not in sys.argv:
+            raise click.UsageError("Start load tests with dallinger_load_test.")
+        args = sys.argv[sys.argv.index("load_test") + 1 :]
+        loadtest.relaunch_with_patched_io(args)
+    if debug is None:
+        verify_id(None, None, app)
+    base_url = debug.rstrip("/") if debug else HerokuApp(dallinger_uid=app).url
+
+    if trace:
+        log("Replaying {} against {} at {}x speed...".format(trace, base_url, speed))
+        stats = loadtest.replay_trace(loadtest.load_trace(trace), base_url, speed)
+        click.echo(format_load_test(stats.summary()))
+        return
+
+    setup_experiment(log)
+    from dallinger_experiment.experiment import Bot
+
+    if not issubclass(Bot, HighPerformanceBotBase):
+        raise click.UsageError(
+            "load_test requires a Bot based on HighPerformanceBotBase."
+        )
+
+    log("Running {} bots against {}...".format(bots, base_url))
+    stats = loadtest.run_load_test(Bot, base_url, bots, rate=rate)
+    click.echo(format_load_test(stats.summary()))
+
+
+def format_load_test(summary):
+    def number(value, pattern="{:.3f}"):
+        return "-" if value is None else pattern.format(value)
+
+    headers = ["Route", "Requests", "Errors", "Error rate", "Req/s"]
+    headers.extend(["p50", "p90", "p99"])
+    rows = []
+    for name, route in sorted(summary["routes"].items()):
+        row = [
+            name,
+            route["requests"],
+            route["errors"],
+            number(route["error_rate"], "{:.1%}"),
+            number(route["throughput"], "{:.1f}"),
+        ]
+        row.extend(number(route[p]) for p in ("p50", "p90", "p99"))
+        rows.append(row)
+    table = tabulate.tabulate(rows, headers, tablefmt="psql", disable_numparse=True)
+    totals = (
+        "{bots_completed} bots completed, {bots_failed} failed. "
+        "{requests} requests in {duration:.1f}s "
+        "({throughput} requests/s)."
+    ).format(
+        throughput=number(
+            summary["requests"] / summary["duration"] if summary["duration"] else None,
+            "{:.1f}",
+        ),
+        **summary
+    )
+    return "\n\n".join([table, totals])
+
+
 @dallinger.command()
 def verify():
     """Verify that app is compatible with Dallinger."""
@@ -821,6 +963,45 @@ def rq_worker():
         worker.work()
 
 
+@dallinger.command()
+@click.option("--app", default=None, help="Experiment id")
+def worker_stats(app):
+    """Show job latencies and greenlet pool sizes of the rq workers."""
+    from dallinger.heroku import worker_metrics
+
+    if app is None:
+        connection = redis_conn
+    else:
+        verify_id(None, None, app)
+        connection = redis.from_url(HerokuApp(dallinger_uid=app).redis_url)
+    click.echo(format_worker_stats(worker_metrics.summary(connection)))
+
+
+def format_worker_stats(stats):
+    def seconds(value):
+        return "-" if value is None else "{:.3f}".format(value)
+
+    headers = ["Queue", "Depth", "Jobs"]
+    for measure in ("wait", "run"):
+        headers.extend("{} {}".format(measure, p) for p in ("p50", "p90", "p99", "max"))
+    rows = []
+    for name, queue in sorted(stats["queues"].items()):
+        row = [name, queue["depth"], queue["jobs"]]
+        for measure in ("wait", "run"):
+            latencies = queue[measure]
+            row.extend(seconds(latencies[p]) for p in ("p50", "p90", "p99", "max"))
+        rows.append(row)
+    out = [tabulate.tabulate(rows, headers, tablefmt="psql", disable_numparse=True)]
+
+    rows = [
+        [w["name"], w["busy"], w["pool_limit"], w["pool_size"]]
+        for w in stats["workers"]
+    ]
+    headers = ["Worker", "Busy", "Pool limit", "Pool size"]
+    out.append(tabulate.tabulate(rows, headers, tablefmt="psql"))
+    return "\n\n".join(out)
+
+
 @dallinger.command()
 def apps():
     out = Output()
@@ -26,6 +26,7 @@ default_keys = (
     ("aws_secret_access_key", six.text_type, [], True),
     ("base_payment", float, []),
     ("base_port", int, []),
+    ("bots_per_job", int, []),
     ("browser_exclude_rule", six.text_type, []),
     ("clock_on", bool, []),
     ("contact_email_on_error", six.text_type, []),
@@ -49,6 +50,8 @@ default_keys = (
     ("logfile", six.text_type, []),
     ("loglevel", int, []),
     ("mode", six.text_type, []),
+    ("mturk_action_concurrency", int, []),
+    ("mturk_action_rate", float, []),
     ("num_dynos_web", int, []),
     ("num_dynos_worker", int, []),
     ("organization_name", six.text_type, []),
@@ -58,6 +61,7 @@ default_keys = (
     ("recruiters", six.text_type, []),
     ("redis_size", six.text_type, []),
     ("replay", bool, []),
+    ("replay_speed", float, []),
     ("sentry", bool, []),
     ("smtp_host", six.text_type, []),
     ("smtp_username", six.text_type, []),
@@ -66,10 +70,13 @@ default_keys = (
     ("title", six.text_type, []),
     ("question_max_length", int, []),
     ("us_only", bool, []),
+    ("webdriver_pool_size", int, []),
     ("webdriver_type", six.text_type, []),
     ("webdriver_url", six.text_type, []),
     ("whimsical", bool, []),
     ("worker_multiplier", float, []),
+    ("worker_min_pool_size", int, []),
+    ("worker_max_pool_size", int, []),
 )
 
 
@@ -5,22 +5,29 @@ from .config import get_config
 import csv
 import errno
 import io
+import json
 import logging
 import os
 import shutil
 import six
+import struct
 import subprocess
 import tempfile
 import warnings
-from zipfile import ZipFile, ZIP_DEFLATED
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
 
 import botocore
 import boto3
 import hashlib
 import postgres_copy
 import psycopg2
+from cached_property import cached_property
 
-from dallinger.compat import open_for_csv
 from dallinger.heroku.tools import HerokuApp
 from dallinger import db
 from dallinger import models
@@ -29,12 +36,25 @@ logger = logging.getLogger(__name__)
 
 with warnings.catch_warnings():
     warnings.simplefilter(action="ignore", category=FutureWarning)
+    # Each is only needed for some representations of a Table.
     try:
         import odo
+    except ImportError:
+        logger.debug("Failed to import odo.")
+    try:
         import pandas as pd
+    except ImportError:
+        logger.debug("Failed to import pandas.")
+    try:
         import tablib
     except ImportError:
-        logger.debug("Failed to import odo, pandas, or tablib.")
+        logger.debug("Failed to import tablib.")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        pa = pq = None
+        logger.debug("Failed to import pyarrow.")
 
 
 table_names = [
@@ -92,6 +112,15 @@ def find_experiment_export(app_id):
             return path_to_data
 
 
+def export_digest(path):
+    """Return a SHA-256 hex digest of the contents of an export zip."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def load(app_id):
     """Load the data from wherever it is found."""
     path_to_data = find_experiment_export(app_id)
@@ -164,47 +193,516 @@ def copy_heroku_to_local(id):
     heroku_app.pg_pull()
 
 
-def copy_db_to_csv(dsn, path, scrub_pii=False):
-    """Copy a local database to a set of CSV files."""
+def _connect(dsn):
     if "postgresql://" in dsn or "postgres://" in dsn:
-        conn = psycopg2.connect(dsn=dsn)
-    else:
-        conn = psycopg2.connect(database=dsn, user="dallinger")
-    cur = conn.cursor()
+        return psycopg2.connect(dsn=dsn)
+    return psycopg2.connect(database=dsn, user="dallinger")
+
+
+# Tables are copied concurrently over this many connections. Copies are
+# held in memory until they can be written out, up to SPOOL_SIZE bytes per
+# table, beyond which they spill to a temporary file.
+EXPORT_WORKERS = 4
+SPOOL_SIZE = 32 * 1024 * 1024
+
+
+# Columns which are set when a row changes after it was created. Together
+# with the highest id, their latest values are the watermarks from which an
+# incremental export picks up.
+CHANGE_COLUMNS = {table: ("time_of_death",) for table in table_names}
+CHANGE_COLUMNS["participant"] = ("time_of_death", "end_time")
+CHANGE_COLUMNS["transmission"] = ("time_of_death", "receive_time")
+WATERMARKS_FILE = "watermarks.json"
+
+# Rows written by transactions still in progress when an export is made have
+# ids and times below its watermarks, but are not in it. Incremental exports
+# re-read this many ids, and seconds of changes, below each watermark to pick
+# them up. Rows read twice are merged by id.
+WATERMARK_ID_OVERLAP = 1000
+WATERMARK_TIME_OVERLAP = 600
+
+
+@contextmanager
+def _snapshot(dsn):
+    """Open a read-only transaction and export its snapshot, so that other
+    connections can see the database exactly as it does. Yields a cursor in
+    the transaction and the snapshot id.
+    """
+    conn = _connect(dsn)
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        cur = conn.cursor()
+        cur.execute("SELECT pg_export_snapshot()")
+        yield cur, cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _copy_table(dsn, snapshot, table, source=None):
+    conn = _connect(dsn)
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        cur = conn.cursor()
+        cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+        file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        sql = "COPY {} TO STDOUT WITH CSV HEADER".format(source or table)
+        cur.copy_expert(sql, file)
+        file.seek(0)
+        return table, file
+    finally:
+        conn.close()
+
+
+def _copy_tables(dsn, snapshot, sources, workers=EXPORT_WORKERS):
+    """Copy tables to CSV over up to ``workers`` connections, which all see
+    the given snapshot of the database. ``sources`` maps each table to what
+    is copied, either the table itself or a parenthesized query. Yields a
+    ``(table, file)`` pair for each table as soon as its copy is done.
+    """
+    copy = partial(_copy_table, dsn, snapshot)
+    pool = ThreadPool(max(1, min(workers, len(sources))))
+    try:
+        for result in pool.imap_unordered(
+            lambda item: copy(*item), list(sources.items())
+        ):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _watermarks(cur):
+    """Return the highest id and latest change times of every table."""
+    watermarks = {}
     for table in table_names:
-        csv_path = os.path.join(path, "{}.csv".format(table))
-        with open(csv_path, "w") as f:
-            sql = "COPY {} TO STDOUT WITH CSV HEADER".format(table)
-            cur.copy_expert(sql, f)
-    conn.close()
-    if scrub_pii:
-        _scrub_participant_table(path)
+        columns = ("id",) + CHANGE_COLUMNS[table]
+        cur.execute(
+            "SELECT {} FROM {}".format(
+                ", ".join("max({})".format(column) for column in columns), table
+            )
+        )
+        watermarks[table] = {
+            column: value.isoformat() if isinstance(value, datetime) else value
+            for column, value in zip(columns, cur.fetchone())
+        }
+    return watermarks
+
+
+def _changed_since(table, watermarks):
+    """Return a condition and its parameters, selecting the rows of a table
+    which were created or changed since the given watermarks, or None if
+    every row is. Rows a little below the watermarks are included too (see
+    ``WATERMARK_ID_OVERLAP``).
+    """
+    marks = (watermarks or {}).get(table)
+    if not marks or marks.get("id") is None:
+        return None
+    conditions = ["id > %s"]
+    params = [marks["id"] - WATERMARK_ID_OVERLAP]
+    for column in CHANGE_COLUMNS[table]:
+        if marks.get(column) is None:
+            conditions.append("{} IS NOT NULL".format(column))
+        else:
+            conditions.append(
+                "{} > %s::timestamp - %s * interval '1 second'".format(column)
+            )
+            params.extend([marks[column], WATERMARK_TIME_OVERLAP])
+    return "({})".format(" OR ".join(conditions)), params
 
 
-# Backwards compatibility for imports
-copy_local_to_csv = copy_db_to_csv
+# Tables whose rows give the structure of an experiment, rather than record
+# what happened in it. A subset of the data limited in time keeps the rows
+# of these tables created before its end, so that every row it holds from
+# the other tables has the rows it refers to.
+STRUCTURE_TABLES = ("network", "participant", "node", "vector")
+
+
+def _join(conditions):
+    return (
+        " AND ".join(sql for sql, params in conditions),
+        [param for sql, params in conditions for param in params],
+    )
+
+
+class ExportFilter(object):
+    """A subset of an experiment's data, for :func:`export`.
+
+    Only the networks with the given ``network_ids`` and ``network_role``
+    are exported, along with the participants with a node in them whose
+    status is one of ``participant_status``. ``start`` and ``end`` limit
+    the infos, transmissions, transformations, questions and notifications
+    to those created in that time range. Every table is filtered
+    consistently, so the rows exported never refer to rows which were left
+    out.
+    """
+
+    def __init__(
+        self,
+        network_ids=None,
+        network_role=None,
+        participant_status=None,
+        start=None,
+        end=None,
+    ):
+        self.network_ids = tuple(network_ids or ())
+        self.network_role = network_role
+        self.participant_status = tuple(participant_status or ())
+        self.start = start
+        self.end = end
+
+    def __bool__(self):
+        return any(
+            (
+                self.network_ids,
+                self.network_role,
+                self.participant_status,
+                self.start,
+                self.end,
+            )
+        )
+
+    __nonzero__ = __bool__
+
+    def condition(self, table):
+        """Return a condition and its parameters, selecting the rows of a
+        table which belong to the subset, or None if they all do.
+        """
+        conditions = self._conditions(table)
+        if not conditions:
+            return None
+        return _join(conditions)
+
+    def _in(self, column, table, selected="id"):
+        conditions = self._conditions(table)
+        if not conditions:
+            return []
+        sql, params = _join(conditions)
+        return [
+            (
+                "{} IN (SELECT {} FROM {} WHERE {})".format(
+                    column, selected, table, sql
+                ),
+                params,
+            )
+        ]
+
+    def _conditions(self, table):
+        conditions = []
+        if table in STRUCTURE_TABLES:
+            if self.end is not None:
+                conditions.append(("creation_time <= %s", [self.end]))
+        else:
+            if self.start is not None:
+                conditions.append(("creation_time >= %s", [self.start]))
+            if self.end is not None:
+                conditions.append(("creation_time <= %s", [self.end]))
+
+        if table == "network":
+            if self.network_ids:
+                conditions.append(("id IN %s", [self.network_ids]))
+            if self.network_role is not None:
+                conditions.append(("role = %s", [self.network_role]))
+        elif table == "participant":
+            if self.participant_status:
+                conditions.append(("status IN %s", [self.participant_status]))
+            for sql, params in self._in("network_id", "network"):
+                sql = "id IN (SELECT participant_id FROM node WHERE {})".format(sql)
+                conditions.append((sql, params))
+        elif table == "node":
+            conditions.extend(self._in("network_id", "network"))
+            for sql, params in self._in("participant_id", "participant"):
+                sql = "(participant_id IS NULL OR {})".format(sql)
+                conditions.append((sql, params))
+        elif table == "vector":
+            conditions.extend(self._in("origin_id", "node"))
+            conditions.extend(self._in("destination_id", "node"))
+        elif table == "info":
+            conditions.extend(self._in("origin_id", "node"))
+        elif table == "transmission":
+            conditions.extend(self._in("origin_id", "node"))
+            conditions.extend(self._in("destination_id", "node"))
+            conditions.extend(self._in("vector_id", "vector"))
+            conditions.extend(self._in("info_id", "info"))
+        elif table == "transformation":
+            conditions.extend(self._in("node_id", "node"))
+            conditions.extend(self._in("info_in_id", "info"))
+            conditions.extend(self._in("info_out_id", "info"))
+        elif table == "question":
+            conditions.extend(self._in("participant_id", "participant"))
+        elif table == "notification":
+            conditions.extend(
+                self._in("assignment_id", "participant", selected="assignment_id")
+            )
+        return conditions
+
+
+def _where(cur, table, since=None, subset=None):
+    """Return a WHERE clause selecting the rows of a table to export, with
+    its parameters filled in.
+    """
+    conditions = [
+        condition
+        for condition in (
+            _changed_since(table, since),
+            subset.condition(table) if subset else None,
+        )
+        if condition is not None
+    ]
+    if not conditions:
+        return ""
+    sql, params = _join(conditions)
+    return cur.mogrify("WHERE " + sql, params).decode("utf8")
+
 
+def _model(table):
+    return getattr(models, table.capitalize())
 
-def _scrub_participant_table(path_to_data):
-    """Scrub PII from the given participant table."""
-    path = os.path.join(path_to_data, "participant.csv")
-    with open_for_csv(path, "r") as input, open("{}.0".format(path), "w") as output:
-        reader = csv.reader(input)
-        writer = csv.writer(output)
-        headers = next(reader)
-        writer.writerow(headers)
-        for i, row in enumerate(reader):
-            row[headers.index("worker_id")] = row[headers.index("id")]
-            row[headers.index("unique_id")] = "{}:{}".format(
-                row[headers.index("id")], row[headers.index("assignment_id")]
+
+def pii_columns(table):
+    """Return the columns of a table which hold personally identifiable
+    information, mapped to the SQL expressions replacing them in scrubbed
+    exports. These are the ``pii_columns`` of the table's model and of all
+    its subclasses, so experiments can scrub more columns by declaring them
+    on their own models.
+    """
+    columns = {}
+    classes = [_model(table)]
+    while classes:
+        cls = classes.pop(0)
+        columns.update(cls.__dict__.get("pii_columns", {}))
+        classes.extend(cls.__subclasses__())
+    return columns
+
+
+def _columns(cur, table):
+    """Return the name and type of each column of a table."""
+    cur.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s "
+        "ORDER BY ordinal_position",
+        (table,),
+    )
+    return cur.fetchall()
+
+
+def _select_list(names, scrubbed):
+    return ", ".join(
+        '{} AS "{}"'.format(scrubbed[name], name)
+        if name in scrubbed
+        else '"{}"'.format(name)
+        for name in names
+    )
+
+
+def _sources(cur, since=None, scrub_pii=False, subset=None):
+    sources = {}
+    for table in table_names:
+        where = _where(cur, table, since, subset)
+        scrubbed = pii_columns(table) if scrub_pii else {}
+        if not (where or scrubbed):
+            sources[table] = table
+            continue
+        columns = "*"
+        if scrubbed:
+            names = [name for name, kind in _columns(cur, table)]
+            columns = _select_list(names, scrubbed)
+        sources[table] = "(SELECT {} FROM {} {})".format(columns, table, where)
+    return sources
+
+
+def read_watermarks(path):
+    """Return the watermarks recorded in an export zip, as created by
+    :func:`export`, or None if it has none.
+    """
+    with ZipFile(path, "r") as archive:
+        names = [n for n in archive.namelist() if n.endswith(WATERMARKS_FILE)]
+        if not names:
+            return None
+        return json.loads(archive.read(names[0]).decode("utf8"))["tables"]
+
+
+def copy_db_to_csv(dsn, path, scrub_pii=False):
+    """Copy a local database to a set of CSV files."""
+    with _snapshot(dsn) as (cur, snapshot):
+        sources = _sources(cur, scrub_pii=scrub_pii)
+        for table, file in _copy_tables(dsn, snapshot, sources):
+            csv_path = os.path.join(path, "{}.csv".format(table))
+            with file, open(csv_path, "wb") as output:
+                shutil.copyfileobj(file, output)
+
+
+def copy_db_to_zip(
+    dsn,
+    archive,
+    prefix="data",
+    scrub_pii=False,
+    since=None,
+    subset=None,
+    parquet_path=None,
+):
+    """Copy a local database into an open ``ZipFile``, as one CSV member per
+    table, without writing the tables to disk first.
+
+    The watermarks of the copied tables are saved alongside them. Given the
+    watermarks of an earlier export as ``since``, only the rows created or
+    changed after it are copied.
+
+    With ``scrub_pii``, the columns returned by :func:`pii_columns` are
+    replaced within the copy itself. Given an :class:`ExportFilter` as
+    ``subset``, only the rows in that subset are copied.
+
+    Given a directory as ``parquet_path``, the tables are also written there
+    by :func:`copy_db_to_parquet`, from the same snapshot as the CSVs.
+    """
+    with _snapshot(dsn) as (cur, snapshot):
+        watermarks = _watermarks(cur)
+        sources = _sources(cur, since, scrub_pii, subset)
+        for table, file in _copy_tables(dsn, snapshot, sources):
+            name = "{}/{}.csv".format(prefix, table)
+            with file:
+                if six.PY2:
+                    archive.writestr(name, file.read())
+                    continue
+                with archive.open(name, "w", force_zip64=True) as output:
+                    shutil.copyfileobj(file, output)
+        if parquet_path is not None:
+            copy_db_to_parquet(
+                dsn,
+                parquet_path,
+                scrub_pii=scrub_pii,
+                since=since,
+                subset=subset,
+                snapshot=snapshot,
             )
-            writer.writerow(row)
+    archive.writestr(
+        "{}/{}".format(prefix, WATERMARKS_FILE),
+        json.dumps({"since": since, "tables": watermarks}, indent=2, sort_keys=True),
+    )
+    return watermarks
+
 
-        os.rename("{}.0".format(path), path)
+# Backwards compatibility for imports
+copy_local_to_csv = copy_db_to_csv
 
 
-def export(id, local=False, scrub_pii=False):
-    """Export data from an experiment."""
+# Arrow types for the Postgres column types of exported tables. Columns of
+# any other type are exported as strings.
+ARROW_TYPES = {
+    "bigint": "int64",
+    "boolean": "bool_",
+    "double precision": "float64",
+    "integer": "int64",
+    "json": "string",
+    "jsonb": "string",
+    "real": "float64",
+    "smallint": "int64",
+    "timestamp without time zone": "timestamp",
+}
+JSON_TYPES = ("json", "jsonb")
+PARQUET_BATCH_SIZE = 10000
+
+
+def _arrow_field(name, data_type):
+    arrow_type = ARROW_TYPES.get(data_type, "string")
+    if arrow_type == "timestamp":
+        arrow_type = pa.timestamp("us")
+    else:
+        arrow_type = getattr(pa, arrow_type)()
+    metadata = {"encoding": "json"} if data_type in JSON_TYPES else None
+    return pa.field(name, arrow_type, metadata=metadata)
+
+
+def copy_db_to_parquet(
+    dsn, path, scrub_pii=False, since=None, subset=None, snapshot=None
+):
+    """Copy a local database to a set of Parquet files, keeping the type of
+    each column. JSON columns are stored as strings, and marked so they are
+    decoded again by :class:`Table`. As with :func:`copy_db_to_zip`, only
+    rows created or changed since the watermarks ``since``, and in the
+    ``subset``, are copied.
+
+    Given the id of an exported ``snapshot``, the database is read as it
+    was in that snapshot.
+    """
+    if pq is None:
+        raise ImportError("Exporting to Parquet requires pyarrow.")
+    conn = _connect(dsn)
+    try:
+        if snapshot is not None:
+            conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            cur = conn.cursor()
+            cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+            cur.close()
+        for table in table_names:
+            _copy_table_to_parquet(conn, table, path, scrub_pii, since, subset)
+    finally:
+        conn.close()
+
+
+def _copy_table_to_parquet(conn, table, path, scrub_pii, since, subset):
+    cur = conn.cursor()
+    columns = _columns(cur, table)
+    where = _where(cur, table, since, subset)
+    cur.close()
+    schema = pa.schema([_arrow_field(name, kind) for name, kind in columns])
+    names = [name for name, kind in columns]
+    json_columns = [i for i, (n, kind) in enumerate(columns) if kind in JSON_TYPES]
+    other_columns = [
+        i for i, (n, kind) in enumerate(columns) if kind not in ARROW_TYPES
+    ]
+
+    # A named cursor streams rows from the server instead of loading the
+    # whole table into memory.
+    cur = conn.cursor(name="export_{}".format(table))
+    scrubbed = pii_columns(table) if scrub_pii else {}
+    cur.execute(
+        "SELECT {} FROM {} {} ORDER BY id".format(
+            _select_list(names, scrubbed), table, where
+        )
+    )
+    filename = os.path.join(path, "{}.parquet".format(table))
+    writer = pq.ParquetWriter(filename, schema)
+    try:
+        while True:
+            rows = [list(row) for row in cur.fetchmany(PARQUET_BATCH_SIZE)]
+            if not rows:
+                break
+            for row in rows:
+                for i in json_columns:
+                    if row[i] is not None:
+                        row[i] = json.dumps(row[i])
+                for i in other_columns:
+                    if row[i] is not None:
+                        row[i] = six.text_type(row[i])
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+        cur.close()
+
+
+def export(id, local=False, scrub_pii=False, parquet=False, since=None, subset=None):
+    """Export data from an experiment.
+
+    With ``parquet``, each table is also exported as a typed Parquet file,
+    which :class:`Data` loads in preference to the CSV.
+
+    Given the path to an earlier export as ``since``, an incremental export
+    is made instead, holding only the rows created or changed after that
+    export. It can be loaded on top of its base export with
+    ``Data(base, deltas=[...])``. Rows from transactions which were still in
+    progress during the earlier export are picked up by re-reading the last
+    ``WATERMARK_ID_OVERLAP`` rows and ``WATERMARK_TIME_OVERLAP`` seconds of
+    changes before it, so an incremental export also holds some rows which
+    were already exported. Rows from transactions which took longer than
+    that to commit can still be missed.
+
+    Given an :class:`ExportFilter` as ``subset``, only that part of the data
+    is exported.
+    """
 
     print("Preparing to export the data...")
 
@@ -213,42 +711,67 @@ def export(id, local=False, scrub_pii=False):
     else:
         db_uri = HerokuApp(id).db_uri
 
-    # Create the data package if it doesn't already exist.
-    subdata_path = os.path.join("data", id, "data")
+    # Create the data directory if it doesn't already exist.
     try:
-        os.makedirs(subdata_path)
+        os.makedirs("data")
 
     except OSError as e:
-        if e.errno != errno.EEXIST or not os.path.isdir(subdata_path):
+        if e.errno != errno.EEXIST or not os.path.isdir("data"):
             raise
 
-    # Copy in the data.
-    copy_db_to_csv(db_uri, subdata_path, scrub_pii=scrub_pii)
-
-    # Copy the experiment code into a code/ subdirectory.
-    try:
-        shutil.copyfile(
-            os.path.join("snapshots", id + "-code.zip"),
-            os.path.join("data", id, id + "-code.zip"),
-        )
-
-    except Exception:
-        pass
-
-    # Copy in the DATA readme.
-    # open(os.path.join(id, "README.txt"), "a").close()
+    watermarks = None
+    kinds = []
+    if subset:
+        kinds.append("subset")
+    if since is not None:
+        watermarks = read_watermarks(since)
+        if watermarks is None:
+            raise ValueError("{} has no watermarks to export from.".format(since))
+        kinds.append("delta")
 
-    # Save the experiment id.
-    with open(os.path.join("data", id, "experiment_id.md"), "a+") as file:
-        file.write(id)
+    data_filename = "{}-data.zip".format(id)
+    if kinds:
+        stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        data_filename = "{}-data-{}-{}.zip".format(id, "-".join(kinds), stamp)
 
-    # Zip data
-    src = os.path.join("data", id)
-    dst = os.path.join("data", id + "-data.zip")
-    archive_data(id, src, dst)
+    # The tables are streamed straight into the zip.
+    print("Zipping up the package...")
+    dst = os.path.join("data", data_filename)
+    with ZipFile(dst, "w", ZIP_DEFLATED, allowZip64=True) as archive:
+        parquet_path = tempfile.mkdtemp() if parquet else None
+        try:
+            # Parquet files are written from the same snapshot as the CSVs
+            copy_db_to_zip(
+                db_uri,
+                archive,
+                scrub_pii=scrub_pii,
+                since=watermarks,
+                subset=subset,
+                parquet_path=parquet_path,
+            )
+            if parquet:
+                # Parquet files are stored uncompressed, so they can be
+                # memory-mapped straight from the zip.
+                for filename in sorted(os.listdir(parquet_path)):
+                    archive.write(
+                        os.path.join(parquet_path, filename),
+                        "data/{}".format(filename),
+                        ZIP_STORED,
+                    )
+        finally:
+            if parquet:
+                shutil.rmtree(parquet_path)
+
+        # Copy in the experiment code.
+        code_path = os.path.join("snapshots", id + "-code.zip")
+        if os.path.isfile(code_path):
+            archive.write(code_path, id + "-code.zip")
+
+        # Save the experiment id.
+        archive.writestr("experiment_id.md", id)
+    print("Done. Data available in {}".format(data_filename))
 
     cwd = os.getcwd()
-    data_filename = "{}-data.zip".format(id)
     path_to_data = os.path.join(cwd, "data", data_filename)
 
     # Backup data on S3 unless run locally
@@ -257,16 +780,25 @@ def export(id, local=False, scrub_pii=False):
         bucket.upload_file(path_to_data, data_filename)
         url = _generate_s3_url(bucket, data_filename)
 
-        # Register experiment UUID with dallinger
-        register(id, url)
+        # Register experiment UUID with dallinger. The registered export
+        # stays the full one.
+        if not kinds:
+            register(id, url)
 
     return path_to_data
 
 
-def ingest_zip(path, engine=None):
+def ingest_zip(path, engine=None, parallel=False):
     """Given a path to a zip file created with `export()`, recreate the
     database with the data stored in the included .csv files.
+
+    With ``parallel``, tables are loaded concurrently, with their indexes
+    and foreign keys dropped and only rebuilt once all the data is in (see
+    :func:`ingest_zip_in_parallel`).
     """
+    if parallel:
+        return ingest_zip_in_parallel(path, engine)
+
     import_order = [
         "network",
         "participant",
@@ -290,6 +822,140 @@ def ingest_zip(path, engine=None):
             ingest_to_model(file, model, engine)
 
 
+INGEST_WORKERS = 4
+
+
+def _deferrable_ddl(cur, tables):
+    """Return the definitions of the foreign keys and of the indexes, other
+    than those backing primary keys and unique constraints, of the tables.
+    """
+    cur.execute(
+        "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) "
+        "FROM pg_constraint WHERE contype = 'f' AND conrelid::regclass::text IN %s",
+        (tuple(tables),),
+    )
+    foreign_keys = cur.fetchall()
+    cur.execute(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename IN %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint "
+        "WHERE contype IN ('p', 'u'))",
+        (tuple(tables),),
+    )
+    indexes = cur.fetchall()
+    return foreign_keys, indexes
+
+
+def _run_ddl(engine, statements):
+    """Run each statement in its own transaction."""
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        for statement in statements:
+            cur.execute(statement)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def _ingest_table(path, engine, table):
+    """COPY one table of an export zip into the database. Returns the
+    table, the number of rows loaded and the time it took.
+    """
+    started = default_timer()
+    with ZipFile(path, "r") as archive:
+        member = "/{}.csv".format(table)
+        filename = [f for f in archive.namelist() if f.endswith(member)][0]
+        file = archive.open(filename)
+        if six.PY3:
+            file = io.TextIOWrapper(file, encoding="utf8", newline="")
+        columns = ", ".join('"{}"'.format(n) for n in next(csv.reader(file)))
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            sql = "COPY {} ({}) FROM STDIN WITH CSV".format(table, columns)
+            cur.copy_expert(sql, file)
+            rows = cur.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+    return table, rows, default_timer() - started
+
+
+def ingest_zip_in_parallel(path, engine=None, workers=INGEST_WORKERS):
+    """Load an export zip into the database, as :func:`ingest_zip` does, but
+    faster for large exports.
+
+    The foreign keys and secondary indexes of the tables are dropped, the
+    tables are loaded concurrently over up to ``workers`` connections, and
+    the indexes and then the foreign keys are rebuilt once all the rows are
+    in. Returns the number of rows loaded and the seconds taken per table.
+    """
+    if engine is None:
+        engine = db.engine
+    with ZipFile(path, "r") as archive:
+        filenames = archive.namelist()
+    tables = [
+        table
+        for table in table_names
+        if any(f.endswith("/{}.csv".format(table)) for f in filenames)
+    ]
+
+    conn = engine.raw_connection()
+    try:
+        foreign_keys, indexes = _deferrable_ddl(conn.cursor(), tables)
+    finally:
+        conn.close()
+    _run_ddl(
+        engine,
+        [
+            "ALTER TABLE {} DROP CONSTRAINT {}".format(table, name)
+            for table, name, definition in foreign_keys
+        ]
+        + ["DROP INDEX {}".format(name) for name, definition in indexes],
+    )
+
+    stats = {}
+    loaded = False
+    pool = ThreadPool(max(1, min(workers, len(tables))))
+    try:
+        try:
+            for table, rows, seconds in pool.imap_unordered(
+                partial(_ingest_table, path, engine), tables
+            ):
+                stats[table] = (rows, seconds)
+                logger.info(
+                    "Loaded {} rows into {} in {:.2f}s ({:.0f} rows/s).".format(
+                        rows, table, seconds, rows / seconds if seconds else 0
+                    )
+                )
+            loaded = True
+        finally:
+            # Whether or not the data loaded, put the indexes back. They
+            # don't lock each other out, so they are built concurrently.
+            pool.map(partial(_run_ddl, engine), [[d] for n, d in indexes])
+    finally:
+        pool.close()
+        pool.join()
+        # The foreign keys go back too. If a table failed to load, rows
+        # referring to it can't be checked, so the keys are only enforced
+        # for new rows (NOT VALID).
+        _run_ddl(
+            engine,
+            [
+                "ALTER TABLE {} ADD CONSTRAINT {} {}{}".format(
+                    table, name, definition, "" if loaded else " NOT VALID"
+                )
+                for table, name, definition in foreign_keys
+            ]
+            + [
+                "SELECT setval('{0}_id_seq', max(id)) FROM {0}".format(table)
+                for table in tables
+            ],
+        )
+    return stats
+
+
 def fix_autoincrement(table_name):
     """Auto-increment pointers are not updated when IDs are set explicitly,
     so we manually update the pointer so subsequent inserts work correctly.
@@ -320,7 +986,12 @@ def archive_data(id, src, dst):
             for file in files:
                 filename = os.path.join(root, file)
                 arcname = filename.replace(src, "").lstrip("/")
-                zf.write(filename, arcname)
+                # Parquet files are compressed already. Storing them as they
+                # are lets them be memory-mapped straight from the zip.
+                if file.endswith(".parquet"):
+                    zf.write(filename, arcname, ZIP_STORED)
+                else:
+                    zf.write(filename, arcname)
     shutil.rmtree(src)
     print("Done. Data available in {}-data.zip".format(id))
 
@@ -391,34 +1062,181 @@ def _s3_resource(dallinger_region=False):
     )
 
 
+def _stored_member_range(archive, info):
+    """Return the offset and size of the data of an uncompressed zip member,
+    given its ``ZipInfo``.
+    """
+    with open(archive, "rb") as file:
+        file.seek(info.header_offset)
+        header = file.read(30)
+    if header[:4] != b"PK\x03\x04":
+        raise ValueError("No local file header for {}".format(info.filename))
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    return info.header_offset + 30 + name_length + extra_length, info.file_size
+
+
+def _zip_member_buffer(archive, name):
+    """Return a pyarrow buffer holding a member of a zip file. Members which
+    are stored uncompressed are memory-mapped instead of read.
+    """
+    with ZipFile(archive) as input_zip:
+        info = input_zip.getinfo(name)
+        if info.compress_type != ZIP_STORED:
+            return pa.py_buffer(input_zip.read(name))
+    offset, size = _stored_member_range(archive, info)
+    source = pa.memory_map(archive)
+    source.seek(offset)
+    return source.read_buffer(size)
+
+
+def _decode_json_columns(table):
+    df = table.to_pandas()
+    for field in table.schema:
+        if field.metadata and field.metadata.get(b"encoding") == b"json":
+            df[field.name] = df[field.name].map(
+                lambda value: None if value is None else json.loads(value)
+            )
+    return df
+
+
+def _python_values(df):
+    """Convert the values of a DataFrame to Python objects, with None for
+    missing values instead of NaN or NaT.
+    """
+    return df.astype(object).where(df.notnull(), None)
+
+
+def _merge_frames(frames):
+    """Stack tables from a base export and its deltas, keeping the latest
+    version of each row.
+    """
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates("id", keep="last").sort_values("id")
+    return merged.reset_index(drop=True)
+
+
 class Data(object):
-    """Dallinger data object."""
+    """Dallinger data object.
+
+    Each table of an export zip is available as an attribute named after
+    the table, such as ``infos`` or ``networks``. Tables are read straight
+    out of the zip, the first time they are used. When the export includes
+    Parquet files and pyarrow is installed, they are used instead of the CSVs.
+
+    ``deltas`` are incremental exports made since this one, oldest first.
+    Their rows are merged into each table, replacing earlier versions of
+    rows which changed.
+    """
 
-    def __init__(self, URL):
+    def __init__(self, URL, deltas=()):
 
         self.source = URL
+        self._members = {}
+        self._deltas = [Data(delta) for delta in deltas]
 
         if self.source.endswith(".zip"):
+            with ZipFile(URL) as input_zip:
+                names = input_zip.namelist()
+            formats = ("parquet", "csv") if pq is not None else ("csv",)
+            for tab in table_names:
+                for extension in formats:
+                    member = "data/{}.{}".format(tab, extension)
+                    matches = [
+                        n for n in names if n == member or n.endswith("/" + member)
+                    ]
+                    if matches:
+                        self._members["{}s".format(tab)] = matches[0]
+                        break
 
-            input_zip = ZipFile(URL)
-            tmp_dir = tempfile.mkdtemp()
-            input_zip.extractall(tmp_dir)
+    def __getattr__(self, name):
+        members = self.__dict__.get("_members", {})
+        if name not in members:
+            raise AttributeError(name)
+        deltas = [getattr(d, name) for d in self._deltas if name in d._members]
+        table = Table(members[name], archive=self.source, deltas=deltas)
+        setattr(self, name, table)
+        return table
 
-            for tab in table_names:
-                setattr(
-                    self,
-                    "{}s".format(tab),
-                    Table(os.path.join(tmp_dir, "data", "{}.csv".format(tab))),
-                )
+
+# Timestamp columns of the exported tables, parsed when reading CSVs.
+DATETIME_COLUMNS = ("creation_time", "time_of_death", "end_time", "receive_time")
 
 
 class Table(object):
-    """Dallinger data-table object."""
+    """Dallinger data-table object.
 
-    def __init__(self, path):
+    ``path`` is a CSV or Parquet file, or a member of the zip file at
+    ``archive``. The file is only read when a representation of it is asked
+    for, and each representation is built once. Rows of the ``deltas``
+    tables, from incremental exports, are merged in by id.
+    """
+
+    def __init__(self, path, archive=None, deltas=()):
+
+        self.path = path
+        self.archive = archive
+        self.deltas = list(deltas)
+        self._tmp_dir = None
 
-        self.odo_resource = odo.resource(path)
-        self.tablib_dataset = tablib.Dataset().load(open(path).read(), "csv")
+    def __del__(self):
+        # Remove the file extracted for odo_resource along with the table.
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    @property
+    def is_parquet(self):
+        return self.path.endswith(".parquet")
+
+    def _open(self):
+        """Open the CSV as a binary stream."""
+        if self.archive is None:
+            return open(self.path, "rb")
+        with ZipFile(self.archive) as input_zip:
+            return input_zip.open(self.path)
+
+    @cached_property
+    def odo_resource(self):
+        """An odo resource. Tables from a zip file are extracted to a temporary
+        directory, which is removed when the Table is garbage collected.
+        """
+        if self.archive is None:
+            return odo.resource(self.path)
+        self._tmp_dir = tempfile.mkdtemp()
+        with ZipFile(self.archive) as input_zip:
+            return odo.resource(input_zip.extract(self.path, self._tmp_dir))
+
+    @property
+    def arrow(self):
+        """A pyarrow Table. Parquet files are memory-mapped rather than read,
+        including those stored uncompressed in an export zip.
+        """
+        if self.deltas or not self.is_parquet:
+            return self._arrow_from_df
+        return self._parquet
+
+    @cached_property
+    def _arrow_from_df(self):
+        return pa.Table.from_pandas(self.df, preserve_index=False)
+
+    @cached_property
+    def _parquet(self):
+        if self.archive is None:
+            return pq.read_table(pa.memory_map(self.path))
+        buffer = _zip_member_buffer(self.archive, self.path)
+        return pq.read_table(pa.BufferReader(buffer))
+
+    @cached_property
+    def tablib_dataset(self):
+        if self.deltas:
+            df = _python_values(self.df)
+            rows = df.itertuples(index=False, name=None)
+            return tablib.Dataset(*rows, headers=list(df.columns))
+        if self.is_parquet:
+            rows = self._parquet.to_pandas().itertuples(index=False, name=None)
+            return tablib.Dataset(*rows, headers=self._parquet.schema.names)
+        with self._open() as file:
+            return tablib.Dataset().load(file.read().decode("utf8"), "csv")
 
     @property
     def csv(self):
@@ -430,10 +1248,23 @@ class Table(object):
         """A Python dictionary."""
         return self.tablib_dataset.dict[0]
 
-    @property
+    @cached_property
     def df(self):
         """A pandas DataFrame."""
-        return odo.odo(self.odo_resource, pd.DataFrame)
+        if self.deltas:
+            return _merge_frames([self._read_df()] + [d.df for d in self.deltas])
+        return self._read_df()
+
+    def _read_df(self):
+        if self.is_parquet:
+            return _decode_json_columns(self._parquet)
+        with self._open() as file:
+            # Postgres writes booleans as t and f
+            df = pd.read_csv(file, true_values=["t"], false_values=["f"])
+        for column in DATETIME_COLUMNS:
+            if column in df:
+                df[column] = pd.to_datetime(df[column])
+        return df
 
     @property
     def html(self):
@@ -445,10 +1276,10 @@ class Table(object):
         """A LaTeX table."""
         return self.tablib_dataset.latex
 
-    @property
+    @cached_property
     def list(self):
         """A Python list."""
-        return odo.odo(self.odo_resource, list)
+        return list(_python_values(self.df).itertuples(index=False, name=None))
 
     @property
     def ods(self):
@@ -666,7 +666,13 @@ class LoaderDeployment(HerokuLocalDeployment):
         self.out.log(
             "Ingesting dataset from {}...".format(os.path.basename(self.zip_path))
         )
-        data.ingest_zip(self.zip_path)
+        stats = data.ingest_zip(self.zip_path, parallel=True)
+        for table, (rows, seconds) in sorted(stats.items()):
+            self.out.log(
+                "Loaded {} rows into {} ({:.0f} rows/s).".format(
+                    rows, table, rows / seconds if seconds else 0
+                )
+            )
         base_url = get_base_url()
         self.out.log("Server is running on {}. Press Ctrl+C to exit.".format(base_url))
 
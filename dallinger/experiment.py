@@ -29,11 +29,13 @@ from dallinger.config import get_config, LOCAL_CONFIG
 from dallinger.config import initialize_experiment_package
 from dallinger.data import Data
 from dallinger.data import export
+from dallinger.data import export_digest
 from dallinger.data import is_registered
 from dallinger.data import load as data_load
 from dallinger.data import find_experiment_export
 from dallinger.data import ingest_zip
 from dallinger.db import init_db, db_url
+from dallinger.experiment_server.replay import check_speed
 from dallinger.models import Network, Node, Info, Transformation, Participant
 from dallinger.heroku.tools import HerokuApp
 from dallinger.information import Gene, Meme, State
@@ -66,6 +68,24 @@ def exp_class_working_dir(meth):
     return new_meth
 
 
+def scheduled_task(minutes, queue=None):
+    """Register an experiment method to be run every ``minutes`` minutes by
+    the clock process.
+
+    The method runs on the clock process itself unless ``queue`` names an rq
+    queue (usually ``"low"``), in which case the clock only enqueues it and a
+    worker runs it. Slow tasks should use a queue, so that they don't delay
+    the clock's other jobs. Each run is leased in redis, so a task runs at
+    most once per interval even if more than one clock process is running.
+    """
+
+    def decorate(method):
+        method.scheduled_task = {"minutes": minutes, "queue": queue}
+        return method
+
+    return decorate
+
+
 class Experiment(object):
     """Define the structure of an experiment."""
 
@@ -161,6 +181,18 @@ class Experiment(object):
         """
         return []
 
+    @classmethod
+    def scheduled_tasks(cls):
+        """Return the methods registered with :func:`scheduled_task`, as a
+        dict mapping each method's name to its schedule.
+        """
+        tasks = {}
+        for name in dir(cls):
+            schedule = getattr(getattr(cls, name, None), "scheduled_task", None)
+            if isinstance(schedule, dict):
+                tasks[name] = schedule
+        return tasks
+
     @cached_property
     def recruiter(self):
         """Reference to a Recruiter, the Dallinger class that recruits
@@ -671,8 +703,12 @@ class Experiment(object):
 
     @contextmanager
     def restore_state_from_replay(
-        self, app_id, session, zip_path=None, **configuration_options
+        self, app_id, session, zip_path=None, rebuild=False, **configuration_options
     ):
+        """Replay an experiment from its export. The export is imported into
+        a database of its own, which is kept and reused by later replays of
+        the same export, unless ``rebuild`` is set.
+        """
         # We need to fake dallinger_experiment to point at the current experiment
         module = sys.modules[type(self).__module__]
         if sys.modules.get("dallinger_experiment", module) != module:
@@ -702,38 +738,49 @@ class Experiment(object):
         # to be before any experiment Info objects
         self._replay_time_index = datetime.datetime(1970, 1, 1, 1, 1, 1)
 
+        # Find the real data for this experiment
+        if zip_path is None:
+            zip_path = find_experiment_export(app_id)
+        if zip_path is None:
+            msg = 'Dataset export for app id "{}" could not be found.'
+            raise IOError(msg.format(app_id))
+
         # Create a second database session so we can load the full history
         # of the experiment to be replayed and selectively import events
         # into the main database
         specific_db_url = db_url + "-import-" + app_id
+        import_db_name = specific_db_url.rsplit("/", 1)[1]
         import_engine = create_engine(specific_db_url)
-        try:
-            # Clear the temporary storage and import it
-            init_db(drop_all=True, bind=import_engine)
-        except Exception:
-            create_db_engine = create_engine(db_url)
-            conn = create_db_engine.connect()
-            conn.execute("COMMIT;")
-            conn.execute(
-                'CREATE DATABASE "{}"'.format(specific_db_url.rsplit("/", 1)[1])
+        create_db_engine = create_engine(db_url)
+        digest = export_digest(zip_path)
+        if rebuild or _imported_digest(create_db_engine, import_db_name) != digest:
+            try:
+                # Clear the temporary storage and import it
+                init_db(drop_all=True, bind=import_engine)
+            except Exception:
+                conn = create_db_engine.connect()
+                conn.execute("COMMIT;")
+                conn.execute('CREATE DATABASE "{}"'.format(import_db_name))
+                conn.close()
+                import_engine = create_engine(specific_db_url)
+                init_db(drop_all=True, bind=import_engine)
+
+            # Forget the previous import until this one is complete
+            _mark_imported_digest(create_db_engine, import_db_name, None)
+            print("Ingesting dataset from {}...".format(os.path.basename(zip_path)))
+            ingest_zip(zip_path, engine=import_engine, parallel=True)
+            _mark_imported_digest(create_db_engine, import_db_name, digest)
+        else:
+            print(
+                "Reusing dataset already imported from {}...".format(
+                    os.path.basename(zip_path)
+                )
             )
-            conn.close()
-            import_engine = create_engine(specific_db_url)
-            init_db(drop_all=True, bind=import_engine)
+        create_db_engine.dispose()
 
         self.import_session = scoped_session(
             sessionmaker(autocommit=False, autoflush=True, bind=import_engine)
         )
-
-        # Find the real data for this experiment
-        if zip_path is None:
-            zip_path = find_experiment_export(app_id)
-        if zip_path is None:
-            msg = 'Dataset export for app id "{}" could not be found.'
-            raise IOError(msg.format(app_id))
-
-        print("Ingesting dataset from {}...".format(os.path.basename(zip_path)))
-        ingest_zip(zip_path, engine=import_engine)
         self._replay_range = tuple(
             self.import_session.query(
                 func.min(Info.creation_time), func.max(Info.creation_time)
@@ -745,7 +792,11 @@ class Experiment(object):
         # options are correctly set
         with config.override(configuration_options, strict=True):
             self.replay_start()
-            yield Scrubber(self, session=self.import_session)
+            yield Scrubber(
+                self,
+                session=self.import_session,
+                speed=config.get("replay_speed", 1.0),
+            )
             self.replay_finish()
 
         # Clear up global state
@@ -803,11 +854,37 @@ class Experiment(object):
         sys.modules["dallinger_experiment"]._jupyter_cleanup = _jupyter_cleanup
 
 
+def _imported_digest(engine, name):
+    """Return the digest of the export last imported into the database
+    ``name``, or None if it is missing or was never completely imported.
+    """
+    row = engine.execute(
+        "SELECT shobj_description(oid, 'pg_database') FROM pg_database "
+        "WHERE datname = %s",
+        name,
+    ).first()
+    return row[0] if row else None
+
+
+def _mark_imported_digest(engine, name, digest):
+    """Record the digest of the export imported into the database ``name``,
+    as a comment on the database.
+    """
+    with engine.begin() as conn:
+        conn.execute('COMMENT ON DATABASE "{}" IS %s'.format(name), digest)
+
+
+# Playback rates offered by the replay widget, 0 meaning as fast as possible
+REPLAY_SPEEDS = (("1x", 1.0), ("2x", 2.0), ("10x", 10.0), ("60x", 60.0), ("Max", 0))
+
+
 class Scrubber(object):
-    def __init__(self, experiment, session):
+    def __init__(self, experiment, session, speed=1.0):
         self.experiment = experiment
         self.session = session
         self.realtime = False
+        # Playback rate of in_realtime, 0 plays back as fast as possible
+        self.speed = check_speed(speed)
 
     def __call__(self, time):
         """Scrub to a point in the experiment replay, given by time
@@ -845,7 +922,10 @@ class Scrubber(object):
             while current < exp_end:
                 now = time.time()
                 seconds = now - replay_offset
-                current = current + datetime.timedelta(seconds=seconds)
+                if self.speed:
+                    current = current + datetime.timedelta(seconds=seconds * self.speed)
+                else:
+                    current = exp_end
                 self(current)
                 if callable(callback):
                     try:
@@ -908,7 +988,7 @@ class Scrubber(object):
             value=False,
             description="",
             disabled=False,
-            tooltip="Play back in realtime",
+            tooltip="Play back at the selected speed",
             icon="play",
         )
 
@@ -925,7 +1005,22 @@ class Scrubber(object):
 
         play_button.observe(playback, "value")
 
-        self.widget = widgets.HBox(children=[scrubber, play_button])
+        speeds = list(REPLAY_SPEEDS)
+        if self.speed not in dict(speeds).values():
+            speeds.append(("{}x".format(self.speed), self.speed))
+        speed_dropdown = widgets.Dropdown(
+            options=speeds,
+            value=self.speed,
+            description="Speed",
+            disabled=False,
+        )
+
+        def change_speed(change):
+            self.speed = change["new"]
+
+        speed_dropdown.observe(change_speed, "value")
+
+        self.widget = widgets.HBox(children=[scrubber, play_button, speed_dropdown])
         return self.widget
 
     def _ipython_display_(self):
@@ -4,6 +4,7 @@ from datetime import datetime
 import gevent
 from json import dumps
 from json import loads
+import math
 import os
 import re
 
@@ -24,7 +25,9 @@ from dallinger import recruiters
 from dallinger.notifications import get_messenger
 from dallinger.notifications import MessengerError
 
+from .replay import REPLAY_CHANNEL
 from .replay import ReplayBackend
+from .worker_events import tracking_events_function
 from .worker_events import worker_function
 from .utils import (
     crossdomain,
@@ -310,8 +313,12 @@ def launch():
 
     if _config().get("replay", False):
         try:
-            task = ReplayBackend(exp)
+            from dallinger.experiment_server.sockets import chat_backend
+
+            task = ReplayBackend(exp, speed=_config().get("replay_speed", 1.0))
             gevent.spawn(task)
+            # Receive playback controls sent through the replay channel
+            chat_backend.subscribe(task, REPLAY_CHANNEL)
         except Exception:
             return error_response(
                 error_text="Failed to launch replay task for experiment."
@@ -1158,6 +1165,48 @@ def tracking_event_post(node_id):
     return success_response(details=details)
 
 
+@app.route("/tracking_events/<int:node_id>", methods=["POST"])
+@crossdomain(origin="*")
+def tracking_events_post(node_id):
+    """Enqueue a single job recording a batch of TrackingEvents for a Node.
+
+    You must pass events, a JSON encoded list of event details. Events with
+    a ``client_time`` and a batch ``sent_time``, both in milliseconds since
+    the epoch on the participant's clock, are dated by how long before the
+    batch was sent they happened, so they keep their order.
+    """
+    events = request_parameter(parameter="events")
+    if type(events) == Response:
+        return events
+    try:
+        events = loads(events)
+    except ValueError:
+        return error_response(error_type="/tracking_events POST, invalid events")
+    if not isinstance(events, list):
+        return error_response(error_type="/tracking_events POST, invalid events")
+    try:
+        sent_time = request_parameter(parameter="sent_time", optional=True)
+        if sent_time is not None:
+            sent_time = float(sent_time)
+            if math.isnan(sent_time) or math.isinf(sent_time):
+                raise ValueError("sent_time must be finite")
+    except ValueError:
+        return error_response(error_type="/tracking_events POST, invalid sent_time")
+
+    # check the node exists
+    node = models.Node.query.get(node_id)
+    if node is None:
+        return error_response(error_type="/tracking_events POST, node does not exist")
+
+    if events:
+        db.logger.debug(
+            "rq: Queueing %d TrackingEvents for node: %s", len(events), node_id
+        )
+        q.enqueue(tracking_events_function, node_id, events, sent_time)
+
+    return success_response(count=len(events))
+
+
 @app.route("/info/<int:node_id>", methods=["POST"])
 @crossdomain(origin="*")
 def info_post(node_id):
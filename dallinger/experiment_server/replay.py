@@ -1,11 +1,59 @@
 import gevent
+import itertools
+import json
 import logging
+import math
 import time
+from contextlib import contextmanager
+from gevent.event import Event
+from sqlalchemy.orm import Session
 from dallinger.utils import get_base_url
 
 
 logger = logging.getLogger(__file__)
 
+# Number of events fetched from the database at a time while replaying.
+REPLAY_BATCH_SIZE = 1000
+
+# Websocket channel on which playback controls for a running replay are sent.
+REPLAY_CHANNEL = "replay"
+
+
+def _finite(number):
+    return not (math.isnan(number) or math.isinf(number))
+
+
+def check_speed(speed):
+    """Return ``speed`` as a float if it is a valid replay speed: a finite,
+    non-negative number, where 0 replays as fast as possible.
+    """
+    speed = float(speed)
+    if not _finite(speed) or speed < 0:
+        raise ValueError("Replay speed must be a finite, non-negative number")
+    return speed
+
+
+@contextmanager
+def stream_events(events, batch_size=REPLAY_BATCH_SIZE):
+    """Count replay events and iterate over them without loading them all
+    into memory. Yields the number of events and an iterator over them.
+
+    Queries are read through a server-side cursor in batches of
+    ``batch_size`` rows. The cursor belongs to a session of its own, so
+    experiments can commit their session while the replay is running. Any
+    other iterable is read into a list.
+    """
+    if not hasattr(events, "yield_per"):
+        events = list(events)
+        yield len(events), iter(events)
+        return
+    session = Session(bind=events.session.get_bind())
+    try:
+        events = events.with_session(session)
+        yield events.count(), iter(events.yield_per(batch_size))
+    finally:
+        session.close()
+
 
 class ReplayBackend(object):
     """Replay backend which replays `events` from a completed experiment run.
@@ -13,10 +61,81 @@ class ReplayBackend(object):
     This is started during launch and delegates `event` selection and
     publication to the experiment class. `Events` are any objects with a
     creation_time attribute.
+
+    Events returned as a query are streamed from a server-side cursor, in a
+    session of their own (see :func:`stream_events`).
+
+    Events are replayed ``speed`` times faster than they originally happened,
+    or as fast as possible if ``speed`` is 0. Playback can be controlled while
+    the replay is running by sending JSON messages on the ``replay`` channel,
+    for example ``replay:{"speed": 10}`` to change the speed, or
+    ``replay:{"seek": 600}`` to jump forward to 10 minutes after the first
+    event, replaying the events in between without waiting.
     """
 
-    def __init__(self, experiment):
+    def __init__(self, experiment, speed=1.0):
         self.experiment = experiment
+        self.speed = check_speed(speed)
+        # Offset into the original timeline, in seconds from the first event,
+        # at the wall clock time `anchor`.
+        self.offset = 0.0
+        self.anchor = time.time()
+        self.changed = Event()
+
+    def position(self):
+        """The current offset into the original timeline, in seconds."""
+        return self.offset + (time.time() - self.anchor) * self.speed
+
+    def set_speed(self, speed):
+        """Change the playback rate. A speed of 0 replays as fast as possible."""
+        speed = check_speed(speed)
+        self.offset = self.position()
+        self.anchor = time.time()
+        self.speed = speed
+        self.changed.set()
+
+    def seek(self, offset):
+        """Skip forward to ``offset`` seconds after the first event. Events
+        before that point are replayed without waiting. Seeking backwards is
+        not supported, so earlier offsets are ignored.
+        """
+        if not _finite(offset):
+            raise ValueError("Replay offset must be a finite number")
+        self.offset = max(self.position(), offset)
+        self.anchor = time.time()
+        self.changed.set()
+
+    def send(self, raw_message):
+        """socket interface implementation, receiving playback controls
+        published on the replay channel, for example:
+
+            'replay:{"speed": 10, "seek": 600}'
+        """
+        try:
+            controls = json.loads(raw_message.split(":", 1)[1])
+            if "speed" in controls:
+                self.set_speed(float(controls["speed"]))
+            if "seek" in controls:
+                self.seek(float(controls["seek"]))
+        except (IndexError, TypeError, ValueError, AttributeError):
+            logger.warning("Ignoring invalid replay control: {}".format(raw_message))
+
+    def wait_for(self, event_offset):
+        """Sleep until playback reaches ``event_offset``, waking up early
+        if the speed is changed or a seek is requested.
+        """
+        while self.speed:
+            delay = (event_offset - self.position()) / self.speed
+            if delay <= 0:
+                return
+            self.changed.clear()
+            self.changed.wait(delay)
+        # Replaying as fast as possible: keep track of where we are, so that
+        # slowing down again carries on from here, and let other greenlets
+        # (such as the one relaying playback controls) run.
+        self.offset = max(self.offset, event_offset)
+        self.anchor = time.time()
+        gevent.sleep(0)
 
     def __call__(self):
         gevent.sleep(0.200)
@@ -33,45 +152,49 @@ class ReplayBackend(object):
             gevent.sleep(0.01)
 
         self.experiment.log("Looping through replayable data", key="replay")
-        timestamp = self.timestamp
-        events = self.experiment.events_for_replay()
+        with stream_events(self.experiment.events_for_replay()) as (total, stream):
+            self.replay(total, stream)
+        self.experiment.replay_finish()
 
-        if not events.count():
-            self.experiment.replay_finish()
+    def replay(self, total, stream):
+        """Replay the ``total`` events from the iterator ``stream``."""
+        timestamp = self.timestamp
+        first = next(stream, None)
+        if not total or first is None:
             return
 
-        first_timestamp = timestamp(events[0].creation_time)
+        first_timestamp = timestamp(first.creation_time)
         self.experiment.log(
             "Found {} messages to replay starting from {}".format(
-                events.count(), events[0].creation_time
+                total, first.creation_time
             ),
             key="replay",
         )
-        start = time.time()
-        for event in events:
+        start = self.anchor = time.time()
+        replayed = 0
+        for event in itertools.chain([first], stream):
             event_offset = timestamp(event.creation_time) - first_timestamp
-            cur_offset = time.time() - start
-            if event_offset >= cur_offset:
-                if (event_offset - cur_offset) > 1:
+            if self.speed:
+                delay = (event_offset - self.position()) / self.speed
+                if delay > 1:
                     self.experiment.log(
                         "Waiting {} seconds to replay {} {}".format(
-                            event_offset - cur_offset, event.type, event.id
+                            delay, event.type, event.id
                         ),
                         key="replay",
                     )
-                gevent.sleep(event_offset - cur_offset)
+            self.wait_for(event_offset)
             self.experiment.replay_event(event)
+            replayed += 1
 
         self.experiment.log(
             "Replayed {} events in {} seconds (original duration {} seconds)".format(
-                events.count(),
+                replayed,
                 time.time() - start,
                 timestamp(event.creation_time) - first_timestamp,
             ),
             key="replay",
         )
-        self.experiment.replay_finish()
-        return
 
     @staticmethod
     def timestamp(dt):
@@ -12,11 +12,16 @@ import gevent
 import os
 import six
 import socket
+import struct
 
 sockets = Sockets(app)
 
 HEARTBEAT_DELAY = 30
 
+# Binary frames start with the length of the channel name as an unsigned,
+# big-endian short, followed by the utf-8 channel name and the raw payload.
+FRAME_HEADER = struct.Struct("!H")
+
 
 def log(msg, level="info"):
     # Log including pid and greenlet id
@@ -24,6 +29,24 @@ def log(msg, level="info"):
     logfunc("{}/{}: {}".format(os.getpid(), id(gevent.hub.getcurrent()), msg))
 
 
+def encode_frame(channel, payload):
+    """Pack a channel name and an opaque payload into a binary frame."""
+    if isinstance(channel, six.text_type):
+        channel = channel.encode("utf-8")
+    if isinstance(payload, six.text_type):
+        payload = payload.encode("utf-8")
+    return FRAME_HEADER.pack(len(channel)) + channel + bytes(payload)
+
+
+def decode_frame(frame):
+    """Split a binary frame into its channel name and its opaque payload."""
+    frame = bytes(frame)
+    (length,) = FRAME_HEADER.unpack_from(frame)
+    start = FRAME_HEADER.size
+    channel = frame[start : start + length].decode("utf-8")
+    return channel, frame[start + length :]
+
+
 class Channel(object):
     """A channel relays messages from a redis pubsub to multiple clients.
 
@@ -31,6 +54,8 @@ class Channel(object):
     on the specified channel name.
 
     When a message is received, it is relayed to all clients that have subscribed.
+    Clients which negotiated binary framing receive the payload as-is, without
+    it being decoded and re-encoded as text.
     """
 
     def __init__(self, name):
@@ -67,11 +92,37 @@ class Channel(object):
             data = message.get("data")
             if message["type"] == "message" and data != "None":
                 channel = message["channel"]
-                payload = "{}:{}".format(channel.decode("utf-8"), data.decode("utf-8"))
+                payload = frame = None
                 for client in self.clients:
-                    gevent.spawn(client.send, payload)
+                    if isinstance(client, BinaryClient):
+                        if frame is None:
+                            frame = encode_frame(channel, data)
+                        gevent.spawn(client.send, frame)
+                    else:
+                        if payload is None:
+                            payload = self.text_payload(channel, data)
+                        if payload:
+                            gevent.spawn(client.send, payload)
             gevent.sleep(0.001)
 
+    def text_payload(self, channel, data):
+        """Format a message for text clients, as ``channel:data``.
+
+        Binary clients may publish payloads which aren't valid utf-8, such as
+        MessagePack. Those can't be relayed to text clients, so an empty
+        payload is returned and the message is only sent to binary clients.
+        """
+        try:
+            return "{}:{}".format(channel.decode("utf-8"), data.decode("utf-8"))
+        except UnicodeDecodeError:
+            log(
+                "Not relaying non utf-8 message on channel {} to text clients".format(
+                    self.name
+                ),
+                level="warning",
+            )
+            return ""
+
     def start(self):
         """Start relaying messages."""
         self.greenlet = gevent.spawn(self.listen)
@@ -151,16 +202,58 @@ class Client(object):
             gevent.sleep(self.lag_tolerance_secs)
             message = self.ws.receive()
             if message is not None:
-                channel_name, data = message.split(":", 1)
+                channel_name, data = self.parse(message)
                 redis_conn.publish(channel_name, data)
 
+    def parse(self, message):
+        """Split an incoming message into a channel name and its data."""
+        return message.split(":", 1)
+
+
+class BinaryClient(Client):
+    """A websocket client which exchanges length-prefixed binary frames.
+
+    Payloads are treated as opaque bytes (typically MessagePack encoded by
+    the browser), so they are relayed to and from redis without decoding.
+    """
+
+    def send(self, message):
+        """Send a single message to the websocket.
+
+        Binary frames are sent as-is. Text, such as the heartbeat ``ping``,
+        is sent as a regular text message.
+        """
+        with self.send_lock:
+            try:
+                if isinstance(message, bytes):
+                    self.ws.send(message, binary=True)
+                else:
+                    self.ws.send(message)
+            except socket.error:
+                chat_backend.unsubscribe(self)
+
+    def parse(self, message):
+        """Split an incoming frame into a channel name and its raw payload.
+
+        Text messages in the ``channel:data`` format are still accepted.
+        """
+        if isinstance(message, six.text_type):
+            return super(BinaryClient, self).parse(message)
+        return decode_frame(message)
+
 
 @sockets.route("/chat")
 def chat(ws):
     """Relay chat messages to and from clients.
+
+    Passing ``format=binary`` in the query string opts in to binary framing.
     """
     lag_tolerance_secs = float(request.args.get("tolerance", 0.1))
-    client = Client(ws, lag_tolerance_secs=lag_tolerance_secs)
+    if request.args.get("format") == "binary":
+        client_class = BinaryClient
+    else:
+        client_class = Client
+    client = client_class(ws, lag_tolerance_secs=lag_tolerance_secs)
     client.subscribe(request.args.get("channel"))
     gevent.spawn(client.heartbeat)
     client.publish()
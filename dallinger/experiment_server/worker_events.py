@@ -1,16 +1,28 @@
 import logging
+import math
+import sys
 from datetime import datetime
+from datetime import timedelta
+from functools import wraps
 from operator import attrgetter
 from rq import Queue
 from rq import get_current_job
 from dallinger import db
 from dallinger import information
 from dallinger import models
+from dallinger.models import timenow
 from dallinger.config import get_config
 
 
 logger = logging.getLogger(__name__)
 
+# The experiment class is loaded once per worker process, and reloaded only
+# if the ``dallinger_experiment`` package itself is replaced.
+_experiment_class_cache = {}
+
+EVENT_CLAIM_PREFIX = "event_claim:"
+EVENT_CLAIM_TTL = 60 * 60 * 24 * 7
+
 
 def _config():
     config = get_config()
@@ -20,10 +32,18 @@ def _config():
     return config
 
 
-def _loaded_experiment(args):
+def _experiment_class():
     from dallinger import experiment
 
-    klass = experiment.load()
+    package = sys.modules.get("dallinger_experiment")
+    if package is None or _experiment_class_cache.get("package") is not package:
+        _experiment_class_cache["klass"] = experiment.load()
+        _experiment_class_cache["package"] = sys.modules.get("dallinger_experiment")
+    return _experiment_class_cache["klass"]
+
+
+def _loaded_experiment(args):
+    klass = _experiment_class()
     return klass(args)
 
 
@@ -32,22 +52,77 @@ def _get_queue(name="default"):
     return Queue(name, connection=db.redis_conn)
 
 
+def _event_claim_key(event_type, assignment_id):
+    if assignment_id is None or event_type not in WorkerEvent.once_only_event_types:
+        return None
+    return "{}{}:{}".format(EVENT_CLAIM_PREFIX, assignment_id, event_type)
+
+
+def release_event_claim(event_type, assignment_id):
+    """Allow an event which was claimed but not processed to run again."""
+    key = _event_claim_key(event_type, assignment_id)
+    if key is not None:
+        db.redis_conn.delete(key)
+
+
+def clear_event_claims():
+    """Forget which events have been processed, so they can run again."""
+    keys = list(db.redis_conn.scan_iter(EVENT_CLAIM_PREFIX + "*"))
+    if keys:
+        db.redis_conn.delete(*keys)
+
+
+def deduplicated(func):
+    """Process events which may only happen once per assignment at most once.
+
+    MTurk notifications, resubmissions and the ``/worker_complete`` route can
+    all report the same event. The first job to claim the
+    ``(assignment_id, event_type)`` pair in redis processes it; later ones are
+    dropped before the experiment is loaded. The claim is released if
+    processing fails, so the event can be retried.
+    """
+
+    @wraps(func)
+    def wrapper(event_type, assignment_id, *args, **kwargs):
+        key = _event_claim_key(event_type, assignment_id)
+        if key is None:
+            return func(event_type, assignment_id, *args, **kwargs)
+        if not db.redis_conn.set(key, 1, nx=True, ex=EVENT_CLAIM_TTL):
+            logger.info(
+                "Dropping duplicate {} event for assignment {}".format(
+                    event_type, assignment_id
+                )
+            )
+            return
+        try:
+            return func(event_type, assignment_id, *args, **kwargs)
+        except Exception:
+            release_event_claim(event_type, assignment_id)
+            raise
+
+    return wrapper
+
+
 @db.scoped_session_decorator
+@deduplicated
 def worker_function(
     event_type, assignment_id, participant_id, node_id=None, details=None
 ):
     """Process the notification."""
-    _config()
-    q = _get_queue()
-    try:
-        db.logger.debug(
-            "rq: worker_function working on job id: %s", get_current_job().id
-        )
-        db.logger.debug(
-            "rq: Received Queue Length: %d (%s)", len(q), ", ".join(q.job_ids)
-        )
-    except AttributeError:
-        db.logger.debug("Debug worker_function called synchronously")
+    config = _config()
+    if db.logger.isEnabledFor(logging.DEBUG):
+        # Listing the queue is a round trip to redis, so only do it when
+        # the result will actually be logged.
+        q = _get_queue()
+        try:
+            db.logger.debug(
+                "rq: worker_function working on job id: %s", get_current_job().id
+            )
+            db.logger.debug(
+                "rq: Received Queue Length: %d (%s)", len(q), ", ".join(q.job_ids)
+            )
+        except AttributeError:
+            db.logger.debug("Debug worker_function called synchronously")
 
     exp = _loaded_experiment(db.session)
     key = "-----"
@@ -127,6 +202,7 @@ def worker_function(
                 "assignment_id. Notification will not be processed.",
                 key,
             )
+            release_event_claim(event_type, assignment_id)
             return None
 
     elif participant_id is not None:
@@ -140,12 +216,72 @@ def worker_function(
     participant_id = participant.id
 
     runner = runner_cls(
-        participant, assignment_id, exp, db.session, _config(), datetime.now()
+        participant, assignment_id, exp, db.session, config, datetime.now()
     )
     runner()
     db.session.commit()
 
 
+@db.scoped_session_decorator
+def tracking_events_function(node_id, events, sent_time=None):
+    """Record a batch of TrackingEvents for a node.
+
+    All events are written with a single multi-row INSERT, bypassing the ORM,
+    so neither the experiment nor an ``Info`` object per event is needed.
+    Because of this, :meth:`~dallinger.experiment.Experiment.info_post_request`
+    is not called for these events.
+
+    Events are dated when the batch is recorded, less how long before
+    ``sent_time`` their ``client_time`` is, so they keep the order they
+    happened in. Both times are in milliseconds on the participant's clock.
+    """
+    node = models.Node.query.get(node_id)
+    if node is None:
+        logger.warning("No node {} for TrackingEvent batch.".format(node_id))
+        return
+    if node.failed:
+        logger.warning("Ignoring TrackingEvent batch for failed {}.".format(node))
+        return
+    if not events:
+        return
+
+    now = timenow()
+    rows = [
+        {
+            "type": information.TrackingEvent.__mapper__.polymorphic_identity,
+            "origin_id": node.id,
+            "network_id": node.network_id,
+            "creation_time": _tracking_event_time(now, details, sent_time),
+            "failed": False,
+            "details": details or {},
+        }
+        for details in events
+    ]
+    db.session.execute(models.Info.__table__.insert().values(rows))
+    db.session.commit()
+
+
+def _tracking_event_time(now, details, sent_time):
+    """Date a TrackingEvent by how long before its batch was sent it happened."""
+    try:
+        delay = sent_time - float(details["client_time"])
+        if math.isnan(delay) or math.isinf(delay):
+            return now
+        return now - timedelta(milliseconds=max(delay, 0))
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return now
+
+
+@db.scoped_session_decorator
+def run_scheduled_task(name):
+    """Run an experiment method registered with
+    :func:`~dallinger.experiment.scheduled_task`.
+    """
+    _config()
+    exp = _loaded_experiment(db.session)
+    getattr(exp, name)()
+
+
 class WorkerEvent(object):
 
     key = "-----"
@@ -161,6 +297,9 @@ class WorkerEvent(object):
         "NotificationMissing",
     )
 
+    # Events which are processed at most once per assignment
+    once_only_event_types = ("AssignmentSubmitted", "BotAssignmentSubmitted")
+
     @classmethod
     def for_name(cls, name):
         if name in cls.supported_event_types:
@@ -585,6 +585,76 @@ var dallinger = (function () {
     return deferred;
   };
 
+  /**
+   * Packs a channel name and a binary payload into a frame for a socket opened
+   * with :func:`dallinger.openBinarySocket`. The payload is sent as-is, so it
+   * can be encoded with any binary format, e.g. MessagePack.
+   *
+   * @param {string} channel - name of the channel to publish to
+   * @param {ArrayBuffer|Uint8Array} payload - the encoded message
+   * @returns {Uint8Array} the frame
+   */
+  dlgr.encodeFrame = function (channel, payload) {
+    var name = unescape(encodeURIComponent(channel));
+    var bytes = new Uint8Array(payload);
+    var frame = new Uint8Array(2 + name.length + bytes.length);
+    frame[0] = (name.length >> 8) & 0xff;
+    frame[1] = name.length & 0xff;
+    for (var i = 0; i < name.length; i++) {
+      frame[2 + i] = name.charCodeAt(i);
+    }
+    frame.set(bytes, 2 + name.length);
+    return frame;
+  };
+
+  /**
+   * Unpacks a frame received from a socket opened with
+   * :func:`dallinger.openBinarySocket`.
+   *
+   * @param {ArrayBuffer|Uint8Array} frame - the received frame
+   * @returns {Object} an object with ``channel`` and ``payload`` (a ``Uint8Array``) properties
+   */
+  dlgr.decodeFrame = function (frame) {
+    var bytes = new Uint8Array(frame);
+    var length = (bytes[0] << 8) | bytes[1];
+    var name = String.fromCharCode.apply(null, bytes.subarray(2, 2 + length));
+    return {
+      channel: decodeURIComponent(escape(name)),
+      payload: bytes.subarray(2 + length)
+    };
+  };
+
+  /**
+   * Opens a websocket on ``channel`` which exchanges binary frames rather than
+   * ``channel:json`` text messages. Payloads are relayed by the server without
+   * being decoded, which avoids the cost of serializing large messages as JSON.
+   *
+   * @example
+   * var socket = dallinger.openBinarySocket("grid", function (channel, payload) {
+   *   var state = msgpack.decode(payload);
+   * });
+   * socket.send(dallinger.encodeFrame("grid", msgpack.encode(state)));
+   *
+   * @param {string} channel - name of the channel to subscribe to
+   * @param {function} callback - called with the channel name and payload of each frame
+   * @returns {ReconnectingWebSocket} the socket
+   */
+  dlgr.openBinarySocket = function (channel, callback) {
+    var ws_scheme = (window.location.protocol === "https:") ? 'wss://' : 'ws://';
+    var socket = new ReconnectingWebSocket(
+      ws_scheme + location.host + "/chat?format=binary&channel=" + encodeURIComponent(channel),
+      null,
+      {binaryType: "arraybuffer"}
+    );
+    socket.onmessage = function (msg) {
+      // Text messages, such as the heartbeat ping, are not frames.
+      if (typeof msg.data === "string") { return; }
+      var frame = dlgr.decodeFrame(msg.data);
+      callback(frame.channel, frame.payload);
+    };
+    return socket;
+  };
+
   dlgr.updateProgressBar = function (value, total) {
     var percent = Math.round((value / total) * 100.0) + '%';
     $("#waiting-progress-bar").css("width", percent);
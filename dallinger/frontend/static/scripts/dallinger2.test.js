@@ -125,3 +125,23 @@ describe('identity', function () {
   });
 
 });
+
+describe('binary frames', function () {
+  var dlgr;
+
+  beforeEach(function () {
+    dlgr = require('./dallinger2').dallinger;
+  });
+
+  test('encodeFrame prefixes the payload with the channel name length', () => {
+    var frame = dlgr.encodeFrame('chat', new Uint8Array([1, 2]));
+    expect(Array.from(frame)).toEqual([0, 4, 99, 104, 97, 116, 1, 2]);
+  });
+
+  test('decodeFrame reverses encodeFrame', () => {
+    var frame = dlgr.encodeFrame('chat:é', new Uint8Array([58, 3]));
+    var decoded = dlgr.decodeFrame(frame.buffer);
+    expect(decoded.channel).toBe('chat:é');
+    expect(Array.from(decoded.payload)).toEqual([58, 3]);
+  });
+});
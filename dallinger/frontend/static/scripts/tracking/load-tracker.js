@@ -29,7 +29,9 @@ var dlgr = window.dlgr = (window.dlgr || {});
       base_url: getBaseUrl(),
       trackScroll: true,
       trackSelection: true,
-      trackContents: true
+      trackContents: true,
+      batchSize: 20,
+      flushInterval: 5000
     });
   }
 
@@ -7,6 +7,8 @@ var ScribeDallingerTracker = function(config) {
   if (!(this instanceof ScribeDallingerTracker)) return new ScribeDallingerTracker(config);
 
   this.config = config;
+  this.queue = [];
+  this.flushTimeout = null;
   this.init();
 };
 
@@ -14,27 +16,62 @@ ScribeDallingerTracker.prototype.tracker = function(info) {
   var config = this.config;
   var path = info.path;
   var value = this.stripPII(info.value || {});
-  var data = new FormData();
 
   // Only track events
   if (path.indexOf('/events/') < 0) {
     return;
   }
-  if (config.base_url) {
-    data.append('info_type', 'TrackingEvent');
-    data.append('details', JSON.stringify(value));
-
-    var xhr = new XMLHttpRequest();
-    if (info.success) xhr.addEventListener("load", info.success);
-    if (info.failure) {
-      xhr.addEventListener("error", info.failure);
-      xhr.addEventListener("abort", info.failure);
-    }
-    xhr.open('POST', config.base_url.replace(/\/$/, "") + '/info/' + dlgr.node_id, true);
-    xhr.send(data);
-  } else if (info.failure) {
-    setTimeout(info.failure, 0);
+  if (!config.base_url) {
+    if (info.failure) setTimeout(info.failure, 0);
+    return;
+  }
+
+  // Events are buffered and sent to the server in batches, so record when
+  // each one happened, in milliseconds since the epoch
+  value.client_time = Date.now();
+  this.queue.push({details: value, success: info.success, failure: info.failure});
+  if (this.queue.length >= (config.batchSize || 20)) {
+    this.flush();
+  } else if (!this.flushTimeout) {
+    this.flushTimeout = setTimeout(this.flush.bind(this), config.flushInterval || 5000);
+  }
+};
+
+ScribeDallingerTracker.prototype.flush = function(useBeacon) {
+  var config = this.config;
+  var batch = this.queue;
+  var data = new FormData();
+  var url = config.base_url.replace(/\/$/, "") + '/tracking_events/' + dlgr.node_id;
+
+  clearTimeout(this.flushTimeout);
+  this.flushTimeout = null;
+  if (!batch.length) {
+    return;
+  }
+  this.queue = [];
+  data.append('events', JSON.stringify(batch.map(function (event) {
+    return event.details;
+  })));
+  data.append('sent_time', Date.now());
+
+  // The page is going away, so hand the request over to the browser
+  if (useBeacon && navigator.sendBeacon && navigator.sendBeacon(url, data)) {
+    return;
   }
+
+  var callbacks = function (name) {
+    return function () {
+      batch.forEach(function (event) {
+        if (event[name]) event[name]();
+      });
+    };
+  };
+  var xhr = new XMLHttpRequest();
+  xhr.addEventListener("load", callbacks('success'));
+  xhr.addEventListener("error", callbacks('failure'));
+  xhr.addEventListener("abort", callbacks('failure'));
+  xhr.open('POST', url, true);
+  xhr.send(data);
 };
 
 ScribeDallingerTracker.prototype.stripPII = function(value) {
@@ -137,6 +174,18 @@ ScribeDallingerTracker.prototype.init = function() {
   if (config.trackContents) {
     setTimeout(trackContents, 100);
   }
+
+  // Send any buffered events before leaving the page
+  var self = this;
+  var flushOnUnload = function () {
+    self.flush(true);
+  };
+  if (window.addEventListener) {
+    window.addEventListener('pagehide', flushOnUnload);
+    window.addEventListener('beforeunload', flushOnUnload);
+  } else if (window.attachEvent)  {
+    window.attachEvent('onbeforeunload', flushOnUnload);
+  }
 };
 
 module.exports.ScribeDallingerTracker = ScribeDallingerTracker;
@@ -2,10 +2,16 @@
 
 from collections import defaultdict
 from datetime import datetime
+from datetime import timedelta
+from functools import wraps
+import socket
 from apscheduler.schedulers.blocking import BlockingScheduler
+from rq import Queue
 
 import dallinger
 from dallinger import recruiters
+from dallinger.db import redis_conn
+from dallinger.experiment_server.worker_events import run_scheduled_task
 from dallinger.models import Participant
 from dallinger.utils import ParticipationTime
 
@@ -15,6 +21,99 @@ exp = dallinger.experiment.load()
 
 scheduler = BlockingScheduler()
 
+# Recruiter instances, by name, reused across checks.
+_recruiters = {}
+
+LEASE_PREFIX = "dallinger:clock_lease:"
+
+# Leases expire a little before the job's next run, so the process that ran
+# it last time isn't locked out by its own lease.
+LEASE_FRACTION = 0.9
+
+
+def acquire_lease(name, minutes):
+    """Claim the job ``name`` for most of its ``minutes`` long interval.
+
+    Returns False if another clock process already holds the lease, in which
+    case the job has run (or is running) elsewhere and should be skipped.
+    """
+    milliseconds = max(1, int(minutes * 60 * 1000 * LEASE_FRACTION))
+    return bool(
+        redis_conn.set(
+            LEASE_PREFIX + name, socket.gethostname(), nx=True, px=milliseconds
+        )
+    )
+
+
+def leased(minutes):
+    """Run the decorated job only if this process acquires its lease."""
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if acquire_lease(func.__name__, minutes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def run_experiment_task(name, minutes, queue=None):
+    """Run one of the experiment's scheduled tasks, inline or by enqueuing
+    it on an rq queue, unless another clock process has already done so.
+    """
+    if not acquire_lease("task:" + name, minutes):
+        return
+    if queue is None:
+        run_scheduled_task(name)
+    else:
+        Queue(queue, connection=redis_conn).enqueue(run_scheduled_task, name)
+
+
+def register_experiment_tasks(experiment_class):
+    """Schedule the tasks registered by the experiment with
+    :func:`~dallinger.experiment.scheduled_task`.
+    """
+    for name, schedule in sorted(experiment_class.scheduled_tasks().items()):
+        scheduler.add_job(
+            run_experiment_task,
+            "interval",
+            minutes=schedule["minutes"],
+            args=(name, schedule["minutes"], schedule["queue"]),
+            id="task:" + name,
+            replace_existing=True,
+        )
+
+
+def get_recruiter(name):
+    """Return the recruiter with the given name, creating it only once."""
+    if name not in _recruiters:
+        _recruiters[name] = recruiters.by_name(name)
+    return _recruiters[name]
+
+
+def overdue_participants(config, reference_time):
+    """Return working participants who have been active for longer than the
+    experiment duration plus the grace period.
+
+    The comparison is made against a cutoff time computed here, so the
+    database can answer it from the (status, creation_time) index rather
+    than returning every working participant.
+    """
+    allowed = timedelta(
+        hours=config.get("duration"),
+        seconds=ParticipationTime.grace_period_seconds,
+    )
+    cutoff = reference_time - allowed
+    return (
+        Participant.query.filter(
+            Participant.status == "working", Participant.creation_time < cutoff
+        )
+        .order_by(Participant.creation_time)
+        .all()
+    )
+
 
 def run_check(participants, config, reference_time):
     """For each participant, if they've been active for longer than the
@@ -31,16 +130,17 @@ def run_check(participants, config, reference_time):
             recruiters_with_late_participants[p.recruiter_id].append(p)
 
     for recruiter_id, participants in recruiters_with_late_participants.items():
-        recruiter = recruiters.by_name(recruiter_id)
+        recruiter = get_recruiter(recruiter_id)
         recruiter.notify_duration_exceeded(participants, reference_time)
 
 
 @scheduler.scheduled_job("interval", minutes=0.5)
+@leased(minutes=0.5)
 def check_db_for_missing_notifications():
     """Check the database for missing notifications."""
     config = dallinger.config.get_config()
-    participants = Participant.query.filter_by(status="working").all()
     reference_time = datetime.now()
+    participants = overdue_participants(config, reference_time)
 
     run_check(participants, config, reference_time)
 
@@ -49,4 +149,5 @@ def launch():
     config = dallinger.config.get_config()
     if not config.ready:
         config.load()
+    register_experiment_tasks(exp)
     scheduler.start()
@@ -13,6 +13,9 @@ monkey.patch_all()
 
 import logging
 import signal
+import time
+from collections import deque
+
 import gevent
 import gevent.pool
 from rq import Worker
@@ -21,8 +24,11 @@ from rq.timeouts import BaseDeathPenalty, JobTimeoutException
 from rq.worker import StopRequested, green, blue, WorkerStatus
 from rq.exceptions import DequeueTimeout
 from rq.logutils import setup_loghandlers
+from rq.utils import utcnow
 from rq.version import VERSION
 
+from dallinger.heroku import worker_metrics
+
 
 class GeventDeathPenalty(BaseDeathPenalty):
     def setup_death_penalty(self):
@@ -37,14 +43,31 @@ class GeventDeathPenalty(BaseDeathPenalty):
 
 
 class GeventWorker(Worker):
+    """An rq worker which runs jobs concurrently in a pool of greenlets.
+
+    With ``min_pool_size`` and ``max_pool_size``, the number of concurrent
+    jobs is adjusted between those bounds according to queue depth and job
+    run times (see :func:`dallinger.heroku.worker_metrics.target_pool_size`).
+    Queue wait and run times of every job are recorded in redis.
+    """
+
     death_penalty_class = GeventDeathPenalty
     DEFAULT_POOL_SIZE = 20
+    POOL_ADJUST_INTERVAL = 5
+    RUN_TIME_SAMPLES = 200
 
     def __init__(self, *args, **kwargs):
         pool_size = self.DEFAULT_POOL_SIZE
         if "pool_size" in kwargs:
             pool_size = kwargs.pop("pool_size")
-        self.gevent_pool = gevent.pool.Pool(pool_size)
+        self.min_pool_size = kwargs.pop("min_pool_size", None) or pool_size
+        self.max_pool_size = max(
+            kwargs.pop("max_pool_size", None) or pool_size, self.min_pool_size
+        )
+        self.pool_limit = min(max(pool_size, self.min_pool_size), self.max_pool_size)
+        self.gevent_pool = gevent.pool.Pool(self.max_pool_size)
+        self.run_times = deque(maxlen=self.RUN_TIME_SAMPLES)
+        self.last_pool_adjustment = 0
         self.children = []
         self.gevent_worker = None
         super(GeventWorker, self).__init__(*args, **kwargs)
@@ -52,11 +75,55 @@ class GeventWorker(Worker):
     def register_birth(self):
         super(GeventWorker, self).register_birth()
         self.connection.hset(self.key, "pool_size", self.gevent_pool.size)
+        self.connection.hset(self.key, "pool_limit", self.pool_limit)
 
     def heartbeat(self, timeout=0, pipeline=None):
         connection = pipeline if pipeline is not None else self.connection
         super(GeventWorker, self).heartbeat(timeout)
         connection.hset(self.key, "curr_pool_len", len(self.gevent_pool))
+        connection.hset(self.key, "pool_limit", self.pool_limit)
+
+    def pool_full(self):
+        return len(self.gevent_pool) >= self.pool_limit
+
+    def adjust_pool_limit(self):
+        """Grow or shrink the number of concurrent jobs, at most once every
+        POOL_ADJUST_INTERVAL seconds.
+        """
+        if self.min_pool_size == self.max_pool_size:
+            return
+        now = time.time()
+        if now - self.last_pool_adjustment < self.POOL_ADJUST_INTERVAL:
+            return
+        self.last_pool_adjustment = now
+        depth = sum(queue.count for queue in self.queues)
+        limit = worker_metrics.target_pool_size(
+            self.pool_limit,
+            self.min_pool_size,
+            self.max_pool_size,
+            depth,
+            len(self.gevent_pool),
+            self.run_times,
+        )
+        if limit != self.pool_limit:
+            self.log.info(
+                "RQ GEVENT worker pool limit %s -> %s (queue depth %s)",
+                self.pool_limit,
+                limit,
+                depth,
+            )
+            self.pool_limit = limit
+
+    def record_job_metrics(self, job, queue, started):
+        run = (utcnow() - started).total_seconds()
+        wait = 0
+        if job.enqueued_at is not None:
+            wait = max((started - job.enqueued_at).total_seconds(), 0)
+        self.run_times.append(run)
+        try:
+            worker_metrics.record_job(self.connection, queue.name, wait, run)
+        except Exception:
+            self.log.exception("Could not record metrics for job %s", job.id)
 
     def _install_signal_handlers(self):
         def request_force_stop():
@@ -101,8 +168,8 @@ class GeventWorker(Worker):
         self.did_perform_work = False
         self.register_birth()
         self.log.info(
-            "RQ GEVENT worker (Greenlet pool size={0}) {1!r} started, version {2}".format(
-                self.gevent_pool.size, self.key, VERSION
+            "RQ GEVENT worker (Greenlet pool size={0}, limit={1}) {2!r} started, version {3}".format(
+                self.gevent_pool.size, self.pool_limit, self.key, VERSION
             )
         )
         self.set_state(WorkerStatus.STARTED)
@@ -159,9 +226,12 @@ class GeventWorker(Worker):
         return self.gevent_worker.value
 
     def execute_job(self, job, queue):
+        started = utcnow()
+
         def job_done(child):
             self.children.remove(child)
             self.did_perform_work = True
+            self.record_job_metrics(job, queue, started)
             self.heartbeat()
             if job.get_status() == JobStatus.FINISHED:
                 queue.enqueue_dependents(job)
@@ -180,18 +250,20 @@ class GeventWorker(Worker):
                 raise StopRequested()
 
             self.heartbeat()
+            self.adjust_pool_limit()
 
-            if self.gevent_pool.full():
+            if self.pool_full():
                 self.set_state(WorkerStatus.BUSY)
                 self.log.warning(
                     "RQ GEVENT worker greenlet pool empty current size %s",
-                    self.gevent_pool.size,
+                    self.pool_limit,
                 )
 
-            while self.gevent_pool.full():
+            while self.pool_full():
                 gevent.sleep(0.1)
                 if self._stop_requested:
                     raise StopRequested()
+                self.adjust_pool_limit()
 
             try:
                 result = self.queue_class.dequeue_any(
@@ -0,0 +1,114 @@
+"""Job latency and greenlet pool metrics for the rq gevent worker.
+
+The worker records how long each job waited in its queue and how long it ran.
+Samples are kept in redis, so they can be summarized from any process (see
+``dallinger worker_stats``) without importing the monkey-patching worker.
+"""
+
+import math
+
+from rq import Queue
+from rq import Worker
+
+METRICS_PREFIX = "dallinger:worker_metrics:"
+SAMPLE_SIZE = 1000
+PERCENTILES = (50, 90, 99)
+
+# A worker running jobs this much slower than usual is assumed to be waiting
+# on a shared resource (usually the database), so adding greenlets won't help.
+SLOWDOWN_FACTOR = 1.5
+RECENT_SAMPLES = 20
+
+
+def _key(*parts):
+    return METRICS_PREFIX + ":".join(parts)
+
+
+def record_job(connection, queue_name, wait, run):
+    """Store the queue wait and run times, in seconds, of a finished job."""
+    pipeline = connection.pipeline()
+    for name, value in (("wait", wait), ("run", run)):
+        key = _key(queue_name, name)
+        pipeline.lpush(key, "{:.6f}".format(value))
+        pipeline.ltrim(key, 0, SAMPLE_SIZE - 1)
+    pipeline.incr(_key(queue_name, "count"))
+    pipeline.sadd(_key("queues"), queue_name)
+    pipeline.execute()
+
+
+def samples(connection, queue_name, name):
+    """Return the most recent samples of ``wait`` or ``run`` times."""
+    return [float(v) for v in connection.lrange(_key(queue_name, name), 0, -1)]
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(ordered))) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+def _describe(values):
+    description = {"p{}".format(pct): percentile(values, pct) for pct in PERCENTILES}
+    description["max"] = max(values) if values else None
+    return description
+
+
+def summary(connection):
+    """Summarize job latencies per queue, and the pools of running workers."""
+    queues = {}
+    names = sorted(n.decode("utf-8") for n in connection.smembers(_key("queues")))
+    for name in names:
+        count = connection.get(_key(name, "count"))
+        queues[name] = {
+            "depth": Queue(name, connection=connection).count,
+            "jobs": int(count or 0),
+            "wait": _describe(samples(connection, name, "wait")),
+            "run": _describe(samples(connection, name, "run")),
+        }
+
+    workers = []
+    for worker in Worker.all(connection=connection):
+        size, limit, busy = connection.hmget(
+            worker.key, "pool_size", "pool_limit", "curr_pool_len"
+        )
+        workers.append(
+            {
+                "name": worker.name,
+                "pool_size": int(size or 0),
+                "pool_limit": int(limit or size or 0),
+                "busy": int(busy or 0),
+            }
+        )
+
+    return {"queues": queues, "workers": workers}
+
+
+def target_pool_size(current, minimum, maximum, depth, busy, run_times):
+    """Choose how many jobs a worker should run concurrently.
+
+    ``depth`` is the number of jobs waiting, ``busy`` the number currently
+    running and ``run_times`` the worker's own recent job durations, oldest
+    first. The pool grows while jobs are backing up, unless jobs have slowed
+    down, which suggests they are waiting on the database. It shrinks when
+    jobs slow down, or when the queue is empty and most greenlets are idle.
+    """
+    run_times = list(run_times)
+    recent = run_times[-RECENT_SAMPLES:]
+    slowed = False
+    if len(run_times) > len(recent):
+        typical = sum(run_times) / len(run_times)
+        slowed = sum(recent) / len(recent) > typical * SLOWDOWN_FACTOR
+
+    if slowed:
+        target = current - max(1, current // 4)
+    elif depth and busy >= current:
+        target = current + min(depth, max(1, current // 2))
+    elif not depth and busy < current // 2:
+        target = current - 1
+    else:
+        target = current
+
+    return min(max(target, minimum), maximum)
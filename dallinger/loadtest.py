@@ -0,0 +1,408 @@
+"""Drive many high-performance bots from a single process.
+
+Each bot runs in its own greenlet, and every request it makes is timed, so
+the experiment server's latency, error rate and throughput can be reported
+per route once all the bots have finished.
+
+Instead of bots, the traffic of a past experiment can be replayed from its
+exported data, preserving the timing of every participant's requests.
+"""
+
+from __future__ import division
+
+from collections import Counter
+from collections import defaultdict
+from datetime import datetime
+from timeit import default_timer
+from zipfile import ZipFile
+import csv
+import io
+import logging
+import os
+import random
+import re
+import uuid
+
+from requests.exceptions import RequestException
+from six.moves import urllib
+import gevent
+import six
+
+from dallinger.heroku.worker_metrics import percentile
+from dallinger.heroku.worker_metrics import PERCENTILES
+from dallinger.utils import generate_random_id
+
+logger = logging.getLogger(__file__)
+
+# Path segments which are kept as they are when grouping requests by route.
+# Anything else, such as a worker id, is replaced with a placeholder.
+ROUTE_SEGMENT = re.compile(r"^[a-z_]+$")
+
+
+def route(method, url):
+    """Return a label grouping requests to the same route, such as
+    ``GET /worker_complete`` or ``POST /question/<id>``.
+    """
+    path = urllib.parse.urlparse(url).path
+    segments = [
+        segment if ROUTE_SEGMENT.match(segment) else "<id>"
+        for segment in path.strip("/").split("/")
+    ]
+    return "{} /{}".format(method, "/".join(segments))
+
+
+class LoadTestStats(object):
+    """Request timings and bot outcomes collected during a load test."""
+
+    def __init__(self):
+        self.started = default_timer()
+        self.finished = None
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.bots_completed = 0
+        self.bots_failed = 0
+
+    def record(self, method, url, seconds, ok=True):
+        label = route(method, url)
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+    def finish(self):
+        self.finished = default_timer()
+
+    @property
+    def duration(self):
+        return (self.finished or default_timer()) - self.started
+
+    def summary(self):
+        duration = self.duration
+        routes = {}
+        for label, latencies in self.latencies.items():
+            description = {
+                "p{}".format(pct): percentile(latencies, pct) for pct in PERCENTILES
+            }
+            description.update(
+                {
+                    "requests": len(latencies),
+                    "errors": self.errors[label],
+                    "error_rate": self.errors[label] / len(latencies),
+                    "throughput": len(latencies) / duration if duration else None,
+                }
+            )
+            routes[label] = description
+        return {
+            "duration": duration,
+            "bots_completed": self.bots_completed,
+            "bots_failed": self.bots_failed,
+            "requests": sum(len(times) for times in self.latencies.values()),
+            "routes": routes,
+        }
+
+
+# Entry point which applies gevent's patches before anything else is imported.
+LOAD_TEST_SCRIPT = "dallinger_load_test"
+
+
+def io_patched():
+    """Whether blocking network I/O is cooperative, so bots run concurrently.
+
+    The standard library has to be patched before requests and ssl are
+    imported, which is done by starting the load test with
+    ``dallinger_load_test``.
+    """
+    from gevent import monkey
+
+    return monkey.is_module_patched("socket")
+
+
+def relaunch_with_patched_io(args):
+    """Replace this process with the load test entry point, run with ``args``."""
+    os.execvp(LOAD_TEST_SCRIPT, [LOAD_TEST_SCRIPT] + list(args))
+
+
+def build_bot(bot_class, base_url):
+    """Create a bot with fresh ids, the way the bot recruiter does."""
+    worker, hit, assignment = (generate_random_id() for _ in range(3))
+    url = "{}/ad?recruiter=bots&assignmentId={}&hitId={}&workerId={}&mode=debug"
+    url = url.format(base_url, assignment, hit, worker)
+    return bot_class(url, assignment_id=assignment, worker_id=worker, hit_id=hit)
+
+
+def _run_bot(bot, stats):
+    try:
+        bot.run_experiment()
+    except Exception:
+        logger.exception("Bot {} failed.".format(bot.worker_id))
+        stats.bots_failed += 1
+    else:
+        stats.bots_completed += 1
+
+
+def run_load_test(bot_class, base_url, bots, rate=None):
+    """Run ``bots`` bots against the experiment server at ``base_url``.
+
+    Bots arrive as a Poisson process with ``rate`` arrivals per second, or
+    all at once if no rate is given. Returns the collected
+    :class:`LoadTestStats` once every bot has finished.
+    """
+    stats = LoadTestStats()
+    greenlets = []
+    for index in range(bots):
+        if rate and index:
+            gevent.sleep(random.expovariate(rate))
+        bot = build_bot(bot_class, base_url)
+        bot.stats = stats
+        greenlets.append(gevent.spawn(_run_bot, bot, stats))
+    gevent.joinall(greenlets)
+    stats.finish()
+    return stats
+
+
+# Participants in these states reported their completion to the server.
+COMPLETED_STATUSES = ("submitted", "approved", "rejected", "did_not_attend", "bad_data")
+
+# Requests made at the same moment by one participant are replayed in the
+# order the experiment server must have received them.
+ACTION_ORDER = ("participant", "node", "info", "transmit", "question", "complete")
+
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S")
+
+REQUEST_TIMEOUT = 30.0
+
+
+def _timestamp(value):
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+    raise ValueError("Unrecognized timestamp: {!r}".format(value))
+
+
+def _read_table(archive, table):
+    filenames = [f for f in archive.namelist() if f.endswith("/{}.csv".format(table))]
+    if not filenames:
+        return []
+    file = archive.open(filenames[0])
+    if six.PY3:
+        file = io.TextIOWrapper(file, encoding="utf8", newline="")
+    return list(csv.DictReader(file))
+
+
+def load_trace(path):
+    """Turn an export zip, as created by :func:`dallinger.data.export`, into
+    the requests each participant made.
+
+    Returns one list of ``(offset, action, data)`` steps per participant,
+    where ``offset`` is the number of seconds since the first participant
+    arrived. Nodes, infos and transmissions which were not created by a
+    participant, such as sources, are left out.
+    """
+    with ZipFile(path, "r") as archive:
+        participants = _read_table(archive, "participant")
+        nodes = _read_table(archive, "node")
+        infos = _read_table(archive, "info")
+        transmissions = _read_table(archive, "transmission")
+        questions = _read_table(archive, "question")
+
+    steps = {p["id"]: [] for p in participants}
+    for row in participants:
+        steps[row["id"]].append((_timestamp(row["creation_time"]), "participant", {}))
+        if row["end_time"] and row["status"] in COMPLETED_STATUSES:
+            steps[row["id"]].append((_timestamp(row["end_time"]), "complete", {}))
+
+    owners = {}
+    for row in nodes:
+        if row["participant_id"] in steps:
+            owners[row["id"]] = row["participant_id"]
+            data = {"node_id": row["id"]}
+            steps[row["participant_id"]].append(
+                (_timestamp(row["creation_time"]), "node", data)
+            )
+
+    for row in infos:
+        if row["origin_id"] in owners:
+            data = {
+                "node_id": row["origin_id"],
+                "info_id": row["id"],
+                "contents": row["contents"],
+                "info_type": row["type"],
+            }
+            steps[owners[row["origin_id"]]].append(
+                (_timestamp(row["creation_time"]), "info", data)
+            )
+
+    for row in transmissions:
+        if row["origin_id"] in owners:
+            data = {
+                "node_id": row["origin_id"],
+                "info_id": row["info_id"],
+                "destination_id": row["destination_id"],
+            }
+            steps[owners[row["origin_id"]]].append(
+                (_timestamp(row["creation_time"]), "transmit", data)
+            )
+
+    for row in questions:
+        if row["participant_id"] in steps:
+            data = {
+                "question": row["question"],
+                "number": row["number"],
+                "response": row["response"],
+            }
+            steps[row["participant_id"]].append(
+                (_timestamp(row["creation_time"]), "question", data)
+            )
+
+    if not participants:
+        return []
+    start = min(_timestamp(row["creation_time"]) for row in participants)
+    trace = []
+    for participant_steps in steps.values():
+        participant_steps.sort(key=lambda step: (step[0], ACTION_ORDER.index(step[1])))
+        trace.append(
+            [
+                ((when - start).total_seconds(), action, data)
+                for when, action, data in participant_steps
+            ]
+        )
+    trace.sort(key=lambda participant_steps: participant_steps[0][0])
+    return trace
+
+
+def _class_name(polymorphic_identity):
+    """The name of the Info class whose rows are stored with the type
+    ``polymorphic_identity``, such as ``TrackingEvent`` for ``tracking``.
+    """
+    import dallinger.information  # noqa: F401 (registers the Info classes)
+    from dallinger.models import Info
+
+    mapper = Info.__mapper__.polymorphic_map.get(polymorphic_identity)
+    if mapper is not None:
+        return mapper.class_.__name__
+    # Classes defined by the experiment are only known once it is loaded
+    return "".join(part.capitalize() for part in polymorphic_identity.split("_"))
+
+
+class TraceReplay(object):
+    """Replay the requests of a trace from :func:`load_trace`.
+
+    Each participant is replayed in its own greenlet. Requests are sent at
+    their original offsets divided by ``speed``, so a speed of 10 replays an
+    hour of traffic in six minutes. Ids in the trace are mapped to the ids
+    the server assigns, and requests referring to objects which could not be
+    created are skipped.
+    """
+
+    def __init__(self, base_url, speed=1.0, stats=None):
+        if not speed > 0:
+            raise ValueError("Replay speed must be greater than 0")
+        self.base_url = base_url
+        self.speed = speed
+        self.stats = stats or LoadTestStats()
+        self.nodes = {}
+        self.infos = {}
+        self.skipped = 0
+        self.started = None
+
+    def run(self, trace):
+        self.started = default_timer()
+        greenlets = [gevent.spawn(self.replay_participant, steps) for steps in trace]
+        gevent.joinall(greenlets)
+        self.stats.finish()
+        return self.stats
+
+    def wait_until(self, offset):
+        delay = self.started + offset / self.speed - default_timer()
+        if delay > 0:
+            gevent.sleep(delay)
+
+    def request(self, method, path, **kwargs):
+        """Send a request and return its decoded JSON body, or None if it
+        failed.
+        """
+        from dallinger.bots import http_session
+
+        url = self.base_url + path
+        started = default_timer()
+        try:
+            response = http_session().request(
+                method, url, timeout=REQUEST_TIMEOUT, **kwargs
+            )
+            response.raise_for_status()
+        except RequestException:
+            self.stats.record(method, url, default_timer() - started, False)
+            return None
+        self.stats.record(method, url, default_timer() - started)
+        return response.json()
+
+    def replay_participant(self, steps):
+        participant_id = None
+        try:
+            for offset, action, data in steps:
+                self.wait_until(offset)
+                if action == "participant":
+                    participant_id = self.create_participant()
+                elif participant_id is None:
+                    self.skipped += 1
+                else:
+                    getattr(self, action)(participant_id, data)
+        except Exception:
+            logger.exception("Replay of participant failed.")
+            self.stats.bots_failed += 1
+        else:
+            if participant_id is None:
+                self.stats.bots_failed += 1
+            else:
+                self.stats.bots_completed += 1
+
+    def create_participant(self):
+        worker, hit, assignment = (generate_random_id() for _ in range(3))
+        path = "/participant/{}/{}/{}/debug?fingerprint_hash={}&recruiter=bots"
+        path = path.format(worker, hit, assignment, uuid.uuid4().hex)
+        result = self.request("POST", path)
+        if result is None:
+            return None
+        return result["participant"]["id"]
+
+    def node(self, participant_id, data):
+        result = self.request("POST", "/node/{}".format(participant_id))
+        if result is not None:
+            self.nodes[data["node_id"]] = result["node"]["id"]
+
+    def info(self, participant_id, data):
+        node_id = self.nodes.get(data["node_id"])
+        if node_id is None:
+            self.skipped += 1
+            return
+        payload = {"contents": data["contents"]}
+        if data["info_type"] != "info":
+            payload["info_type"] = _class_name(data["info_type"])
+        result = self.request("POST", "/info/{}".format(node_id), data=payload)
+        if result is not None:
+            self.infos[data["info_id"]] = result["info"]["id"]
+
+    def transmit(self, participant_id, data):
+        node_id = self.nodes.get(data["node_id"])
+        info_id = self.infos.get(data["info_id"])
+        destination_id = self.nodes.get(data["destination_id"])
+        if None in (node_id, info_id, destination_id):
+            self.skipped += 1
+            return
+        payload = {"what": info_id, "to_whom": destination_id}
+        self.request("POST", "/node/{}/transmit".format(node_id), data=payload)
+
+    def question(self, participant_id, data):
+        self.request("POST", "/question/{}".format(participant_id), data=data)
+
+    def complete(self, participant_id, data):
+        path = "/worker_complete?participant_id={}".format(participant_id)
+        self.request("GET", path)
+
+
+def replay_trace(trace, base_url, speed=1.0):
+    """Replay a trace from :func:`load_trace` against the experiment server
+    at ``base_url``, and return the collected :class:`LoadTestStats`.
+    """
+    return TraceReplay(base_url, speed=speed).run(trace)
@@ -3,7 +3,7 @@
 from datetime import datetime
 import inspect
 
-from sqlalchemy import ForeignKey, or_, and_
+from sqlalchemy import ForeignKey, Index, or_, and_
 from sqlalchemy import Column, String, Text, Enum, Integer, Boolean, DateTime, Float
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql.expression import false
@@ -85,6 +85,9 @@ class Participant(Base, SharedMixin):
     """An ex silico participant."""
 
     __tablename__ = "participant"
+    __table_args__ = (
+        Index("ix_participant_status_creation_time", "status", "creation_time"),
+    )
 
     #: a String giving the name of the class. Defaults to
     #: "participant". This allows subclassing.
@@ -114,6 +117,15 @@ class Participant(Base, SharedMixin):
     #: sandbox or debug.
     mode = Column(String(50), nullable=False)
 
+    #: A dictionary of the columns holding personally identifiable
+    #: information, mapped to the SQL expressions which replace them when
+    #: data is exported with PII scrubbed (see
+    #: :func:`dallinger.data.pii_columns`). Subclasses can declare more.
+    pii_columns = {
+        "worker_id": "id::text",
+        "unique_id": "concat(id, ':', assignment_id)",
+    }
+
     #: The time at which the participant finished.
     end_time = Column(DateTime)
 
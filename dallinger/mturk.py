@@ -1,17 +1,24 @@
 import boto3
 import datetime
+import gevent
+import gevent.pool
 import logging
+import math
+import pickle
 import time
 
 from botocore.exceptions import ClientError
 from botocore.exceptions import NoCredentialsError
 from cached_property import cached_property
+from collections import OrderedDict
+from timeit import default_timer
 
 
 logger = logging.getLogger(__file__)
 PERCENTAGE_APPROVED_REQUIREMENT_ID = "000000000000000000L0"
 LOCALE_REQUIREMENT_ID = "00000000000000000071"
 MAX_SUPPORTED_BATCH_SIZE = 100
+THROTTLING_ERROR_CODES = ("Throttling", "ThrottlingException")
 
 
 class MTurkServiceException(Exception):
@@ -38,6 +45,61 @@ class RevokedQualification(MTurkServiceException):
     """The Qualification has been revoked for this worker."""
 
 
+class RequestThrottled(MTurkServiceException):
+    """MTurk refused a request because too many were made too quickly."""
+
+
+class LocalCache(object):
+    """Values cached in this process, each for ``ttl`` seconds."""
+
+    def __init__(self):
+        self._values = {}
+
+    def get(self, key):
+        value, expires = self._values.get(key, (None, 0))
+        if expires < default_timer():
+            self._values.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self._values[key] = (value, default_timer() + ttl)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._values.pop(key, None)
+
+
+class RedisCache(object):
+    """Values cached in redis, so they are shared by every process of an
+    experiment. Values are pickled, as rq does with its jobs.
+    """
+
+    prefix = "dallinger:mturk_cache:"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get(self, key):
+        value = self.connection.get(self.prefix + key)
+        if value is None:
+            return None
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self.connection.set(
+            self.prefix + key, pickle.dumps(value), px=int(math.ceil(ttl * 1000))
+        )
+
+    def delete(self, *keys):
+        self.connection.delete(*[self.prefix + key for key in keys])
+
+
+def _is_throttled(error):
+    code = error.response.get("Error", {}).get("Code")
+    return code in THROTTLING_ERROR_CODES
+
+
 class SNSService(object):
     """Handles AWS SNS subscriptions"""
 
@@ -119,8 +181,17 @@ class SNSService(object):
 class MTurkService(object):
     """Facade for Amazon Mechanical Turk services provided via the boto3
        library.
+
+       Qualification types, worker qualification scores and the workers
+       holding a qualification are cached for a while, in ``cache`` or in
+       this process, and invalidated whenever they are changed through this
+       service.
     """
 
+    qualification_type_ttl = 3600
+    qualification_score_ttl = 300
+    qualified_workers_ttl = 300
+
     def __init__(
         self,
         aws_access_key_id,
@@ -129,6 +200,7 @@ class MTurkService(object):
         sandbox=True,
         max_wait_secs=0,
         subscribe=True,
+        cache=None,
     ):
         self.aws_key = aws_access_key_id
         self.aws_secret = aws_secret_access_key
@@ -136,6 +208,7 @@ class MTurkService(object):
         self.is_sandbox = sandbox
         self.max_wait_secs = max_wait_secs
         self.do_subscribe = subscribe
+        self.cache = cache if cache is not None else LocalCache()
 
     @cached_property
     def mturk(self):
@@ -248,7 +321,9 @@ class MTurkService(object):
             if "already created a QualificationType with this name" in str(ex):
                 raise DuplicateQualificationNameError(str(ex))
 
-        return self._translate_qtype(response["QualificationType"])
+        qtype = self._translate_qtype(response["QualificationType"])
+        self._cache_qualification_type(qtype)
+        return qtype
 
     def get_qualification_type_by_name(self, name):
         """Return a Qualification Type by name. If the provided name matches
@@ -256,6 +331,14 @@ class MTurkService(object):
         match the provided name exactly. If there's an exact match, return
         that Qualification. Otherwise, raise an exception.
         """
+        qtype = self.cache.get(self._qtype_key(name))
+        if qtype is None:
+            qtype = self._find_qualification_type_by_name(name)
+            if qtype is not None:
+                self._cache_qualification_type(qtype, name)
+        return qtype
+
+    def _find_qualification_type_by_name(self, name):
         max_fuzzy_matches_to_check = 100
         query = name.upper()
         args = {
@@ -287,14 +370,19 @@ class MTurkService(object):
 
     def assign_qualification(self, qualification_id, worker_id, score, notify=False):
         """Score a worker for a specific qualification"""
-        return self._is_ok(
-            self.mturk.associate_qualification_with_worker(
-                QualificationTypeId=qualification_id,
-                WorkerId=worker_id,
-                IntegerValue=score,
-                SendNotification=notify,
+        try:
+            return self._is_ok(
+                self.mturk.associate_qualification_with_worker(
+                    QualificationTypeId=qualification_id,
+                    WorkerId=worker_id,
+                    IntegerValue=score,
+                    SendNotification=notify,
+                )
             )
-        )
+        finally:
+            # Forget the score afterwards, so that a lookup made while the
+            # change was in flight isn't kept.
+            self._invalidate_qualification(qualification_id, worker_id)
 
     # BBB:
     set_qualification_score = assign_qualification
@@ -313,15 +401,35 @@ class MTurkService(object):
         return {"qtype": result["qtype"], "score": new_score}
 
     def revoke_qualification(self, qualification_id, worker_id, reason=""):
-        return self._is_ok(
-            self.mturk.disassociate_qualification_from_worker(
-                QualificationTypeId=qualification_id, WorkerId=worker_id, Reason=reason
+        try:
+            return self._is_ok(
+                self.mturk.disassociate_qualification_from_worker(
+                    QualificationTypeId=qualification_id,
+                    WorkerId=worker_id,
+                    Reason=reason,
+                )
             )
-        )
+        finally:
+            self._invalidate_qualification(qualification_id, worker_id)
 
     def get_qualification_score(self, qualification_id, worker_id):
         """Return a worker's qualification score as an iteger.
         """
+        key = self._score_key(qualification_id, worker_id)
+        cached = self.cache.get(key)
+        if cached is None:
+            try:
+                score = self._fetch_qualification_score(qualification_id, worker_id)
+                cached = (None, score)
+            except (WorkerLacksQualification, RevokedQualification) as ex:
+                cached = (type(ex), str(ex))
+            self.cache.set(key, cached, self.qualification_score_ttl)
+        error, value = cached
+        if error is not None:
+            raise error(value)
+        return value
+
+    def _fetch_qualification_score(self, qualification_id, worker_id):
         try:
             response = self.mturk.get_qualification_score(
                 QualificationTypeId=qualification_id, WorkerId=worker_id
@@ -362,12 +470,27 @@ class MTurkService(object):
 
     def dispose_qualification_type(self, qualification_id):
         """Remove a qualification type we created"""
+        names = self.cache.get(self._qtype_names_key(qualification_id)) or []
+        self.cache.delete(
+            self._qtype_names_key(qualification_id),
+            self._workers_key(qualification_id),
+            *[self._qtype_key(name) for name in names]
+        )
         return self._is_ok(
             self.mturk.delete_qualification_type(QualificationTypeId=qualification_id)
         )
 
     def get_workers_with_qualification(self, qualification_id):
         """Get workers with the given qualification."""
+        key = self._workers_key(qualification_id)
+        workers = self.cache.get(key)
+        if workers is None:
+            workers = list(self._list_workers_with_qualification(qualification_id))
+            self.cache.set(key, workers, self.qualified_workers_ttl)
+        for worker in workers:
+            yield dict(worker)
+
+    def _list_workers_with_qualification(self, qualification_id):
         done = False
         next_token = None
         while not done:
@@ -525,7 +648,7 @@ class MTurkService(object):
             else:
                 done = True
 
-    def grant_bonus(self, assignment_id, amount, reason):
+    def grant_bonus(self, assignment_id, amount, reason, token=None):
         """Grant a bonus to the MTurk Worker.
         Issues a payment of money from your account to a Worker.  To
         be eligible for a bonus, the Worker must have submitted
@@ -533,6 +656,8 @@ class MTurkService(object):
         approved or rejected. This payment happens separately from the
         reward you pay to the Worker when you approve the Worker's
         assignment.
+
+        Retrying with the same ``token`` will not pay the bonus twice.
         """
         assignment = self.get_assignment(assignment_id)
         worker_id = assignment["worker_id"]
@@ -544,10 +669,12 @@ class MTurkService(object):
                     BonusAmount=amount_str,
                     AssignmentId=assignment_id,
                     Reason=reason,
-                    UniqueRequestToken=self._request_token(),
+                    UniqueRequestToken=token or self._request_token(),
                 )
             )
         except ClientError as ex:
+            if _is_throttled(ex):
+                raise RequestThrottled(str(ex))
             error = "Failed to pay assignment {} bonus of {}: {}".format(
                 assignment_id, amount_str, str(ex)
             )
@@ -576,6 +703,8 @@ class MTurkService(object):
                 self.mturk.approve_assignment(AssignmentId=assignment_id)
             )
         except ClientError as ex:
+            if _is_throttled(ex):
+                raise RequestThrottled(str(ex))
             assignment = self.get_assignment(assignment_id)
             raise MTurkServiceException(
                 "Failed to approve assignment {}, {}: {}".format(
@@ -615,6 +744,35 @@ class MTurkService(object):
         )
         return q.format(url, frame_height)
 
+    def _qtype_key(self, name):
+        return "qtype:{}".format(name.upper())
+
+    def _qtype_names_key(self, qualification_id):
+        return "qtype_names:{}".format(qualification_id)
+
+    def _score_key(self, qualification_id, worker_id):
+        return "score:{}:{}".format(qualification_id, worker_id)
+
+    def _workers_key(self, qualification_id):
+        return "workers:{}".format(qualification_id)
+
+    def _cache_qualification_type(self, qtype, name=None):
+        # A lookup by name can find a qualification with a different name,
+        # so remember every name it was cached under, to invalidate them all.
+        ttl = self.qualification_type_ttl
+        names_key = self._qtype_names_key(qtype["id"])
+        names = set(self.cache.get(names_key) or [])
+        names.update(n for n in (qtype["name"], name) if n is not None)
+        for cached_name in names:
+            self.cache.set(self._qtype_key(cached_name), qtype, ttl)
+        self.cache.set(names_key, sorted(names), ttl)
+
+    def _invalidate_qualification(self, qualification_id, worker_id):
+        self.cache.delete(
+            self._score_key(qualification_id, worker_id),
+            self._workers_key(qualification_id),
+        )
+
     def _request_token(self):
         return str(time.time())
 
@@ -666,3 +824,104 @@ class MTurkService(object):
 
     def _is_ok(self, response):
         return response == {} or list(response.keys()) == ["ResponseMetadata"]
+
+
+class MTurkActionExecutor(object):
+    """Dispatch approvals and bonuses to MTurk concurrently.
+
+    Actions are dicts with an ``action`` of ``"approve"`` or ``"bonus"``, an
+    ``assignment_id`` and, for bonuses, an ``amount``, a ``reason`` and an
+    optional idempotency ``token``. Actions for different assignments run in
+    up to ``concurrency`` greenlets, while those for the same assignment run
+    in order, since a bonus can only be paid once the assignment has been
+    approved. No more than ``rate`` requests are started per second, and a
+    throttled request makes every greenlet back off before it is retried.
+    """
+
+    def __init__(self, service, concurrency=10, rate=5.0, max_attempts=5, backoff=1.0):
+        self.service = service
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._next_slot = 0.0
+
+    def run(self, actions):
+        """Dispatch the actions and return ``(action, error)`` pairs, in the
+        order given, where ``error`` is None if the action succeeded.
+        """
+        by_assignment = OrderedDict()
+        for action in actions:
+            by_assignment.setdefault(action["assignment_id"], []).append(action)
+
+        results = {}
+        pool = gevent.pool.Pool(self.concurrency)
+        for assignment_actions in by_assignment.values():
+            pool.spawn(self._run_in_order, assignment_actions, results)
+        pool.join()
+        missing = [action for action in actions if id(action) not in results]
+        if missing:
+            raise MTurkServiceException(
+                "{} MTurk actions were not dispatched".format(len(missing))
+            )
+        return [(action, results[id(action)]) for action in actions]
+
+    def _run_in_order(self, actions, results):
+        error = None
+        for action in actions:
+            if error is None:
+                error = self.dispatch(action)
+            else:
+                error = "Skipped after an earlier action failed: {}".format(error)
+            results[id(action)] = error
+
+    def dispatch(self, action):
+        """Send one action to MTurk, retrying if throttled. Returns None on
+        success, or a description of the error.
+        """
+        for attempt in range(self.max_attempts):
+            self._wait_for_slot()
+            try:
+                self._call(action)
+            except (MTurkServiceException, ClientError) as ex:
+                throttled = isinstance(ex, RequestThrottled) or (
+                    isinstance(ex, ClientError) and _is_throttled(ex)
+                )
+                if not throttled:
+                    logger.exception(str(ex))
+                    return str(ex)
+                self._delay_all(self.backoff * 2 ** attempt)
+            except Exception as ex:
+                # Connection failures and the like must not stop the other
+                # actions in the batch from being dispatched and recorded
+                logger.exception(str(ex))
+                return str(ex) or type(ex).__name__
+            else:
+                return None
+        return "Still throttled after {} attempts".format(self.max_attempts)
+
+    def _call(self, action):
+        if action["action"] == "approve":
+            self.service.approve_assignment(action["assignment_id"])
+        elif action["action"] == "bonus":
+            self.service.grant_bonus(
+                action["assignment_id"],
+                action["amount"],
+                action["reason"],
+                token=action.get("token"),
+            )
+        else:
+            raise MTurkServiceException(
+                "Unknown MTurk action: {}".format(action["action"])
+            )
+
+    def _wait_for_slot(self):
+        now = default_timer()
+        slot = max(now, self._next_slot)
+        if self.rate:
+            self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            gevent.sleep(slot - now)
+
+    def _delay_all(self, seconds):
+        self._next_slot = max(self._next_slot, default_timer() + seconds)
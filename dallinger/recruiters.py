@@ -6,12 +6,15 @@ import logging
 import os
 import re
 import requests
+import uuid
 
 from rq import Queue
+from rq.job import Job
 from sqlalchemy import func
 
 from dallinger.config import get_config
 from dallinger.db import redis_conn
+from dallinger.db import scoped_session_decorator
 from dallinger.db import session
 from dallinger.experiment_server.utils import success_response
 from dallinger.experiment_server.utils import crossdomain
@@ -21,7 +24,9 @@ from dallinger.notifications import get_messenger
 from dallinger.notifications import MessengerError
 from dallinger.models import Participant
 from dallinger.models import Recruitment
+from dallinger.mturk import MTurkActionExecutor
 from dallinger.mturk import MTurkService
+from dallinger.mturk import RedisCache
 from dallinger.mturk import DuplicateQualificationNameError
 from dallinger.mturk import MTurkServiceException
 from dallinger.mturk import QualificationNotFoundException
@@ -43,6 +48,20 @@ def _get_queue(name="default"):
 NEW_RECRUIT_LOG_PREFIX = "New participant requested:"
 CLOSE_RECRUITMENT_LOG_PREFIX = "Close recruitment."
 
+# Approvals and bonuses waiting to be sent to MTurk in batches, and a lock
+# held while a job to dispatch them is queued or running.
+MTURK_ACTIONS_KEY = "dallinger:mturk_actions"
+MTURK_DISPATCH_KEY = "dallinger:mturk_actions:dispatching"
+MTURK_DISPATCH_TIMEOUT = 600
+MTURK_ACTION_BATCH_SIZE = 100
+# Actions whose dispatch failed this many times are set aside in a list of
+# their own, instead of being retried again.
+MTURK_FAILED_ACTIONS_KEY = "dallinger:mturk_actions:failed"
+MTURK_DISPATCH_ATTEMPTS = 5
+
+# An experiment's HIT doesn't change once participants have joined it.
+HIT_ID_TTL = 3600
+
 
 class Recruiter(object):
     """The base recruiter."""
@@ -443,11 +462,13 @@ class MTurkRecruiter(Recruiter):
         self.ad_url = "{}/ad?recruiter={}".format(base_url, self.nickname)
         self.notification_url = "{}/mturk-sns-listener".format(base_url)
         self.hit_domain = os.getenv("HOST")
+        self.cache = RedisCache(redis_conn)
         self.mturkservice = MTurkService(
             aws_access_key_id=self.config.get("aws_access_key_id"),
             aws_secret_access_key=self.config.get("aws_secret_access_key"),
             region_name=self.config.get("aws_region"),
             sandbox=self.config.get("mode") != "live",
+            cache=self.cache,
         )
         self.messenger = get_messenger(self.config)
         self._validate_config()
@@ -512,6 +533,7 @@ class MTurkRecruiter(Recruiter):
             "annotation": self.config.get("id"),
         }
         hit_info = self.mturkservice.create_hit(**hit_request)
+        self.cache.delete(self._hit_id_key)
         if self.config.get("mode") == "sandbox":
             lookup_url = (
                 "https://workersandbox.mturk.com/mturk/preview?groupId={type_id}"
@@ -625,6 +647,16 @@ class MTurkRecruiter(Recruiter):
 
     def reward_bonus(self, assignment_id, amount, reason):
         """Reward the Turker for a specified assignment with a bonus."""
+        if self.dispatches_in_batches:
+            return queue_mturk_action(
+                {
+                    "action": "bonus",
+                    "assignment_id": assignment_id,
+                    "amount": amount,
+                    "reason": reason,
+                    "token": uuid.uuid4().hex,
+                }
+            )
         try:
             return self.mturkservice.grant_bonus(assignment_id, amount, reason)
         except MTurkServiceException as ex:
@@ -639,7 +671,15 @@ class MTurkRecruiter(Recruiter):
     def qualification_active(self):
         return bool(self.config.get("assign_qualifications"))
 
+    @property
+    def _hit_id_key(self):
+        return "hit_id:{}:{}".format(self.config.get("id"), self.nickname)
+
     def current_hit_id(self):
+        hit_id = self.cache.get(self._hit_id_key)
+        if hit_id is not None:
+            return hit_id
+
         any_participant_record = (
             Participant.query.with_entities(Participant.hit_id)
             .filter_by(recruiter_id=self.nickname)
@@ -647,14 +687,61 @@ class MTurkRecruiter(Recruiter):
         )
 
         if any_participant_record is not None:
-            return str(any_participant_record.hit_id)
+            hit_id = str(any_participant_record.hit_id)
+            self.cache.set(self._hit_id_key, hit_id, HIT_ID_TTL)
+            return hit_id
 
     def approve_hit(self, assignment_id):
+        if self.dispatches_in_batches:
+            return queue_mturk_action(
+                {"action": "approve", "assignment_id": assignment_id}
+            )
         try:
             return self.mturkservice.approve_assignment(assignment_id)
         except MTurkServiceException as ex:
             logger.exception(str(ex))
 
+    @property
+    def dispatches_in_batches(self):
+        """Approvals and bonuses are queued, and sent to MTurk concurrently
+        by :func:`dispatch_mturk_actions`, if ``mturk_action_concurrency``
+        is set.
+        """
+        return self.config.get("mturk_action_concurrency", 0) > 0
+
+    def dispatch_actions(self):
+        """Send a batch of queued approvals and bonuses to MTurk, and record
+        the outcomes on the participants.
+        """
+        pipeline = redis_conn.pipeline()
+        pipeline.lrange(MTURK_ACTIONS_KEY, 0, MTURK_ACTION_BATCH_SIZE - 1)
+        pipeline.ltrim(MTURK_ACTIONS_KEY, MTURK_ACTION_BATCH_SIZE, -1)
+        batch = pipeline.execute()[0]
+        try:
+            if batch:
+                executor = MTurkActionExecutor(
+                    self.mturkservice,
+                    concurrency=self.config.get("mturk_action_concurrency", 10),
+                    rate=self.config.get("mturk_action_rate", 5.0),
+                )
+                actions = [json.loads(a) for a in batch]
+                try:
+                    results = executor.run(actions)
+                except Exception:
+                    logger.exception("Failed to dispatch MTurk actions.")
+                    self._requeue_actions(actions)
+                    raise
+                self._record_actions(results)
+        finally:
+            if redis_conn.llen(MTURK_ACTIONS_KEY):
+                _enqueue_mturk_dispatch()
+            else:
+                redis_conn.delete(MTURK_DISPATCH_KEY)
+                # An action queued since the queue was found empty is picked
+                # up by a new job, as its own attempt to schedule one failed.
+                if redis_conn.llen(MTURK_ACTIONS_KEY):
+                    _schedule_mturk_dispatch()
+
     def close_recruitment(self):
         """Clean up once the experiment is complete.
 
@@ -675,6 +762,54 @@ class MTurkRecruiter(Recruiter):
     def _confirm_sns_subscription(self, token, topic):
         self.mturkservice.confirm_subscription(token=token, topic=topic)
 
+    def _requeue_actions(self, actions):
+        """Put actions that could not be dispatched back at the front of the
+        queue, so they are retried by the next dispatch instead of lost.
+        Actions which have failed ``MTURK_DISPATCH_ATTEMPTS`` times are parked
+        in ``MTURK_FAILED_ACTIONS_KEY`` instead.
+        """
+        retry = []
+        parked = []
+        for action in actions:
+            action = dict(action, attempts=action.get("attempts", 0) + 1)
+            if action["attempts"] < MTURK_DISPATCH_ATTEMPTS:
+                retry.append(json.dumps(action))
+            else:
+                parked.append(json.dumps(action))
+        if retry:
+            redis_conn.lpush(MTURK_ACTIONS_KEY, *reversed(retry))
+        if parked:
+            logger.error(
+                "Giving up on {} MTurk action(s) after {} attempts.".format(
+                    len(parked), MTURK_DISPATCH_ATTEMPTS
+                )
+            )
+            redis_conn.rpush(MTURK_FAILED_ACTIONS_KEY, *parked)
+
+    def _record_actions(self, results):
+        assignment_ids = {action["assignment_id"] for action, error in results}
+        participants = {
+            p.assignment_id: p
+            for p in Participant.query.filter(
+                Participant.assignment_id.in_(assignment_ids)
+            ).order_by(Participant.id)
+        }
+        for action, error in results:
+            participant = participants.get(action["assignment_id"])
+            if participant is None:
+                logger.warning(
+                    "No participant for MTurk assignment {}.".format(
+                        action["assignment_id"]
+                    )
+                )
+                continue
+            details = dict(participant.details or {})
+            outcomes = dict(details.get("mturk_actions", {}))
+            outcomes[action["action"]] = {"ok": error is None, "error": error}
+            details["mturk_actions"] = outcomes
+            participant.details = details
+        session.commit()
+
     def _report_event_notification(self, events):
         q = _get_queue()
         for event in events:
@@ -743,19 +878,91 @@ class MTurkRecruiter(Recruiter):
             logger.exception(ex)
 
 
+def _enqueue_mturk_dispatch():
+    _get_queue().enqueue(dispatch_mturk_actions, job_timeout=MTURK_DISPATCH_TIMEOUT)
+
+
+def _schedule_mturk_dispatch():
+    if redis_conn.set(MTURK_DISPATCH_KEY, 1, nx=True, ex=MTURK_DISPATCH_TIMEOUT):
+        _enqueue_mturk_dispatch()
+
+
+def queue_mturk_action(action):
+    """Queue an approval or bonus to be sent to MTurk, making sure a job to
+    dispatch it is queued. Actions queued while that job waits its turn are
+    dispatched together.
+    """
+    redis_conn.rpush(MTURK_ACTIONS_KEY, json.dumps(action))
+    _schedule_mturk_dispatch()
+    return True
+
+
+@scoped_session_decorator
+def dispatch_mturk_actions():
+    """Worker job sending queued MTurk approvals and bonuses."""
+    MTurkRecruiter().dispatch_actions()
+
+
+# Atomically count ARGV[1] new recruits against a prepaid pool of ARGV[2]
+# assignments, and return how many of them the pool can't cover.
+RESERVE_SCRIPT = """
+local recruited = tonumber(redis.call("GET", KEYS[1]) or "0")
+local count = tonumber(ARGV[1])
+local remaining = math.max(0, tonumber(ARGV[2]) - recruited)
+local needed = math.max(0, count - remaining)
+redis.call("INCRBY", KEYS[1], count)
+redis.call("HINCRBY", KEYS[2], "reservations", 1)
+redis.call("HINCRBY", KEYS[2], "from_pool", count - needed)
+redis.call("HINCRBY", KEYS[2], "to_purchase", needed)
+return needed
+"""
+
+
 class RedisTally(object):
+    """Count recruits in redis, so the processes of an experiment share a
+    single prepaid pool of assignments.
+    """
 
     _key = "num_recruited"
+    _stats_key = "num_recruited:stats"
 
     def __init__(self):
-        redis_conn.set(self._key, 0)
+        redis_conn.setnx(self._key, 0)
+        self._reserve = redis_conn.register_script(RESERVE_SCRIPT)
+
+    def reset(self, count=0):
+        pipeline = redis_conn.pipeline()
+        pipeline.set(self._key, count)
+        pipeline.delete(self._stats_key)
+        pipeline.execute()
 
     def increment(self, count):
         redis_conn.incr(self._key, count)
 
+    def reserve(self, count, pool_size):
+        """Count ``count`` new recruits, and return how many of them need
+        assignments beyond the ``pool_size`` already paid for.
+        """
+        return int(
+            self._reserve(keys=[self._key, self._stats_key], args=[count, pool_size])
+        )
+
+    def commit(self, count, purchased=True):
+        """Record whether assignments returned by :meth:`reserve` were bought."""
+        field = "purchased" if purchased else "purchase_failed"
+        redis_conn.hincrby(self._stats_key, field, count)
+
     @property
     def current(self):
-        return int(redis_conn.get(self._key))
+        return int(redis_conn.get(self._key) or 0)
+
+    def stats(self):
+        stats = {
+            k.decode("utf-8"): int(v)
+            for k, v in redis_conn.hgetall(self._stats_key).items()
+        }
+        stats["recruited"] = self.current
+        return stats
 
 
 class MTurkLargeRecruiter(MTurkRecruiter):
@@ -773,7 +980,7 @@ class MTurkLargeRecruiter(MTurkRecruiter):
             raise MTurkRecruiterException(
                 "Tried to open_recruitment on already open recruiter."
             )
-        self.counter.increment(n)
+        self.counter.reset(n)
         to_recruit = max(n, self.pool_size)
         return super(MTurkLargeRecruiter, self).open_recruitment(to_recruit)
 
@@ -783,10 +990,11 @@ class MTurkLargeRecruiter(MTurkRecruiter):
             logger.info("auto_recruit is False: recruitment suppressed")
             return
 
-        needed = max(0, n - self.remaining_pool)
-        self.counter.increment(n)
+        needed = self.counter.reserve(n, self.pool_size)
         if needed:
-            return super(MTurkLargeRecruiter, self).recruit(needed)
+            result = super(MTurkLargeRecruiter, self).recruit(needed)
+            self.counter.commit(needed, purchased=bool(result))
+            return result
 
     @property
     def remaining_pool(self):
@@ -807,32 +1015,53 @@ class BotRecruiter(Recruiter):
         """Start recruiting right away."""
         logger.info("Opening Bot recruitment for {} participants".format(n))
         factory = self._get_bot_factory()
-        bot_class_name = factory("", "", "").__class__.__name__
         return {
             "items": self.recruit(n),
-            "message": "Bot recruitment started using {}".format(bot_class_name),
+            "message": "Bot recruitment started using {}".format(factory.__name__),
         }
 
     def recruit(self, n=1):
-        """Recruit n new participant bots to the queue"""
+        """Recruit n new participant bots to the queue.
+
+        All jobs are enqueued in a single redis pipeline. If ``bots_per_job``
+        is more than 1, each job runs that many bots concurrently.
+        """
         logger.info("Recruiting {} Bot participants".format(n))
+        from dallinger.bots import run_bots
+
         factory = self._get_bot_factory()
+        base_url = get_base_url()
+        ad_url = (
+            "{}/ad?recruiter={}&assignmentId={}&hitId={}&workerId={}&mode=sandbox"
+        )
+        ids = [
+            (generate_random_id(), generate_random_id(), generate_random_id())
+            for _ in range(n)
+        ]
         urls = []
+        bots = []
+        for worker, hit, assignment in ids:
+            url = ad_url.format(base_url, self.nickname, assignment, hit, worker)
+            urls.append(url)
+            bots.append(
+                factory(url, assignment_id=assignment, worker_id=worker, hit_id=hit)
+            )
+
         q = _get_queue(name="low")
-        for _ in range(n):
-            base_url = get_base_url()
-            worker = generate_random_id()
-            hit = generate_random_id()
-            assignment = generate_random_id()
-            ad_parameters = (
-                "recruiter={}&assignmentId={}&hitId={}&workerId={}&mode=sandbox"
+        pipeline = q.connection.pipeline()
+        per_job = max(1, self.config.get("bots_per_job", 1))
+        for start in range(0, n, per_job):
+            batch = bots[start : start + per_job]
+            if len(batch) == 1:
+                target, args = batch[0].run_experiment, ()
+            else:
+                target, args = run_bots, (batch,)
+            job = Job.create(
+                target, args=args, timeout=self._timeout, connection=q.connection
             )
-            ad_parameters = ad_parameters.format(self.nickname, assignment, hit, worker)
-            url = "{}/ad?{}".format(base_url, ad_parameters)
-            urls.append(url)
-            bot = factory(url, assignment_id=assignment, worker_id=worker, hit_id=hit)
-            job = q.enqueue(bot.run_experiment, timeout=self._timeout)
-            logger.warning("Created job {} for url {}.".format(job.id, url))
+            q.enqueue_job(job, pipeline=pipeline)
+            logger.warning("Created job {} for {} bot(s).".format(job.id, len(batch)))
+        pipeline.execute()
 
         return urls
 
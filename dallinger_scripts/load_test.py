@@ -0,0 +1,16 @@
+"""Run ``dallinger load_test`` with cooperative network I/O."""
+
+
+def main():
+    # gevent must patch the standard library before requests and ssl are
+    # imported, so patches are applied before loading the command line.
+    import gevent.monkey
+
+    gevent.monkey.patch_all()
+    from dallinger.command_line import load_test
+
+    load_test(prog_name="dallinger_load_test")
+
+
+if __name__ == "__main__":  # pragma: nocover
+    main()
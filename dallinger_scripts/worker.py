@@ -18,9 +18,12 @@ def main():
     from rq import Queue, Connection
     from dallinger.heroku.rq_gevent_worker import GeventWorker as Worker
 
+    from dallinger.config import get_config
     from dallinger.config import initialize_experiment_package
 
     initialize_experiment_package(os.getcwd())
+    config = get_config()
+    config.load()
 
     import logging
 
@@ -32,7 +35,11 @@ def main():
     redis_conn = StrictRedis(connection_pool=redis_pool)
 
     with Connection(redis_conn):
-        worker = Worker(list(map(Queue, listen)))
+        worker = Worker(
+            list(map(Queue, listen)),
+            min_pool_size=config.get("worker_min_pool_size", None),
+            max_pool_size=config.get("worker_max_pool_size", None),
+        )
         worker.work()
 
 
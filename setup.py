@@ -30,6 +30,7 @@ setup_args = dict(
             'dallinger_heroku_web = dallinger_scripts.web:main',
             'dallinger_heroku_worker = dallinger_scripts.worker:main',
             'dallinger_heroku_clock = dallinger_scripts.clock:main',
+            'dallinger_load_test = dallinger_scripts.load_test:main',
         ],
         'dallinger.experiments': [],
     },
@@ -39,6 +40,7 @@ setup_args = dict(
             "odo",
             "openpyxl<2.5",  # 2.5 is incompatible with tablib
             "pandas==0.23.4",
+            "pyarrow",
             "tablib<0.12",    # 0.12 is incompatible
         ],
         'jupyter': [
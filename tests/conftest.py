@@ -366,11 +366,14 @@ def aws_creds():
 @pytest.fixture
 def db_session():
     import dallinger.db
+    from dallinger.experiment_server.worker_events import clear_event_claims
 
     # The drop_all call can hang without this; see:
     # https://stackoverflow.com/questions/13882407/sqlalchemy-blocked-on-dropping-tables
     dallinger.db.session.close()
     session = dallinger.db.init_db(drop_all=True)
+    # Events recorded as processed in redis refer to the dropped tables
+    clear_event_claims()
     yield session
     session.rollback()
     session.close()
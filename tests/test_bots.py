@@ -119,6 +119,93 @@ class TestBots(object):
         assert bot.driver.capabilities["browserName"] == "chrome"
 
 
+class TestDriverPool(object):
+    @pytest.fixture
+    def create_driver(self):
+        with mock.patch("dallinger.bots.create_driver") as create_driver:
+            create_driver.side_effect = lambda *args: mock.Mock(
+                window_handles=["main"]
+            )
+            yield create_driver
+
+    @pytest.fixture
+    def pool(self, create_driver):
+        from dallinger.bots import DriverPool
+
+        return DriverPool(2, "phantomjs")
+
+    def test_reuses_released_drivers(self, pool, create_driver):
+        driver = pool.acquire()
+        pool.release(driver)
+
+        assert pool.acquire() is driver
+        create_driver.assert_called_once_with("phantomjs", None)
+
+    def test_resets_drivers_on_release(self, pool):
+        driver = pool.acquire()
+        driver.window_handles = ["main", "popup"]
+        pool.release(driver)
+
+        driver.switch_to.window.assert_called_with("main")
+        driver.close.assert_called_once_with()
+        driver.delete_all_cookies.assert_called_once_with()
+        assert driver.execute_script.call_args[0][0].count("Storage.clear()") == 2
+        driver.get.assert_called_once_with("about:blank")
+
+    def test_replaces_unhealthy_drivers(self, pool, create_driver):
+        from selenium.common.exceptions import WebDriverException
+
+        driver = pool.acquire()
+        pool.release(driver)
+        type(driver).current_url = mock.PropertyMock(
+            side_effect=WebDriverException("gone")
+        )
+
+        assert pool.acquire() is not driver
+        driver.quit.assert_called_once_with()
+        assert create_driver.call_count == 2
+
+    def test_discards_drivers_which_fail_to_reset(self, pool):
+        from selenium.common.exceptions import WebDriverException
+
+        driver = pool.acquire()
+        driver.delete_all_cookies.side_effect = WebDriverException("gone")
+        pool.release(driver)
+
+        driver.quit.assert_called_once_with()
+        assert pool.idle == []
+
+    def test_limits_drivers_in_use(self, pool):
+        pool.acquire()
+        pool.acquire()
+
+        assert pool.slots.locked()
+
+    def test_bot_returns_driver_to_pool(self, pool):
+        config.ready = True
+        from dallinger.bots import BotBase
+
+        with mock.patch("dallinger.bots.driver_pool", return_value=pool):
+            bot = BotBase("http://dallinger.io")
+            bot.sign_up = lambda: bot.driver.get(bot.URL)
+            bot.participate = mock.Mock()
+            bot.sign_off = mock.Mock(return_value=True)
+            bot.complete_experiment = mock.Mock()
+            bot.run_experiment()
+
+        assert len(pool.idle) == 1
+        assert not pool.idle[0].quit.called
+        assert "driver" not in bot.__dict__
+
+    def test_close_quits_idle_drivers(self, pool):
+        driver = pool.acquire()
+        pool.release(driver)
+        pool.close()
+
+        driver.quit.assert_called_once_with()
+        assert pool.idle == []
+
+
 class TestHighPerformanceBot(object):
     @pytest.fixture
     def bot(self):
@@ -136,19 +223,14 @@ class TestHighPerformanceBot(object):
         return bot
 
     @pytest.fixture
-    def req_post(self):
-        with mock.patch("requests.post") as patch_post:
-            yield patch_post
-
-    @pytest.fixture
-    def req_get(self):
-        with mock.patch("requests.get") as patch_get:
-            yield patch_get
+    def session(self):
+        with mock.patch("dallinger.bots.http_session") as http_session:
+            yield http_session.return_value
 
     @pytest.fixture
     def fake_uuid(self):
         with mock.patch("uuid.uuid4") as patch_uuid4:
-            patch_uuid4.hex.return_value = "fakehash"
+            patch_uuid4.return_value.hex = "fakehash"
             yield patch_uuid4
 
     def test_create_bot(self, bot):
@@ -165,39 +247,126 @@ class TestHighPerformanceBot(object):
     def test_host(self, bot):
         assert bot.host == "https://dallinger.io"
 
-    def test_sign_up(self, bot, req_post, fake_uuid):
-        mock_return = mock.Mock()
-        mock_return.json.return_value = {"status": "OK", "participant": {"id": 4}}
-        req_post.return_value = mock_return
+    def test_bots_share_one_session(self, bot):
+        from dallinger.bots import HighPerformanceBotBase
+
+        other = HighPerformanceBotBase("https://dallinger.io/ad?worker_id=worker2")
+        assert bot.session is other.session
+
+    def test_sign_up(self, bot, session, fake_uuid):
+        session.request.return_value.json.return_value = {
+            "status": "OK",
+            "participant": {"id": 4},
+        }
 
         bot.sign_up()
-        assert bot.subscribe_to_quorum_channel.called_once_with()
-        assert req_post.called_once_with(
+        bot.subscribe_to_quorum_channel.assert_called_once_with()
+        session.request.assert_called_once_with(
+            "POST",
             "https://dallinger.io/participant/worker1/hit1/assignment1/debug?"
-            "fingerprint_hash=fakehash&recruiter=bots:HighPerformanceBotBase"
+            "fingerprint_hash=fakehash&recruiter=bots:HighPerformanceBotBase",
+            data=None,
+            timeout=bot.request_timeout,
         )
         assert bot.participant_id == 4
 
-    def test_sign_off(self, bot, req_post):
+    def test_sign_up_retries_error_status(self, bot, session):
+        session.request.return_value.json.side_effect = [
+            {"status": "error"},
+            {"status": "OK", "participant": {"id": 4}},
+        ]
+
+        bot.sign_up()
+        assert session.request.call_count == 2
+        bot.stochastic_sleep.assert_called_once_with(0)
+        assert bot.participant_id == 4
+
+    def test_sign_off(self, bot, session):
         value = bot.sign_off()
-        assert req_post.called_once_with(
-            "https://dallinger.io/question/participant1",
+        session.request.assert_called_once_with(
+            "POST",
+            "https://dallinger.io/question/1",
             data={
                 "question": "questionnaire",
                 "number": 1,
                 "response": json.dumps({"engagement": 4, "difficulty": 3}),
             },
+            timeout=bot.request_timeout,
         )
         assert value is True
 
-    def test_complete_experiment(self, bot, req_get):
-        mock_return = mock.Mock()
-        mock_return.dummy = 1
-        req_get.return_value = mock_return
+    def test_complete_experiment(self, bot, session):
+        session.request.return_value.dummy = 1
 
         response = bot.complete_experiment("worker_complete")
-        assert req_get.called_once_with(
-            "https://dallinger.io/worker_complete?participant_id=1"
+        session.request.assert_called_once_with(
+            "GET",
+            "https://dallinger.io/worker_complete?participant_id=1",
+            timeout=bot.request_timeout,
         )
         # returns the response object
         assert response.dummy == 1
+
+    def test_request_retries_with_backoff(self, bot, session):
+        from requests.exceptions import ConnectionError
+
+        response = mock.Mock()
+        session.request.side_effect = [ConnectionError(), ConnectionError(), response]
+
+        assert bot.request("GET", "/ping") is response
+        assert bot.stochastic_sleep.call_args_list == [mock.call(0), mock.call(1)]
+        assert bot.retries_used == 2
+
+    def test_request_gives_up_when_retry_budget_spent(self, bot, session):
+        from requests.exceptions import ConnectionError
+
+        bot.retry_budget = 3
+        session.request.side_effect = ConnectionError()
+
+        with pytest.raises(ConnectionError):
+            bot.request("GET", "/ping")
+        assert session.request.call_count == 4
+
+    def test_get_json_and_post_json(self, bot, session):
+        session.request.return_value.json.return_value = {"status": "OK"}
+
+        assert bot.get_json("/info/1") == {"status": "OK"}
+        assert bot.post_json("/info/1", data={"contents": "x"}) == {"status": "OK"}
+        session.request.assert_called_with(
+            "POST",
+            "https://dallinger.io/info/1",
+            data={"contents": "x"},
+            timeout=bot.request_timeout,
+        )
+
+    def test_retry_wait_grows_with_jitter(self, bot):
+        bot.retry_delay = 1.0
+        bot.max_retry_delay = 5.0
+        bot.retry_jitter = 0.5
+
+        for attempt, expected in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)]:
+            wait = bot.retry_wait(attempt)
+            assert expected * 0.5 <= wait <= expected * 1.5
+
+
+class TestRunBots(object):
+    def test_runs_every_bot(self):
+        from dallinger.bots import run_bots
+
+        bots = [mock.Mock(), mock.Mock()]
+        run_bots(bots)
+
+        for bot in bots:
+            bot.run_experiment.assert_called_once_with()
+
+    def test_raises_after_all_bots_finish(self):
+        from dallinger.bots import run_bots
+
+        failing = mock.Mock()
+        failing.run_experiment.side_effect = ValueError("boom!")
+        other = mock.Mock()
+
+        with pytest.raises(ValueError):
+            run_bots([failing, other])
+
+        other.run_experiment.assert_called_once_with()
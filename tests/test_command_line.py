@@ -325,6 +325,132 @@ class TestSummary(object):
         assert "Yield: 50.00%" in result.output
 
 
+class TestWorkerStats(object):
+    @pytest.fixture
+    def worker_stats(self):
+        from dallinger.command_line import worker_stats
+
+        return worker_stats
+
+    def test_worker_stats(self, worker_stats):
+        latencies = {"p50": 0.25, "p90": 0.5, "p99": 1.0, "max": 2.0}
+        stats = {
+            "queues": {
+                "default": {"depth": 3, "jobs": 7, "wait": latencies, "run": latencies}
+            },
+            "workers": [
+                {"name": "w1", "busy": 4, "pool_limit": 10, "pool_size": 20}
+            ],
+        }
+        with mock.patch("dallinger.heroku.worker_metrics.summary") as summary:
+            summary.return_value = stats
+            result = CliRunner().invoke(worker_stats, [])
+        assert result.exit_code == 0
+        assert "default" in result.output
+        assert "0.250" in result.output
+        assert "w1" in result.output
+
+
+class TestLoadTest(object):
+    @pytest.fixture
+    def load_test(self):
+        from dallinger.command_line import load_test
+
+        return load_test
+
+    @pytest.fixture
+    def loadtest(self):
+        from dallinger.loadtest import LoadTestStats
+
+        stats = LoadTestStats()
+        stats.record("GET", "http://localhost/worker_complete", 0.25)
+        stats.bots_completed = 1
+        stats.finish()
+        with mock.patch.multiple(
+            "dallinger.loadtest",
+            io_patched=mock.DEFAULT,
+            relaunch_with_patched_io=mock.DEFAULT,
+            run_load_test=mock.DEFAULT,
+        ) as mocks:
+            mocks["io_patched"].return_value = True
+            mocks["run_load_test"].return_value = stats
+            yield mocks
+
+    @pytest.fixture
+    def experiment(self):
+        from dallinger.bots import HighPerformanceBotBase
+
+        module = mock.Mock(Bot=type("Bot", (HighPerformanceBotBase,), {}))
+        with mock.patch.dict(
+            "sys.modules", {"dallinger_experiment.experiment": module}
+        ):
+            with mock.patch("dallinger.command_line.setup_experiment"):
+                yield module
+
+    def test_load_test_reports_routes(self, load_test, loadtest, experiment):
+        result = CliRunner().invoke(
+            load_test,
+            ["--debug", "http://localhost:5000/", "--bots", "10", "--rate", "5"],
+        )
+        assert result.exit_code == 0
+        loadtest["relaunch_with_patched_io"].assert_not_called()
+        loadtest["run_load_test"].assert_called_once_with(
+            experiment.Bot, "http://localhost:5000", 10, rate=5.0
+        )
+        assert "GET /worker_complete" in result.output
+        assert "0.250" in result.output
+        assert "1 bots completed, 0 failed" in result.output
+
+    def test_load_test_relaunches_with_patched_io(self, load_test, loadtest):
+        loadtest["io_patched"].return_value = False
+        loadtest["relaunch_with_patched_io"].side_effect = SystemExit(0)
+        argv = ["dallinger", "load_test", "--debug", "http://localhost"]
+        with mock.patch("sys.argv", argv):
+            CliRunner().invoke(load_test, argv[2:])
+        loadtest["relaunch_with_patched_io"].assert_called_once_with(
+            ["--debug", "http://localhost"]
+        )
+        loadtest["run_load_test"].assert_not_called()
+
+    def test_load_test_replays_trace(self, load_test, loadtest, tmpdir):
+        trace = tmpdir.join("some-id-data.zip")
+        trace.write("")
+        with mock.patch.multiple(
+            "dallinger.loadtest", load_trace=mock.DEFAULT, replay_trace=mock.DEFAULT
+        ) as mocks:
+            mocks["replay_trace"].return_value = loadtest["run_load_test"].return_value
+            result = CliRunner().invoke(
+                load_test,
+                ["--debug", "http://localhost", "--trace", str(trace), "--speed", "10"],
+            )
+        assert result.exit_code == 0
+        mocks["load_trace"].assert_called_once_with(str(trace))
+        mocks["replay_trace"].assert_called_once_with(
+            mocks["load_trace"].return_value, "http://localhost", 10.0
+        )
+        loadtest["run_load_test"].assert_not_called()
+        assert "GET /worker_complete" in result.output
+
+    def test_load_test_rejects_zero_speed(self, load_test, loadtest, tmpdir):
+        trace = tmpdir.join("some-id-data.zip")
+        trace.write("")
+        result = CliRunner().invoke(
+            load_test,
+            ["--debug", "http://localhost", "--trace", str(trace), "--speed", "0"],
+        )
+        assert result.exit_code != 0
+        assert "must be greater than 0" in result.output
+
+    def test_load_test_requires_http_bot(self, load_test, loadtest, experiment):
+        from dallinger.bots import BotBase
+
+        experiment.Bot = BotBase
+        result = CliRunner().invoke(load_test, ["--debug", "http://localhost"])
+        assert result.exit_code != 0
+        assert "HighPerformanceBotBase" in result.output
+        loadtest["run_load_test"].assert_not_called()
+
+
 @pytest.mark.usefixtures("bartlett_dir")
 @pytest.mark.slow
 class TestBot(object):
@@ -3,13 +3,15 @@
 from collections import OrderedDict
 import csv
 from datetime import datetime
+import gc
 import io
+import mock
 import os
 import requests
 import tempfile
 import uuid
 import shutil
-from zipfile import ZipFile
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
 
 import pandas as pd
 import psycopg2
@@ -83,6 +85,10 @@ class TestDataLocally(object):
         yield
         shutil.rmtree("data")
 
+    @pytest.fixture
+    def pyarrow(self):
+        return pytest.importorskip("pyarrow")
+
     @pytest.fixture
     def export(self, cleanup):
         path = dallinger.data.export("12345-12345-12345-12345", local=True)
@@ -136,6 +142,50 @@ class TestDataLocally(object):
         data = dallinger.data.Data(self.data_path)
         assert type(data.networks.df) is pd.DataFrame
 
+    def test_csv_tables_keep_column_types(self):
+        data = dallinger.data.Data(self.data_path)
+        df = data.networks.df
+        assert str(df["creation_time"].dtype).startswith("datetime64")
+        assert str(df["time_of_death"].dtype).startswith("datetime64")
+        assert df["failed"].dtype == bool
+
+        row = dict(zip(df.columns, data.networks.list[0]))
+        assert type(row["id"]) is int
+        assert isinstance(row["creation_time"], datetime)
+        assert row["time_of_death"] is None
+
+    def test_tables_open_on_first_access(self):
+        data = dallinger.data.Data(self.data_path)
+        assert "networks" not in vars(data)
+
+        networks = data.networks
+        assert data.networks is networks
+
+    def test_tables_read_from_zip_without_extracting(self):
+        with mock.patch("dallinger.data.ZipFile.extractall") as extractall:
+            data = dallinger.data.Data(self.data_path)
+            assert data.networks.df.shape == (1, 13)
+        extractall.assert_not_called()
+
+    def test_tables_build_only_requested_representation(self):
+        data = dallinger.data.Data(self.data_path)
+        assert data.networks.df is data.networks.df
+        assert "tablib_dataset" not in vars(data.networks)
+
+    def test_extracted_odo_file_is_removed_with_table(self):
+        data = dallinger.data.Data(self.data_path)
+        path = data.networks.odo_resource.path
+        assert os.path.exists(path)
+
+        del data
+        gc.collect()
+        assert not os.path.exists(path)
+
+    def test_missing_table_raises_attribute_error(self):
+        data = dallinger.data.Data(self.data_path)
+        with pytest.raises(AttributeError):
+            data.widgets
+
     def test_local_data_loading(self):
         local_data_id = "77777-77777-77777-77777"
         dallinger.data.export(local_data_id, local=True)
@@ -173,14 +223,41 @@ class TestDataLocally(object):
     def test_export_compatible_with_data(self, export):
         assert dallinger.data.Data(export)
 
-    def test_scrub_pii(self):
-        path_to_data = os.path.join("tests", "datasets", "pii")
-        dallinger.data._scrub_participant_table(path_to_data)
-        with open_for_csv(os.path.join(path_to_data, "participant.csv"), "r") as f:
+    def test_scrub_pii(self, db_session):
+        participant = dallinger.models.Participant(
+            recruiter_id="hotair",
+            worker_id="PII",
+            hit_id="1",
+            assignment_id="A",
+            mode="test",
+        )
+        db_session.add(participant)
+        db_session.commit()
+        export_dir = tempfile.mkdtemp()
+        dallinger.data.copy_db_to_csv("dallinger", export_dir, scrub_pii=True)
+        with open_for_csv(os.path.join(export_dir, "participant.csv"), "r") as f:
             reader = csv.reader(f, delimiter=",")
-            next(reader)  # Skip the header
-            for row in reader:
-                assert "PII" not in row
+            header = next(reader)
+            row = next(reader)
+        assert "PII" not in row
+        assert row[header.index("worker_id")] == str(participant.id)
+        assert row[header.index("unique_id")] == "{}:A".format(participant.id)
+
+    def test_pii_columns_can_be_extended(self):
+        with mock.patch.dict(
+            dallinger.models.Participant.pii_columns, {"fingerprint_hash": "NULL"}
+        ):
+            columns = dallinger.data.pii_columns("participant")
+        assert columns["fingerprint_hash"] == "NULL"
+        assert columns["worker_id"] == "id::text"
+        assert dallinger.data.pii_columns("info") == {}
+
+    def test_scrubbed_sources_select_every_column(self, db_session):
+        with dallinger.data._snapshot("dallinger") as (cur, snapshot):
+            sources = dallinger.data._sources(cur, scrub_pii=True)
+        assert sources["info"] == "info"
+        assert 'id::text AS "worker_id"' in sources["participant"]
+        assert '"assignment_id"' in sources["participant"]
 
     def test_scrub_pii_preserves_participants(self, db_session, zip_path, cleanup):
         dallinger.data.ingest_zip(zip_path)
@@ -214,6 +291,255 @@ class TestDataLocally(object):
             row1 = next(reader)
             assert row1[header.index("worker_id")] == "1"
 
+    def test_copy_tables_yields_every_table(self):
+        sources = {"network": "network", "node": "node"}
+        with dallinger.data._snapshot("dallinger") as (cur, snapshot):
+            copies = dict(dallinger.data._copy_tables("dallinger", snapshot, sources))
+        assert sorted(copies) == ["network", "node"]
+        assert copies["network"].readline().startswith(b"id,")
+
+    def test_copy_table_uses_exported_snapshot(self, db_session):
+        conn = psycopg2.connect(database="dallinger", user="dallinger")
+        conn.set_session(isolation_level="REPEATABLE READ")
+        cur = conn.cursor()
+        cur.execute("SELECT pg_export_snapshot()")
+        snapshot = cur.fetchone()[0]
+        db_session.add(dallinger.networks.Star())
+        db_session.commit()
+
+        try:
+            table, file = dallinger.data._copy_table("dallinger", snapshot, "network")
+        finally:
+            conn.close()
+        assert table == "network"
+        assert len(file.readlines()) == 1  # Only the header row
+
+    def test_export_streams_into_zip(self, export):
+        assert not os.path.exists(os.path.join("data", "12345-12345-12345-12345"))
+        archive = ZipFile(export)
+        assert archive.read("experiment_id.md") == b"12345-12345-12345-12345"
+        assert sorted(n for n in archive.namelist() if n.endswith(".csv")) == [
+            "data/{}.csv".format(table) for table in sorted(dallinger.data.table_names)
+        ]
+
+    @pytest.fixture
+    def incremental(self, db_session, cleanup):
+        kept = dallinger.networks.Star()
+        failed = dallinger.networks.Star()
+        db_session.add_all([kept, failed])
+        db_session.commit()
+        base = dallinger.data.export("incremental", local=True)
+
+        failed.fail()
+        added = dallinger.networks.Star()
+        db_session.add(added)
+        db_session.commit()
+        delta = dallinger.data.export("incremental", local=True, since=base)
+        return base, delta, (kept.id, failed.id, added.id)
+
+    def test_export_records_watermarks(self, incremental):
+        base, delta, (kept, failed, added) = incremental
+        watermarks = dallinger.data.read_watermarks(base)
+        assert watermarks["network"] == {"id": failed, "time_of_death": None}
+        assert watermarks["node"]["id"] is None
+        assert dallinger.data.read_watermarks(delta)["network"]["id"] == added
+
+    def test_incremental_export_holds_new_and_changed_rows(self, incremental):
+        base, delta, (kept, failed, added) = incremental
+        assert os.path.basename(delta).startswith("incremental-data-delta-")
+        networks = dallinger.data.Data(delta).networks.df
+        assert {failed, added} <= set(networks["id"])
+
+    def test_changed_since_rereads_rows_below_watermarks(self):
+        watermarks = {"network": {"id": 5000, "time_of_death": "2020-01-01T00:00:00"}}
+        sql, params = dallinger.data._changed_since("network", watermarks)
+        assert params == [
+            5000 - dallinger.data.WATERMARK_ID_OVERLAP,
+            "2020-01-01T00:00:00",
+            dallinger.data.WATERMARK_TIME_OVERLAP,
+        ]
+
+    def test_incremental_export_picks_up_late_commits(self, db_session, cleanup):
+        from sqlalchemy.orm import Session
+
+        late = dallinger.networks.Star()
+        db_session.add(late)
+        db_session.flush()  # The id is allocated, but not committed yet
+        other_session = Session(bind=db_session.get_bind())
+        other_session.add(dallinger.networks.Star())
+        other_session.commit()
+        other_session.close()
+        base = dallinger.data.export("incremental", local=True)
+        assert late.id not in set(dallinger.data.Data(base).networks.df["id"])
+
+        db_session.commit()
+        delta = dallinger.data.export("incremental", local=True, since=base)
+
+        data = dallinger.data.Data(base, deltas=[delta])
+        assert late.id in set(data.networks.df["id"])
+
+    def test_data_merges_deltas(self, incremental):
+        base, delta, (kept, failed, added) = incremental
+        data = dallinger.data.Data(base, deltas=[delta])
+        networks = data.networks.df
+        assert list(networks["id"]) == [kept, failed, added]
+        assert list(networks["failed"]) == [False, True, False]
+        assert len(data.networks.list) == 3
+        assert data.networks.csv.count("\n") == 4
+
+    def test_incremental_export_requires_watermarks(self, tmpdir):
+        path = str(tmpdir.join("old.zip"))
+        with ZipFile(path, "w") as archive:
+            archive.writestr("data/network.csv", "id\n")
+        with pytest.raises(ValueError):
+            dallinger.data.export("incremental", local=True, since=path)
+
+    @pytest.fixture
+    def two_networks(self, a, db_session):
+        rows = {}
+        for role, status in (("experiment", "approved"), ("practice", "working")):
+            network = a.star(role=role)
+            participant = a.participant(assignment_id=role)
+            node = a.node(network=network, participant=participant)
+            a.info(origin=node)
+            participant.status = status
+            db_session.add(
+                dallinger.models.Question(
+                    participant=participant, question="q", response="r", number=1
+                )
+            )
+            rows[role] = (network.id, participant.id, node.id)
+        db_session.commit()
+        return rows
+
+    def export_subset(self, **kwargs):
+        subset = dallinger.data.ExportFilter(**kwargs)
+        return dallinger.data.Data(
+            dallinger.data.export("subset", local=True, subset=subset)
+        )
+
+    def test_export_subset_by_network(self, two_networks, cleanup):
+        network, participant, node = two_networks["experiment"]
+        data = self.export_subset(network_ids=[network])
+
+        assert list(data.networks.df["id"]) == [network]
+        assert list(data.participants.df["id"]) == [participant]
+        assert list(data.nodes.df["id"]) == [node]
+        assert list(data.infos.df["origin_id"]) == [node]
+        assert list(data.questions.df["participant_id"]) == [participant]
+        assert list(data.notifications.df["id"]) == []
+
+    def test_export_subset_by_network_role(self, two_networks, cleanup):
+        network, participant, node = two_networks["practice"]
+        data = self.export_subset(network_role="practice")
+
+        assert list(data.networks.df["id"]) == [network]
+        assert list(data.nodes.df["id"]) == [node]
+
+    def test_export_subset_by_participant_status(self, two_networks, cleanup):
+        network, participant, node = two_networks["experiment"]
+        data = self.export_subset(participant_status=["approved"])
+
+        assert len(data.networks.df) == 2
+        assert list(data.participants.df["id"]) == [participant]
+        assert list(data.nodes.df["id"]) == [node]
+        assert list(data.infos.df["origin_id"]) == [node]
+
+    def test_export_subset_has_its_own_name(self, two_networks, cleanup):
+        subset = dallinger.data.ExportFilter(network_role="practice")
+        path = dallinger.data.export("subset", local=True, subset=subset)
+        assert os.path.basename(path).startswith("subset-data-subset-")
+
+    def test_export_filter_time_range(self):
+        subset = dallinger.data.ExportFilter(start="2020-01-01", end="2020-01-02")
+        assert subset.condition("network") == (
+            "creation_time <= %s",
+            ["2020-01-02"],
+        )
+        sql, params = subset.condition("info")
+        assert sql.startswith("creation_time >= %s AND creation_time <= %s AND ")
+        assert "origin_id IN (SELECT id FROM node WHERE " in sql
+        assert params[:2] == ["2020-01-01", "2020-01-02"]
+        assert set(params[2:]) == {"2020-01-02"}
+
+    def test_empty_export_filter(self):
+        assert not dallinger.data.ExportFilter()
+        assert dallinger.data.ExportFilter().condition("info") is None
+        assert dallinger.data.ExportFilter(network_role="practice")
+
+    def test_archive_data_stores_parquet_uncompressed(self, tmpdir):
+        src = tmpdir.mkdir("export")
+        src.join("info.csv").write("id\n1\n")
+        src.join("info.parquet").write("PAR1")
+        dst = str(tmpdir.join("export.zip"))
+        dallinger.data.archive_data("some-id", str(src), dst)
+
+        infos = {i.filename: i.compress_type for i in ZipFile(dst).infolist()}
+        assert infos["info.csv"] == ZIP_DEFLATED
+        assert infos["info.parquet"] == ZIP_STORED
+
+    def test_stored_member_range(self, tmpdir):
+        path = str(tmpdir.join("archive.zip"))
+        with ZipFile(path, "w") as archive:
+            archive.writestr("data/first.parquet", b"first contents")
+            archive.writestr("data/second.parquet", b"second contents")
+
+        info = ZipFile(path).getinfo("data/second.parquet")
+        offset, size = dallinger.data._stored_member_range(path, info)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            assert f.read(size) == b"second contents"
+
+    def test_parquet_export_keeps_column_types(self, pyarrow, db_session, cleanup):
+        dallinger.data.ingest_zip(self.bartlett_export)
+        path = dallinger.data.export("parquet", local=True, parquet=True)
+
+        archive = ZipFile(path)
+        assert "data/participant.parquet" in archive.namelist()
+        assert "data/participant.csv" in archive.namelist()
+        data = dallinger.data.Data(path)
+        participants = data.participants
+        assert participants.path.endswith(".parquet")
+        df = participants.df
+        assert str(df["creation_time"].dtype).startswith("datetime64")
+        assert df["failed"].dtype == bool
+        assert df["id"].dtype == "int64"
+        assert df["worker_id"][0] == "1"
+
+    def test_parquet_export_decodes_json_columns(self, pyarrow, db_session):
+        participant = dallinger.models.Participant(
+            recruiter_id="hotair",
+            worker_id="1",
+            hit_id="1",
+            assignment_id="1",
+            mode="test",
+        )
+        participant.details = {"key": ["value"]}
+        db_session.add(participant)
+        db_session.commit()
+        export_dir = tempfile.mkdtemp()
+        dallinger.data.copy_db_to_parquet("dallinger", export_dir)
+
+        table = dallinger.data.Table(os.path.join(export_dir, "participant.parquet"))
+        assert table.df["details"][0] == {"key": ["value"]}
+        assert table.arrow.num_rows == 1
+        assert table.csv.startswith("id,")
+
+    def test_parquet_copied_from_csv_snapshot(self, pyarrow, db_session, tmpdir):
+        from dallinger.data import copy_db_to_parquet
+
+        parquet_path = str(tmpdir.mkdir("parquet"))
+        with ZipFile(str(tmpdir.join("export.zip")), "w") as archive:
+            with mock.patch(
+                "dallinger.data.copy_db_to_parquet", wraps=copy_db_to_parquet
+            ) as copy:
+                dallinger.data.copy_db_to_zip(
+                    "dallinger", archive, parquet_path=parquet_path
+                )
+
+        assert copy.call_args[1]["snapshot"]
+        assert "participant.parquet" in os.listdir(parquet_path)
+
 
 class TestImport(object):
     @pytest.fixture
@@ -326,3 +652,72 @@ X0SFF0G6R67PCQMI,3EHVO81VN5E60KEEQ146ZGFI3FH1H6,live,2017-03-30 20:06:44.618385,
     def test_ingest_zip_recreates_transmissions(self, db_session, zip_path):
         dallinger.data.ingest_zip(zip_path)
         assert len(dallinger.models.Transmission.query.all()) == 4
+
+    def test_ingest_zip_in_parallel_recreates_tables(self, db_session, zip_path):
+        stats = dallinger.data.ingest_zip(zip_path, parallel=True)
+
+        assert stats["participant"][0] == 4
+        assert stats["transmission"][0] == 4
+        assert len(dallinger.models.Participant.query.all()) == 4
+        assert len(dallinger.models.Node.query.all()) == 5
+        assert len(dallinger.models.Notification.query.all()) == 8
+
+    def test_ingest_zip_in_parallel_restores_indexes(self, db_session, zip_path):
+        def ddl():
+            conn = dallinger.db.engine.raw_connection()
+            try:
+                return dallinger.data._deferrable_ddl(
+                    conn.cursor(), dallinger.data.table_names
+                )
+            finally:
+                conn.close()
+
+        foreign_keys, indexes = ddl()
+        assert foreign_keys and indexes
+        dallinger.data.ingest_zip(zip_path, parallel=True)
+        assert [sorted(definitions) for definitions in ddl()] == [
+            sorted(foreign_keys),
+            sorted(indexes),
+        ]
+
+    def test_ingest_zip_in_parallel_restores_foreign_keys_on_failure(
+        self, db_session, zip_path
+    ):
+        ingest_table = dallinger.data._ingest_table
+
+        def fail_on_info(path, engine, table):
+            if table == "info":
+                raise psycopg2.DataError("Bad row")
+            return ingest_table(path, engine, table)
+
+        conn = dallinger.db.engine.raw_connection()
+        try:
+            foreign_keys, indexes = dallinger.data._deferrable_ddl(
+                conn.cursor(), dallinger.data.table_names
+            )
+        finally:
+            conn.close()
+        with mock.patch("dallinger.data._ingest_table", side_effect=fail_on_info):
+            with pytest.raises(psycopg2.DataError):
+                dallinger.data.ingest_zip(zip_path, parallel=True)
+
+        conn = dallinger.db.engine.raw_connection()
+        try:
+            restored, _ = dallinger.data._deferrable_ddl(
+                conn.cursor(), dallinger.data.table_names
+            )
+        finally:
+            conn.close()
+        assert sorted(name for t, name, d in restored) == sorted(
+            name for t, name, d in foreign_keys
+        )
+        db_session.add(dallinger.networks.Star())
+        db_session.commit()
+
+    def test_ingest_zip_in_parallel_allows_subsequent_insert(
+        self, db_session, zip_path
+    ):
+        dallinger.data.ingest_zip(zip_path, parallel=True)
+        db_session.add(dallinger.networks.Star())
+        db_session.commit()
+        assert len(dallinger.models.Network.query.all()) == 2
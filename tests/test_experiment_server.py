@@ -1169,6 +1169,61 @@ class TestTrackingEventRoutePOST(object):
         assert data["details"] == {u"key": u"value"}
 
 
+@pytest.mark.usefixtures("experiment_dir", "db_session")
+@pytest.mark.slow
+class TestTrackingEventsRoutePOST(object):
+    def test_invalid_node_id_returns_error(self, webapp):
+        data = {"events": '[{"key": "value"}]'}
+        resp = webapp.post("/tracking_events/999", data=data)
+        data = json.loads(resp.data.decode("utf8"))
+        assert data["status"] == "error"
+        assert "node does not exist" in data["html"]
+
+    def test_invalid_events_returns_error(self, a, webapp):
+        node = a.node()
+        data = {"events": '{"key": "value"}'}
+        resp = webapp.post("/tracking_events/{}".format(node.id), data=data)
+        data = json.loads(resp.data.decode("utf8"))
+        assert data["status"] == "error"
+        assert "invalid events" in data["html"]
+
+    def test_enqueues_one_job_per_batch(self, a, webapp):
+        from dallinger.experiment_server.worker_events import tracking_events_function
+
+        node = a.node()
+        data = {"events": '[{"key": 1}, {"key": 2}]'}
+        with mock.patch("dallinger.experiment_server.experiment_server.q") as q:
+            resp = webapp.post("/tracking_events/{}".format(node.id), data=data)
+        data = json.loads(resp.data.decode("utf8"))
+        assert data["status"] == u"success"
+        assert data["count"] == 2
+        q.enqueue.assert_called_once_with(
+            tracking_events_function, node.id, [{"key": 1}, {"key": 2}], None
+        )
+
+    def test_passes_sent_time_to_job(self, a, webapp):
+        from dallinger.experiment_server.worker_events import tracking_events_function
+
+        node = a.node()
+        data = {"events": '[{"key": 1, "client_time": 10}]', "sent_time": "20"}
+        with mock.patch("dallinger.experiment_server.experiment_server.q") as q:
+            webapp.post("/tracking_events/{}".format(node.id), data=data)
+        q.enqueue.assert_called_once_with(
+            tracking_events_function, node.id, [{"key": 1, "client_time": 10}], 20.0
+        )
+
+    @pytest.mark.parametrize("sent_time", ["nan", "inf", "-inf", "soon"])
+    def test_invalid_sent_time_returns_error(self, a, webapp, sent_time):
+        node = a.node()
+        data = {"events": '[{"key": 1}]', "sent_time": sent_time}
+        with mock.patch("dallinger.experiment_server.experiment_server.q") as q:
+            resp = webapp.post("/tracking_events/{}".format(node.id), data=data)
+        data = json.loads(resp.data.decode("utf8"))
+        assert data["status"] == "error"
+        assert "invalid sent_time" in data["html"]
+        q.enqueue.assert_not_called()
+
+
 @pytest.mark.usefixtures("experiment_dir")
 @pytest.mark.slow
 class TestNodeNeighbors(object):
@@ -1441,6 +1496,57 @@ class TestWorkerFunctionIntegration(object):
             mock.call("Event type IgnoreMe is not supported... ignoring.") in log_calls
         )
 
+    def test_experiment_class_loaded_once_per_process(self, worker_func):
+        from dallinger.experiment_server import worker_events
+
+        worker_events._experiment_class_cache.clear()
+        with mock.patch("dallinger.experiment.load") as load:
+            worker_func(event_type="IgnoreMe", assignment_id=None, participant_id=None)
+            worker_func(event_type="IgnoreMe", assignment_id=None, participant_id=None)
+        worker_events._experiment_class_cache.clear()
+        load.assert_called_once_with()
+
+    def test_skips_queue_introspection_unless_debugging(self, worker_func):
+        from dallinger import db
+
+        with mock.patch(
+            "dallinger.experiment_server.worker_events._get_queue"
+        ) as get_queue:
+            with mock.patch.object(db.logger, "isEnabledFor", return_value=False):
+                worker_func(
+                    event_type="IgnoreMe", assignment_id=None, participant_id=None
+                )
+        get_queue.assert_not_called()
+
+    def test_drops_duplicate_submissions(self, a, worker_func):
+        assignment_id = a.participant().assignment_id
+
+        with mock.patch(self.dispatcher + ".for_name") as for_name:
+            worker_func("AssignmentSubmitted", assignment_id, None)
+            worker_func("AssignmentSubmitted", assignment_id, None)
+            for_name.assert_called_once_with("AssignmentSubmitted")
+            assert for_name.return_value.return_value.call_count == 1
+
+    def test_does_not_drop_repeatable_events(self, a, worker_func):
+        assignment_id = a.participant().assignment_id
+
+        with mock.patch(self.dispatcher + ".for_name") as for_name:
+            worker_func("AssignmentAbandoned", assignment_id, None)
+            worker_func("AssignmentAbandoned", assignment_id, None)
+            assert for_name.return_value.return_value.call_count == 2
+
+    def test_releases_claim_if_processing_fails(self, a, worker_func):
+        assignment_id = a.participant().assignment_id
+
+        with mock.patch(self.dispatcher + ".for_name") as for_name:
+            runner = for_name.return_value.return_value
+            runner.side_effect = Exception("boom!")
+            with pytest.raises(Exception):
+                worker_func("AssignmentSubmitted", assignment_id, None)
+            runner.side_effect = None
+            worker_func("AssignmentSubmitted", assignment_id, None)
+            assert runner.call_count == 2
+
     def test_uses_assignment_id(self, a, worker_func):
         participant = a.participant()
 
@@ -1504,6 +1610,60 @@ class TestWorkerFunctionIntegration(object):
         assert event.details["test"] is True
 
 
+class TestTrackingEventsFunction(object):
+    def test_inserts_all_events_for_node(self, a, db_session):
+        from dallinger.information import TrackingEvent
+        from dallinger.experiment_server.worker_events import tracking_events_function
+
+        node = a.node()
+        node_id, network_id = node.id, node.network_id
+        tracking_events_function(node_id, [{"n": 1}, {"n": 2}, None])
+
+        events = db_session.query(TrackingEvent).order_by(TrackingEvent.id).all()
+        assert [e.details for e in events] == [{"n": 1}, {"n": 2}, {}]
+        assert all(e.origin_id == node_id for e in events)
+        assert all(e.network_id == network_id for e in events)
+        assert all(e.type == "tracking" for e in events)
+
+    def test_ignores_missing_node(self, db_session):
+        from dallinger.information import TrackingEvent
+        from dallinger.experiment_server.worker_events import tracking_events_function
+
+        tracking_events_function(999, [{"n": 1}])
+        assert db_session.query(TrackingEvent).count() == 0
+
+    def test_orders_events_by_client_time(self, a, db_session):
+        from dallinger.information import TrackingEvent
+        from dallinger.experiment_server.worker_events import tracking_events_function
+
+        node = a.node()
+        events = [{"n": 1, "client_time": 1000}, {"n": 2, "client_time": 3500}]
+        tracking_events_function(node.id, events, sent_time=5000)
+
+        first, second = db_session.query(TrackingEvent).order_by(TrackingEvent.id)
+        delay = second.creation_time - first.creation_time
+        assert delay.total_seconds() == 2.5
+        assert second.details["client_time"] == 3500
+
+    @pytest.mark.parametrize(
+        "client_time, sent_time",
+        [
+            (float("nan"), 5000),
+            (1000, float("nan")),
+            (float("-inf"), 5000),
+            (1000, float("inf")),
+            (-1e20, 5000),
+            (1000, 1e20),
+        ],
+    )
+    def test_dates_unusable_client_times_on_arrival(self, client_time, sent_time):
+        from dallinger.experiment_server.worker_events import _tracking_event_time
+
+        now = datetime(2000, 1, 1)
+        details = {"client_time": client_time}
+        assert _tracking_event_time(now, details, sent_time) == now
+
+
 class TestWorkerEvents(object):
     def test_dispatch(self):
         from dallinger.experiment_server.worker_events import WorkerEvent
@@ -69,7 +69,38 @@ class TestHerokuClockTasks(object):
     @pytest.fixture
     def recruiters(self):
         with mock.patch("dallinger.heroku.clock.recruiters") as mock_recruiters:
-            yield mock_recruiters
+            with mock.patch.dict("dallinger.heroku.clock._recruiters", clear=True):
+                yield mock_recruiters
+
+    @pytest.fixture(autouse=True)
+    def leases(self):
+        from dallinger.db import redis_conn
+        from dallinger.heroku.clock import LEASE_PREFIX
+
+        def clear():
+            keys = list(redis_conn.scan_iter(LEASE_PREFIX + "*"))
+            if keys:
+                redis_conn.delete(*keys)
+
+        clear()
+        yield
+        clear()
+
+    @pytest.fixture
+    def experiment_class(self):
+        from dallinger.experiment import Experiment
+        from dallinger.experiment import scheduled_task
+
+        class ScheduledExperiment(Experiment):
+            @scheduled_task(minutes=10, queue="low")
+            def summarize(self):
+                pass
+
+            @scheduled_task(minutes=1)
+            def clean_up(self):
+                pass
+
+        return ScheduledExperiment
 
     def test_check_db_for_missing_notifications_assembles_resources(self, run_check):
         # Can't import until after config is loaded:
@@ -80,6 +111,59 @@ class TestHerokuClockTasks(object):
 
             check.assert_called()
 
+    def test_check_db_for_missing_notifications_runs_once_per_lease(self, run_check):
+        from dallinger.heroku.clock import check_db_for_missing_notifications
+
+        with mock.patch("dallinger.heroku.clock.run_check") as check:
+            check_db_for_missing_notifications()
+            check_db_for_missing_notifications()
+
+            check.assert_called_once()
+
+    def test_experiment_lists_scheduled_tasks(self, experiment_class):
+        assert experiment_class.scheduled_tasks() == {
+            "clean_up": {"minutes": 1, "queue": None},
+            "summarize": {"minutes": 10, "queue": "low"},
+        }
+
+    def test_register_experiment_tasks_adds_jobs(self, experiment_class):
+        from dallinger.heroku.clock import register_experiment_tasks
+        from dallinger.heroku.clock import run_experiment_task
+        from dallinger.heroku.clock import scheduler
+
+        register_experiment_tasks(experiment_class)
+        try:
+            job = scheduler.get_job("task:summarize")
+            assert job.func is run_experiment_task
+            assert job.args == ("summarize", 10, "low")
+            assert scheduler.get_job("task:clean_up").args == ("clean_up", 1, None)
+        finally:
+            scheduler.remove_job("task:summarize")
+            scheduler.remove_job("task:clean_up")
+
+    def test_run_experiment_task_enqueues_heavy_tasks_once(self):
+        from dallinger.heroku.clock import run_experiment_task
+        from dallinger.heroku.clock import run_scheduled_task
+
+        with mock.patch("dallinger.heroku.clock.Queue") as Queue:
+            run_experiment_task("summarize", 10, "low")
+            run_experiment_task("summarize", 10, "low")
+
+        assert Queue.call_args[0] == ("low",)
+        Queue.return_value.enqueue.assert_called_once_with(
+            run_scheduled_task, "summarize"
+        )
+
+    def test_run_experiment_task_runs_inline_without_queue(self):
+        from dallinger.heroku.clock import run_experiment_task
+
+        with mock.patch(
+            "dallinger.experiment_server.worker_events._loaded_experiment"
+        ) as loaded:
+            run_experiment_task("clean_up", 1)
+
+        loaded.return_value.clean_up.assert_called_once_with()
+
     def test_does_nothing_if_assignment_still_current(
         self, a, active_config, run_check, recruiters
     ):
@@ -102,6 +186,43 @@ class TestHerokuClockTasks(object):
 
         recruiters.by_name.assert_called_once_with(participants[0].recruiter_id)
 
+    def test_reuses_recruiters_across_checks(
+        self, a, active_config, run_check, recruiters
+    ):
+        participants = [a.participant()]
+        five_minutes_over = 60 * active_config.get("duration") + 5
+        reference_time = datetime.datetime.now() + datetime.timedelta(
+            minutes=five_minutes_over
+        )
+
+        run_check(participants, active_config, reference_time)
+        run_check(participants, active_config, reference_time)
+
+        recruiters.by_name.assert_called_once_with(participants[0].recruiter_id)
+        recruiter = recruiters.by_name.return_value
+        assert recruiter.notify_duration_exceeded.call_count == 2
+
+    def test_overdue_participants_filters_in_database(self, a, db_session):
+        from dallinger.heroku.clock import overdue_participants
+
+        config = get_config()
+        now = datetime.datetime.now()
+        late = a.participant(worker_id="late")
+        late.creation_time = now - datetime.timedelta(
+            hours=config.get("duration"), minutes=3
+        )
+        within_grace = a.participant(worker_id="within_grace")
+        within_grace.creation_time = now - datetime.timedelta(
+            hours=config.get("duration"), minutes=1
+        )
+        submitted = a.participant(worker_id="submitted")
+        submitted.status = "submitted"
+        submitted.creation_time = late.creation_time
+        a.participant(worker_id="current")
+        db_session.commit()
+
+        assert overdue_participants(config, now) == [late]
+
 
 class TestHerokuUtilFunctions(object):
     @pytest.fixture
@@ -653,3 +774,56 @@ class TestHerokuInfo(object):
                 "web_url": "https://dlgr-my-uid.herokuapp.com",
             }
         ]
+
+
+class TestWorkerMetrics(object):
+    @pytest.fixture
+    def metrics(self):
+        from dallinger.db import redis_conn
+        from dallinger.heroku import worker_metrics
+
+        def clear():
+            keys = list(redis_conn.scan_iter(worker_metrics.METRICS_PREFIX + "*"))
+            if keys:
+                redis_conn.delete(*keys)
+
+        clear()
+        yield worker_metrics
+        clear()
+
+    def test_percentile(self, metrics):
+        values = list(range(1, 101))
+        assert metrics.percentile(values, 50) == 50
+        assert metrics.percentile(values, 99) == 99
+        assert metrics.percentile([], 50) is None
+
+    def test_summary_includes_recorded_jobs(self, metrics):
+        from dallinger.db import redis_conn
+
+        metrics.record_job(redis_conn, "test", 0.5, 2.0)
+        metrics.record_job(redis_conn, "test", 1.5, 1.0)
+        stats = metrics.summary(redis_conn)["queues"]["test"]
+        assert stats["jobs"] == 2
+        assert stats["depth"] == 0
+        assert stats["wait"]["p50"] == 0.5
+        assert stats["wait"]["max"] == 1.5
+        assert stats["run"]["p99"] == 2.0
+
+    def test_pool_grows_while_jobs_back_up(self, metrics):
+        size = metrics.target_pool_size(10, 5, 40, depth=20, busy=10, run_times=[])
+        assert size == 15
+
+    def test_pool_growth_is_bounded(self, metrics):
+        size = metrics.target_pool_size(38, 5, 40, depth=20, busy=38, run_times=[])
+        assert size == 40
+
+    def test_pool_shrinks_when_jobs_slow_down(self, metrics):
+        run_times = [0.1] * 100 + [1.0] * 20
+        size = metrics.target_pool_size(20, 5, 40, depth=20, busy=20, run_times=run_times)
+        assert size == 15
+
+    def test_pool_shrinks_when_idle(self, metrics):
+        size = metrics.target_pool_size(10, 5, 40, depth=0, busy=1, run_times=[])
+        assert size == 9
+        size = metrics.target_pool_size(5, 5, 40, depth=0, busy=1, run_times=[])
+        assert size == 5
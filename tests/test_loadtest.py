@@ -0,0 +1,262 @@
+import mock
+import pytest
+
+from dallinger.config import get_config
+
+
+class TestRoute(object):
+    def test_keeps_route_names(self):
+        from dallinger.loadtest import route
+
+        assert (
+            route("GET", "http://localhost:5000/worker_complete?participant_id=1")
+            == "GET /worker_complete"
+        )
+
+    def test_replaces_ids(self):
+        from dallinger.loadtest import route
+
+        url = "http://localhost/participant/ABC123/HIT9/ASSIGN7/debug?hash=x"
+        assert route("POST", url) == "POST /participant/<id>/<id>/<id>/debug"
+        assert route("POST", "http://localhost/question/12") == "POST /question/<id>"
+
+
+class TestLoadTestStats(object):
+    def test_summary(self):
+        from dallinger.loadtest import LoadTestStats
+
+        stats = LoadTestStats()
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            stats.record("GET", "http://localhost/ping", seconds)
+        stats.record("GET", "http://localhost/ping", 1.0, ok=False)
+        stats.bots_completed = 2
+        stats.bots_failed = 1
+        stats.finish()
+
+        summary = stats.summary()
+        ping = summary["routes"]["GET /ping"]
+        assert ping["requests"] == 5
+        assert ping["errors"] == 1
+        assert ping["error_rate"] == 0.2
+        assert ping["p50"] == 0.3
+        assert ping["p99"] == 1.0
+        assert summary["requests"] == 5
+        assert summary["bots_completed"] == 2
+        assert summary["bots_failed"] == 1
+
+
+class TestRunLoadTest(object):
+    @pytest.fixture
+    def session(self):
+        with mock.patch("dallinger.bots.http_session") as http_session:
+            yield http_session.return_value
+
+    @pytest.fixture
+    def bot_class(self):
+        get_config().ready = True
+        from dallinger.bots import HighPerformanceBotBase
+
+        class PingBot(HighPerformanceBotBase):
+            def run_experiment(self):
+                self.request("GET", "/ping")
+
+        return PingBot
+
+    def test_runs_every_bot_and_times_requests(self, bot_class, session):
+        from dallinger.loadtest import run_load_test
+
+        stats = run_load_test(bot_class, "http://localhost:5000", 5)
+
+        summary = stats.summary()
+        assert summary["bots_completed"] == 5
+        assert summary["routes"]["GET /ping"]["requests"] == 5
+        urls = {c[0][1] for c in session.request.call_args_list}
+        assert urls == {"http://localhost:5000/ping"}
+
+    def test_counts_failed_bots(self, bot_class, session):
+        from dallinger.loadtest import run_load_test
+
+        bot_class.run_experiment = mock.Mock(side_effect=ValueError("boom!"))
+        stats = run_load_test(bot_class, "http://localhost:5000", 3)
+
+        assert stats.bots_failed == 3
+        assert stats.bots_completed == 0
+
+    def test_spaces_arrivals_at_rate(self, bot_class, session):
+        from dallinger.loadtest import run_load_test
+
+        with mock.patch("dallinger.loadtest.gevent.sleep") as sleep:
+            run_load_test(bot_class, "http://localhost:5000", 3, rate=10.0)
+
+        assert sleep.call_count == 2
+
+
+def write_export(path, tables):
+    from zipfile import ZipFile
+
+    with ZipFile(path, "w") as archive:
+        for name, rows in tables.items():
+            lines = [",".join(rows[0])] + [",".join(row) for row in rows[1:]]
+            archive.writestr("data/{}.csv".format(name), "\n".join(lines) + "\n")
+        archive.writestr("experiment_id.md", "some-id")
+    return path
+
+
+@pytest.fixture
+def export_zip(tmpdir):
+    return write_export(
+        str(tmpdir.join("some-id-data.zip")),
+        {
+            "participant": [
+                ("id", "creation_time", "end_time", "status"),
+                (
+                    "1",
+                    "2020-01-01 10:00:00.000000",
+                    "2020-01-01 10:05:00.5",
+                    "approved",
+                ),
+                ("2", "2020-01-01 10:00:30", "", "working"),
+            ],
+            "node": [
+                ("id", "creation_time", "participant_id"),
+                ("1", "2020-01-01 09:59:00", ""),
+                ("2", "2020-01-01 10:01:00", "1"),
+                ("3", "2020-01-01 10:01:30", "2"),
+            ],
+            "info": [
+                ("id", "creation_time", "origin_id", "contents", "type"),
+                ("1", "2020-01-01 09:59:00", "1", "source", "info"),
+                ("2", "2020-01-01 10:02:00", "2", "hello", "meme"),
+            ],
+            "transmission": [
+                ("id", "creation_time", "origin_id", "destination_id", "info_id"),
+                ("1", "2020-01-01 10:02:00", "2", "3", "2"),
+                ("2", "2020-01-01 10:02:10", "1", "2", "1"),
+            ],
+            "question": [
+                (
+                    "id",
+                    "creation_time",
+                    "participant_id",
+                    "question",
+                    "number",
+                    "response",
+                ),
+                ("1", "2020-01-01 10:05:00", "1", "questionnaire", "1", "{}"),
+            ],
+        },
+    )
+
+
+class TestLoadTrace(object):
+    def test_orders_each_participants_requests(self, export_zip):
+        from dallinger.loadtest import load_trace
+
+        first, second = load_trace(export_zip)
+
+        assert [(offset, action) for offset, action, data in first] == [
+            (0.0, "participant"),
+            (60.0, "node"),
+            (120.0, "info"),
+            (120.0, "transmit"),
+            (300.0, "question"),
+            (300.5, "complete"),
+        ]
+        assert [(offset, action) for offset, action, data in second] == [
+            (30.0, "participant"),
+            (90.0, "node"),
+        ]
+
+    def test_keeps_request_data(self, export_zip):
+        from dallinger.loadtest import load_trace
+
+        first, second = load_trace(export_zip)
+
+        assert first[2][2] == {
+            "node_id": "2",
+            "info_id": "2",
+            "contents": "hello",
+            "info_type": "meme",
+        }
+        assert first[3][2] == {"node_id": "2", "info_id": "2", "destination_id": "3"}
+
+    def test_empty_export(self, tmpdir):
+        from dallinger.loadtest import load_trace
+
+        path = write_export(str(tmpdir.join("empty.zip")), {})
+        assert load_trace(path) == []
+
+
+class TestTraceReplay(object):
+    @pytest.fixture
+    def server(self):
+        counter = {"participant": 0, "node": 0, "info": 0}
+
+        def respond(method, url, **kwargs):
+            response = mock.Mock()
+            for kind in ("participant", "node", "info"):
+                if "/{}/".format(kind) in url and "transmit" not in url:
+                    counter[kind] += 1
+                    response.json.return_value = {kind: {"id": 100 + counter[kind]}}
+                    break
+            return response
+
+        with mock.patch("dallinger.bots.http_session") as http_session:
+            http_session.return_value.request.side_effect = respond
+            yield http_session.return_value
+
+    def test_replays_trace_with_mapped_ids(self, export_zip, server):
+        from dallinger.loadtest import load_trace
+        from dallinger.loadtest import TraceReplay
+
+        replay = TraceReplay("http://localhost:5000", speed=1000.0)
+        stats = replay.run(load_trace(export_zip))
+
+        urls = [(c[0][0], c[0][1]) for c in server.request.call_args_list]
+        assert ("POST", "http://localhost:5000/node/101/transmit") in urls
+        complete = "http://localhost:5000/worker_complete?participant_id=101"
+        assert ("GET", complete) in urls
+        transmit = [
+            c for c in server.request.call_args_list if c[0][1].endswith("/transmit")
+        ][0]
+        assert transmit[1]["data"] == {"what": 101, "to_whom": 102}
+        info = [c for c in server.request.call_args_list if "/info/" in c[0][1]][0]
+        assert info[1]["data"] == {"contents": "hello", "info_type": "Meme"}
+        assert stats.bots_completed == 2
+        assert stats.summary()["requests"] == 8
+
+    def test_resolves_info_class_names(self):
+        from dallinger.loadtest import _class_name
+
+        assert _class_name("tracking") == "TrackingEvent"
+        assert _class_name("meme") == "Meme"
+        assert _class_name("custom_info") == "CustomInfo"
+
+    def test_requires_positive_speed(self):
+        from dallinger.loadtest import TraceReplay
+
+        with pytest.raises(ValueError):
+            TraceReplay("http://localhost:5000", speed=0)
+
+    def test_compresses_time(self, export_zip, server):
+        from dallinger.loadtest import load_trace
+        from dallinger.loadtest import TraceReplay
+
+        replay = TraceReplay("http://localhost:5000", speed=100.0)
+        with mock.patch("dallinger.loadtest.gevent.sleep") as sleep:
+            with mock.patch("dallinger.loadtest.default_timer", return_value=0.0):
+                replay.run(load_trace(export_zip))
+
+        delays = sorted(c[0][0] for c in sleep.call_args_list)
+        assert delays[-1] == pytest.approx(3.005)
+
+    def test_skips_requests_for_failed_participants(self, export_zip, server):
+        from requests.exceptions import ConnectionError
+        from dallinger.loadtest import load_trace
+        from dallinger.loadtest import replay_trace
+
+        server.request.side_effect = ConnectionError()
+        stats = replay_trace(load_trace(export_zip), "http://localhost:5000", 1e6)
+
+        assert stats.bots_failed == 2
+        assert stats.summary()["requests"] == 2
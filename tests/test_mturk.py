@@ -9,12 +9,14 @@ import time
 from botocore.exceptions import ClientError
 from hashlib import sha1
 from dallinger.mturk import DuplicateQualificationNameError
+from dallinger.mturk import MTurkActionExecutor
 from dallinger.mturk import MTurkService
 from dallinger.mturk import MTurkServiceException
 from dallinger.mturk import SNSService
 from dallinger.mturk import WorkerLacksQualification
 from dallinger.mturk import RevokedQualification
 from dallinger.mturk import QualificationNotFoundException
+from dallinger.mturk import RequestThrottled
 from dallinger.utils import generate_random_id
 from six.moves import input
 
@@ -227,6 +229,13 @@ def fake_get_assignment_response():
     }
 
 
+def throttling_error(operation="ApproveAssignment"):
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+        operation,
+    )
+
+
 def standard_hit_config(**kwargs):
     defaults = {
         "experiment_id": "some-experiment-id",
@@ -1147,6 +1156,27 @@ class TestMTurkServiceWithFakeConnection(object):
             AssignmentId="fake id"
         )
 
+    def test_grant_bonus_uses_given_request_token(self, with_mock):
+        with_mock.mturk.configure_mock(
+            **{
+                "send_bonus.return_value": response_metadata(),
+                "get_assignment.return_value": fake_get_assignment_response(),
+            }
+        )
+
+        with_mock.grant_bonus("some assignment id", 1.0, "thanks", token="abc123")
+
+        kwargs = with_mock.mturk.send_bonus.call_args[1]
+        assert kwargs["UniqueRequestToken"] == "abc123"
+
+    def test_approve_assignment_raises_if_throttled(self, with_mock):
+        with_mock.mturk.configure_mock(
+            **{"approve_assignment.side_effect": throttling_error()}
+        )
+
+        with pytest.raises(RequestThrottled):
+            with_mock.approve_assignment("fake_id")
+
     def test_approve_assignment_wraps_exception_helpfully(self, with_mock):
         fake_response = fake_get_assignment_response()
         with_mock.mturk.get_assignment = mock.Mock(return_value=fake_response)
@@ -1360,3 +1390,313 @@ class TestMTurkServiceWithFakeConnection(object):
             WorkerId="some worker id",
             Reason="some reason",
         )
+
+
+class TestMTurkServiceCache(object):
+    @pytest.fixture
+    def qtype_response(self, with_mock):
+        response = fake_qualification_type_response()
+        with_mock.mturk.list_qualification_types.return_value = {
+            "QualificationTypes": [response["QualificationType"]]
+        }
+        return response["QualificationType"]
+
+    def test_caches_qualification_types_by_name(self, with_mock, qtype_response):
+        first = with_mock.get_qualification_type_by_name("Test Qualification")
+        second = with_mock.get_qualification_type_by_name("test qualification")
+
+        assert first == second
+        with_mock.mturk.list_qualification_types.assert_called_once()
+
+    def test_does_not_cache_missing_qualification_types(self, with_mock):
+        with_mock.mturk.list_qualification_types.return_value = {
+            "QualificationTypes": []
+        }
+        with_mock.get_qualification_type_by_name("foo")
+        calls = with_mock.mturk.list_qualification_types.call_count
+        with_mock.get_qualification_type_by_name("foo")
+
+        assert with_mock.mturk.list_qualification_types.call_count > calls
+
+    def test_caches_created_qualification_types(self, with_mock):
+        with_mock.mturk.create_qualification_type.return_value = (
+            fake_qualification_type_response()
+        )
+        created = with_mock.create_qualification_type("Test Qualification", "desc")
+
+        assert with_mock.get_qualification_type_by_name("Test Qualification") == (
+            created
+        )
+        with_mock.mturk.list_qualification_types.assert_not_called()
+
+    def test_dispose_forgets_qualification_type(self, with_mock, qtype_response):
+        with_mock.mturk.delete_qualification_type.return_value = {}
+        with_mock.get_qualification_type_by_name("Test")
+        with_mock.dispose_qualification_type(qtype_response["QualificationTypeId"])
+        with_mock.get_qualification_type_by_name("Test")
+
+        assert with_mock.mturk.list_qualification_types.call_count == 2
+
+    def test_caches_qualification_scores(self, with_mock):
+        with_mock.mturk.get_qualification_score.return_value = (
+            fake_worker_qualification_response()
+        )
+
+        assert with_mock.get_qualification_score("qid", "worker") == 2
+        assert with_mock.get_qualification_score("qid", "worker") == 2
+        with_mock.mturk.get_qualification_score.assert_called_once()
+
+    def test_caches_missing_qualification_scores(self, with_mock):
+        with_mock.mturk.get_qualification_score.side_effect = ClientError(
+            {}, "blah blah ... does not exist."
+        )
+
+        for attempt in range(2):
+            with pytest.raises(WorkerLacksQualification):
+                with_mock.get_qualification_score("qid", "worker")
+        with_mock.mturk.get_qualification_score.assert_called_once()
+
+    def test_assigning_qualification_forgets_score(self, with_mock):
+        with_mock.mturk.get_qualification_score.return_value = (
+            fake_worker_qualification_response()
+        )
+        with_mock.mturk.associate_qualification_with_worker.return_value = {}
+
+        with_mock.get_qualification_score("qid", "worker")
+        with_mock.assign_qualification("qid", "worker", 3)
+        with_mock.get_qualification_score("qid", "worker")
+
+        assert with_mock.mturk.get_qualification_score.call_count == 2
+
+    def test_assigning_qualification_forgets_score_cached_meanwhile(self, with_mock):
+        with_mock.mturk.get_qualification_score.return_value = (
+            fake_worker_qualification_response()
+        )
+
+        def associate(**kwargs):
+            # Another lookup caches the old score while MTurk is updated.
+            with_mock.get_qualification_score("qid", "worker")
+            return {}
+
+        with_mock.mturk.associate_qualification_with_worker.side_effect = associate
+
+        with_mock.assign_qualification("qid", "worker", 3)
+        with_mock.get_qualification_score("qid", "worker")
+
+        assert with_mock.mturk.get_qualification_score.call_count == 2
+
+    def test_caches_workers_with_qualification(self, with_mock):
+        with_mock.mturk.list_workers_with_qualification_type.side_effect = (
+            fake_list_worker_qualification_responses()
+        )
+
+        first = list(with_mock.get_workers_with_qualification("qid"))
+        second = list(with_mock.get_workers_with_qualification("qid"))
+
+        assert first == second == [{"id": "FAKE_WORKER_ID", "score": 2}]
+        calls = with_mock.mturk.list_workers_with_qualification_type.call_count
+        assert calls == 2  # Both pages, once.
+
+    def test_revoking_qualification_forgets_workers(self, with_mock):
+        with_mock.mturk.list_workers_with_qualification_type.side_effect = (
+            fake_list_worker_qualification_responses() * 2
+        )
+        with_mock.mturk.disassociate_qualification_from_worker.return_value = {}
+
+        list(with_mock.get_workers_with_qualification("qid"))
+        with_mock.revoke_qualification("qid", "FAKE_WORKER_ID")
+        list(with_mock.get_workers_with_qualification("qid"))
+
+        calls = with_mock.mturk.list_workers_with_qualification_type.call_count
+        assert calls == 4
+
+    def test_revoking_qualification_forgets_workers_cached_meanwhile(self, with_mock):
+        with_mock.mturk.list_workers_with_qualification_type.side_effect = (
+            fake_list_worker_qualification_responses() * 2
+        )
+
+        def disassociate(**kwargs):
+            # Another lookup caches the old workers while MTurk is updated.
+            list(with_mock.get_workers_with_qualification("qid"))
+            return {}
+
+        with_mock.mturk.disassociate_qualification_from_worker.side_effect = (
+            disassociate
+        )
+
+        with_mock.revoke_qualification("qid", "FAKE_WORKER_ID")
+        list(with_mock.get_workers_with_qualification("qid"))
+
+        calls = with_mock.mturk.list_workers_with_qualification_type.call_count
+        assert calls == 4
+
+
+class TestCaches(object):
+    @pytest.fixture(params=["local", "redis"])
+    def cache(self, request):
+        from dallinger.db import redis_conn
+        from dallinger.mturk import LocalCache
+        from dallinger.mturk import RedisCache
+
+        if request.param == "local":
+            yield LocalCache()
+        else:
+            yield RedisCache(redis_conn)
+            redis_conn.delete(RedisCache.prefix + "key")
+
+    def test_set_and_get(self, cache):
+        cache.set("key", {"created": datetime.datetime(2018, 1, 1)}, 60)
+        assert cache.get("key") == {"created": datetime.datetime(2018, 1, 1)}
+
+    def test_missing_value_is_none(self, cache):
+        assert cache.get("key") is None
+
+    def test_values_expire(self, cache):
+        cache.set("key", "value", 0.01)
+        time.sleep(0.02)
+        assert cache.get("key") is None
+
+    def test_delete(self, cache):
+        cache.set("key", "value", 60)
+        cache.delete("key")
+        assert cache.get("key") is None
+
+
+class StandInMTurkClient(object):
+    """Answers approval and bonus requests like the boto3 MTurk client,
+    throttling the first ``throttle`` requests and failing those for the
+    assignments in ``failing``.
+    """
+
+    def __init__(self, throttle=0, failing=(), latency=0):
+        self.throttle = throttle
+        self.failing = failing
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _respond(self, operation, assignment_id):
+        import gevent
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        gevent.sleep(self.latency)
+        self.in_flight -= 1
+        if self.throttle:
+            self.throttle -= 1
+            raise throttling_error(operation)
+        if assignment_id in self.failing:
+            raise ClientError({}, operation)
+        self.calls.append((operation, assignment_id))
+        return response_metadata()
+
+    def approve_assignment(self, AssignmentId):
+        return self._respond("ApproveAssignment", AssignmentId)
+
+    def send_bonus(self, AssignmentId, **kwargs):
+        return self._respond("SendBonus", AssignmentId)
+
+    def get_assignment(self, AssignmentId):
+        return fake_get_assignment_response()
+
+
+class TestMTurkActionExecutor(object):
+    @pytest.fixture
+    def client(self):
+        return StandInMTurkClient()
+
+    @pytest.fixture
+    def executor(self, client):
+        service = MTurkService("fake key", "fake secret", "us-east-1")
+        service.mturk = client
+        return MTurkActionExecutor(service, concurrency=2, rate=None, backoff=0)
+
+    def actions(self, *assignment_ids):
+        actions = []
+        for assignment_id in assignment_ids:
+            actions.append({"action": "approve", "assignment_id": assignment_id})
+            actions.append(
+                {
+                    "action": "bonus",
+                    "assignment_id": assignment_id,
+                    "amount": 1.5,
+                    "reason": "Well done!",
+                }
+            )
+        return actions
+
+    def test_dispatches_every_action(self, executor, client):
+        results = executor.run(self.actions("A1", "A2", "A3"))
+
+        assert [error for action, error in results] == [None] * 6
+        assert sorted(client.calls) == [
+            ("ApproveAssignment", "A1"),
+            ("ApproveAssignment", "A2"),
+            ("ApproveAssignment", "A3"),
+            ("SendBonus", "A1"),
+            ("SendBonus", "A2"),
+            ("SendBonus", "A3"),
+        ]
+
+    def test_approves_before_paying_bonus(self, executor, client):
+        executor.run(self.actions("A1", "A2"))
+
+        for assignment_id in ("A1", "A2"):
+            calls = [c for c in client.calls if c[1] == assignment_id]
+            assert calls == [
+                ("ApproveAssignment", assignment_id),
+                ("SendBonus", assignment_id),
+            ]
+
+    def test_bounds_concurrency(self, executor, client):
+        client.latency = 0.01
+        executor.run(self.actions("A1", "A2", "A3", "A4", "A5"))
+
+        assert client.max_in_flight == 2
+
+    def test_limits_request_rate(self, executor):
+        executor.rate = 100.0
+        start = time.time()
+        executor.run(self.actions("A1", "A2", "A3"))
+
+        assert time.time() - start >= 0.05
+
+    def test_retries_throttled_requests(self, executor, client):
+        client.throttle = 3
+        results = executor.run(self.actions("A1"))
+
+        assert [error for action, error in results] == [None, None]
+        assert len(client.calls) == 2
+
+    def test_gives_up_if_throttling_persists(self, executor, client):
+        client.throttle = 100
+        results = executor.run(self.actions("A1")[:1])
+
+        assert results[0][1] == "Still throttled after 5 attempts"
+        assert client.calls == []
+
+    def test_reports_failures_and_skips_later_actions(self, executor, client):
+        client.failing = ("A2",)
+        results = executor.run(self.actions("A1", "A2"))
+
+        errors = [error for action, error in results]
+        assert errors[:2] == [None, None]
+        assert "Failed to approve assignment A2" in errors[2]
+        assert errors[3].startswith("Skipped after an earlier action failed")
+        assert ("SendBonus", "A2") not in client.calls
+
+    def test_reports_unexpected_errors_and_carries_on(self, executor):
+        from botocore.exceptions import EndpointConnectionError
+
+        def call(action):
+            if action["assignment_id"] == "A1":
+                raise EndpointConnectionError(endpoint_url="https://mturk")
+
+        with mock.patch.object(executor, "_call", side_effect=call):
+            results = executor.run(self.actions("A1", "A2"))
+
+        errors = [error for action, error in results]
+        assert "https://mturk" in errors[0]
+        assert errors[1].startswith("Skipped after an earlier action failed")
+        assert errors[2:] == [None, None]
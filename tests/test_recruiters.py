@@ -6,6 +6,16 @@ from dallinger.models import Participant
 from dallinger.experiment import Experiment
 
 
+class StubBot(object):
+    """A bot that can be pickled into a real rq job."""
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+
+    def run_experiment(self):
+        pass
+
+
 class TestModuleFunctions(object):
     @pytest.fixture
     def mod(self):
@@ -242,7 +252,7 @@ class TestSimulatedRecruiter(object):
 
 class TestBotRecruiter(object):
     @pytest.fixture
-    def recruiter(self):
+    def recruiter(self, active_config):
         from dallinger.recruiters import BotRecruiter
 
         with mock.patch.multiple(
@@ -251,6 +261,7 @@ class TestBotRecruiter(object):
             mocks["get_base_url"].return_value = "fake_base_url"
             r = BotRecruiter()
             r._get_bot_factory = mock.Mock()
+            r._get_bot_factory.return_value.__name__ = "MockBot"
             yield r
 
     def test_recruit_returns_list(self, recruiter):
@@ -271,7 +282,55 @@ class TestBotRecruiter(object):
 
     def test_open_recruitment_describes_how_it_works(self, recruiter):
         result = recruiter.open_recruitment()
-        assert "recruitment started using Mock" in result["message"]
+        assert "recruitment started using MockBot" in result["message"]
+
+    def test_open_recruitment_does_not_build_extra_bots(self, recruiter):
+        recruiter.open_recruitment(n=2)
+        assert recruiter._get_bot_factory.return_value.call_count == 2
+
+    @pytest.fixture
+    def queue(self, recruiter):
+        from rq import Queue
+        from dallinger.db import redis_conn
+        from dallinger.recruiters import _get_queue
+
+        queue = Queue("test_bot_recruiter", connection=redis_conn)
+        queue.empty()
+        _get_queue.return_value = queue
+        recruiter._get_bot_factory.return_value = StubBot
+        yield queue
+        queue.empty()
+
+    def test_recruit_enqueues_jobs_in_one_pipeline(self, recruiter, queue):
+        with mock.patch.object(
+            queue.connection, "pipeline", wraps=queue.connection.pipeline
+        ) as pipeline:
+            recruiter.recruit(n=3)
+
+        pipeline.assert_called_once_with()
+        jobs = queue.jobs
+        assert len(jobs) == 3
+        for job in jobs:
+            assert job.func_name == "run_experiment"
+            assert isinstance(job.instance, StubBot)
+            assert job.args == ()
+            assert job.timeout == 3600
+
+    def test_recruit_packs_several_bots_per_job(self, recruiter, queue, active_config):
+        active_config.extend({"bots_per_job": 2})
+
+        urls = recruiter.recruit(n=5)
+
+        assert len(urls) == 5
+        jobs = queue.jobs
+        assert [job.func_name for job in jobs] == [
+            "dallinger.bots.run_bots",
+            "dallinger.bots.run_bots",
+            "run_experiment",
+        ]
+        assert [len(job.args[0]) for job in jobs[:2]] == [2, 2]
+        assert [bot.url for bot in jobs[0].args[0]] == urls[:2]
+        assert jobs[2].instance.url == urls[4]
 
     def test_close_recruitment(self, recruiter):
         recruiter.close_recruitment()
@@ -441,6 +500,7 @@ class TestMTurkRecruiter(object):
 
     @pytest.fixture
     def recruiter(self, active_config, messenger):
+        from dallinger.mturk import LocalCache
         from dallinger.mturk import MTurkService
         from dallinger.recruiters import MTurkRecruiter
 
@@ -453,6 +513,7 @@ class TestMTurkRecruiter(object):
             active_config.extend({"mode": u"sandbox"})
             r = MTurkRecruiter()
             r.messenger = messenger
+            r.cache = LocalCache()
             r.mturkservice = mockservice("fake key", "fake secret", "fake_region")
             r.mturkservice.check_credentials.return_value = True
             r.mturkservice.create_hit.return_value = {"type_id": "fake type id"}
@@ -615,6 +676,19 @@ class TestMTurkRecruiter(object):
     def test_current_hit_id_with_no_active_experiment(self, recruiter):
         assert recruiter.current_hit_id() is None
 
+    def test_current_hit_id_is_cached(self, a, recruiter):
+        a.participant(recruiter_id="mturk", hit_id="the hit!")
+        assert recruiter.current_hit_id() == "the hit!"
+
+        with mock.patch("dallinger.recruiters.Participant") as participant:
+            assert recruiter.current_hit_id() == "the hit!"
+        participant.query.with_entities.assert_not_called()
+
+    def test_open_recruitment_forgets_cached_hit_id(self, recruiter):
+        recruiter.cache.set(recruiter._hit_id_key, "old hit", 60)
+        recruiter.open_recruitment(n=1)
+        assert recruiter.cache.get(recruiter._hit_id_key) is None
+
     def test_recruit_auto_recruit_on_recruits_for_current_hit(self, recruiter):
         fake_hit_id = "fake HIT id"
         recruiter.current_hit_id = mock.Mock(return_value=fake_hit_id)
@@ -684,6 +758,126 @@ class TestMTurkRecruiter(object):
 
         mock_logger.exception.assert_called_once_with("Boom!")
 
+    @pytest.fixture
+    def batched(self, active_config):
+        from dallinger.db import redis_conn
+        from dallinger.recruiters import MTURK_ACTIONS_KEY
+        from dallinger.recruiters import MTURK_DISPATCH_KEY
+        from dallinger.recruiters import MTURK_FAILED_ACTIONS_KEY
+
+        keys = (MTURK_ACTIONS_KEY, MTURK_DISPATCH_KEY, MTURK_FAILED_ACTIONS_KEY)
+        active_config.extend({"mturk_action_concurrency": 4})
+        redis_conn.delete(*keys)
+        yield redis_conn
+        redis_conn.delete(*keys)
+
+    def test_approve_hit_queues_action_if_batched(self, recruiter, batched, queue):
+        from dallinger.recruiters import dispatch_mturk_actions
+        from dallinger.recruiters import MTURK_ACTIONS_KEY
+
+        assert recruiter.approve_hit("fake assignment id")
+
+        recruiter.mturkservice.approve_assignment.assert_not_called()
+        queued = [json.loads(a) for a in batched.lrange(MTURK_ACTIONS_KEY, 0, -1)]
+        assert queued == [{"action": "approve", "assignment_id": "fake assignment id"}]
+        queue.enqueue.assert_called_once_with(
+            dispatch_mturk_actions, job_timeout=mock.ANY
+        )
+
+    def test_queued_actions_share_dispatch_job(self, recruiter, batched, queue):
+        recruiter.approve_hit("fake assignment id")
+        recruiter.reward_bonus("fake assignment id", 2.99, "well done!")
+
+        assert batched.llen("dallinger:mturk_actions") == 2
+        queue.enqueue.assert_called_once()
+
+    def test_dispatch_actions_records_outcomes(self, a, recruiter, batched, queue):
+        from dallinger.mturk import MTurkServiceException
+        from dallinger.recruiters import MTURK_DISPATCH_KEY
+
+        paid = a.participant(assignment_id="paid")
+        unpaid = a.participant(assignment_id="unpaid")
+        recruiter.approve_hit("paid")
+        recruiter.reward_bonus("paid", 2.99, "well done!")
+        recruiter.reward_bonus("unpaid", 2.99, "well done!")
+        recruiter.mturkservice.grant_bonus.side_effect = [
+            True,
+            MTurkServiceException("Boom!"),
+        ]
+
+        recruiter.dispatch_actions()
+
+        assert paid.details["mturk_actions"] == {
+            "approve": {"ok": True, "error": None},
+            "bonus": {"ok": True, "error": None},
+        }
+        assert unpaid.details["mturk_actions"] == {
+            "bonus": {"ok": False, "error": "Boom!"}
+        }
+        assert not batched.exists(MTURK_DISPATCH_KEY)
+
+    def test_dispatch_actions_puts_batch_back_if_executor_fails(
+        self, recruiter, batched, queue
+    ):
+        from dallinger.recruiters import MTURK_ACTIONS_KEY
+
+        recruiter.approve_hit("first")
+        recruiter.approve_hit("second")
+
+        with mock.patch("dallinger.recruiters.MTurkActionExecutor") as executor:
+            executor.return_value.run.side_effect = RuntimeError("Boom!")
+            with pytest.raises(RuntimeError):
+                recruiter.dispatch_actions()
+
+        queued = [json.loads(a) for a in batched.lrange(MTURK_ACTIONS_KEY, 0, -1)]
+        assert [a["assignment_id"] for a in queued] == ["first", "second"]
+        assert [a["attempts"] for a in queued] == [1, 1]
+
+    def test_dispatch_actions_parks_batch_after_repeated_failures(
+        self, recruiter, batched, queue
+    ):
+        from dallinger.recruiters import MTURK_ACTIONS_KEY
+        from dallinger.recruiters import MTURK_DISPATCH_ATTEMPTS
+        from dallinger.recruiters import MTURK_DISPATCH_KEY
+        from dallinger.recruiters import MTURK_FAILED_ACTIONS_KEY
+
+        recruiter.approve_hit("first")
+        queue.reset_mock()
+
+        with mock.patch("dallinger.recruiters.MTurkActionExecutor") as executor:
+            executor.return_value.run.side_effect = RuntimeError("Boom!")
+            for attempt in range(MTURK_DISPATCH_ATTEMPTS):
+                with pytest.raises(RuntimeError):
+                    recruiter.dispatch_actions()
+
+        assert executor.return_value.run.call_count == MTURK_DISPATCH_ATTEMPTS
+        assert queue.enqueue.call_count == MTURK_DISPATCH_ATTEMPTS - 1
+        assert not batched.llen(MTURK_ACTIONS_KEY)
+        assert not batched.exists(MTURK_DISPATCH_KEY)
+        parked = json.loads(batched.lindex(MTURK_FAILED_ACTIONS_KEY, 0))
+        assert parked["assignment_id"] == "first"
+        assert parked["attempts"] == MTURK_DISPATCH_ATTEMPTS
+
+    def test_dispatch_actions_requeues_if_more_are_waiting(
+        self, recruiter, batched, queue
+    ):
+        from dallinger.recruiters import dispatch_mturk_actions
+        from dallinger.recruiters import MTURK_ACTION_BATCH_SIZE
+
+        for i in range(MTURK_ACTION_BATCH_SIZE + 1):
+            recruiter.approve_hit("assignment {}".format(i))
+        queue.reset_mock()
+
+        recruiter.dispatch_actions()
+
+        assert recruiter.mturkservice.approve_assignment.call_count == (
+            MTURK_ACTION_BATCH_SIZE
+        )
+        assert batched.llen("dallinger:mturk_actions") == 1
+        queue.enqueue.assert_called_once_with(
+            dispatch_mturk_actions, job_timeout=mock.ANY
+        )
+
     @pytest.mark.xfail
     def test_close_recruitment(self, recruiter):
         fake_hit_id = "fake HIT id"
@@ -847,13 +1041,65 @@ class TestRedisTally(object):
     def redis_tally(self):
         from dallinger.recruiters import RedisTally
 
-        return RedisTally()
+        tally = RedisTally()
+        tally.reset()
+        yield tally
+        tally.reset()
 
     def test_that_its_a_counter(self, redis_tally):
         assert redis_tally.current == 0
         redis_tally.increment(3)
         assert redis_tally.current == 3
 
+    def test_new_tallies_share_the_count(self, redis_tally):
+        from dallinger.recruiters import RedisTally
+
+        redis_tally.increment(3)
+        assert RedisTally().current == 3
+
+    def test_reserve_draws_on_pool_first(self, redis_tally):
+        redis_tally.reset(8)
+
+        assert redis_tally.reserve(1, pool_size=10) == 0
+        assert redis_tally.reserve(3, pool_size=10) == 2
+        assert redis_tally.reserve(2, pool_size=10) == 2
+        assert redis_tally.current == 14
+
+    def test_concurrent_reservations_buy_exactly_what_the_pool_lacks(
+        self, redis_tally
+    ):
+        import threading
+
+        needed = []
+
+        def reserve():
+            for _ in range(10):
+                needed.append(redis_tally.reserve(1, pool_size=25))
+
+        threads = [threading.Thread(target=reserve) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(needed) == 25
+        assert redis_tally.current == 50
+
+    def test_stats(self, redis_tally):
+        redis_tally.reserve(3, pool_size=2)
+        redis_tally.commit(1)
+        redis_tally.reserve(1, pool_size=2)
+        redis_tally.commit(1, purchased=False)
+
+        assert redis_tally.stats() == {
+            "recruited": 4,
+            "reservations": 2,
+            "from_pool": 2,
+            "to_purchase": 2,
+            "purchased": 1,
+            "purchase_failed": 1,
+        }
+
 
 @pytest.mark.usefixtures("active_config")
 class TestMTurkLargeRecruiter(object):
@@ -863,10 +1109,23 @@ class TestMTurkLargeRecruiter(object):
         class PrimitiveCounter(object):
 
             _count = 0
+            purchased = 0
+
+            def reset(self, count=0):
+                self._count = count
 
             def increment(self, count):
                 self._count += count
 
+            def reserve(self, count, pool_size):
+                needed = max(0, count - max(0, pool_size - self._count))
+                self._count += count
+                return needed
+
+            def commit(self, count, purchased=True):
+                if purchased:
+                    self.purchased += count
+
             @property
             def current(self):
                 return self._count
@@ -981,6 +1240,21 @@ class TestMTurkLargeRecruiter(object):
 
         assert not recruiter.mturkservice.extend_hit.called
 
+    def test_recruit_commits_purchased_assignments(self, recruiter, counter):
+        recruiter.open_recruitment(n=recruiter.pool_size)
+        recruiter.recruit(n=2)
+
+        assert counter.purchased == 2
+
+    def test_recruit_does_not_commit_failed_purchase(self, recruiter, counter):
+        from dallinger.mturk import MTurkServiceException
+
+        recruiter.mturkservice.extend_hit.side_effect = MTurkServiceException("Boom!")
+        recruiter.open_recruitment(n=recruiter.pool_size)
+        recruiter.recruit(n=2)
+
+        assert counter.purchased == 0
+
 
 @pytest.mark.usefixtures("active_config", "db_session")
 class TestMultiRecruiter(object):
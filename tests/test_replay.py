@@ -19,6 +19,33 @@ class DummyEvents(list):
         return len(self)
 
 
+class DummySession(object):
+    def get_bind(self):
+        return None
+
+
+class DummyQuery(DummyEvents):
+    counted = 0
+    batch_size = None
+    session = DummySession()
+    streamed_with = None
+
+    def with_session(self, session):
+        self.streamed_with = session
+        return self
+
+    def count(self):
+        self.counted += 1
+        return super(DummyQuery, self).count()
+
+    def yield_per(self, batch_size):
+        self.batch_size = batch_size
+        return iter(self)
+
+    def __getitem__(self, index):
+        raise AssertionError("Events should be streamed, not indexed")
+
+
 class DummyExperiment(object):
 
     replay_path = "/replay"
@@ -107,3 +134,144 @@ class TestReplayBackend:
         for rp in replayed:
             time_diff = (rp["replay_time"] - rp["orig_time"]).total_seconds()
             assert abs(time_diff - base_offset) <= self.allowed_jitter
+
+
+class TestStreamingReplay(object):
+    def test_streams_query_once(self):
+        from dallinger.experiment_server.replay import ReplayBackend
+        from dallinger.experiment_server.replay import REPLAY_BATCH_SIZE
+
+        exp = DummyExperiment()
+        exp.replayed = []
+        exp.started = True
+        exp._events = DummyQuery(
+            [DummyEvent(datetime(2010, 1, 1, 0, 0, 0, t)) for t in range(5)]
+        )
+
+        ReplayBackend(exp)()
+
+        assert exp.finished is True
+        assert len(exp.replayed) == 5
+        assert exp._events.counted == 1
+        assert exp._events.batch_size == REPLAY_BATCH_SIZE
+        assert exp._events.streamed_with is not DummyQuery.session
+
+    def test_replays_plain_lists(self):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        exp = DummyExperiment()
+        exp.replayed = []
+        exp.started = True
+        exp._events = [DummyEvent(datetime(2010, 1, 1, 0, 0, 0, t)) for t in range(3)]
+
+        ReplayBackend(exp)()
+
+        assert exp.finished is True
+        assert len(exp.replayed) == 3
+
+    def test_finishes_without_events(self):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        exp = DummyExperiment()
+        exp.replayed = []
+        exp.started = True
+        exp._events = DummyQuery()
+
+        ReplayBackend(exp)()
+
+        assert exp.finished is True
+        assert exp.replayed == []
+
+    def test_stream_events_survives_commits(self, a, db_session):
+        from dallinger.experiment_server.replay import stream_events
+        from dallinger.models import Info
+
+        ids = [a.info().id for _ in range(3)]
+        db_session.commit()
+        query = db_session.query(Info).order_by(Info.id)
+
+        with stream_events(query, batch_size=1) as (total, events):
+            assert total == 3
+            streamed = [next(events).id]
+            # Experiments may commit while the replay is running
+            db_session.commit()
+            streamed.extend(event.id for event in events)
+
+        assert streamed == ids
+
+
+class TestPlaybackControls(object):
+    @pytest.fixture
+    def exp(self):
+        exp = DummyExperiment()
+        exp.replayed = []
+        exp.started = True
+        # 10 events one minute apart
+        exp._events = DummyEvents(
+            [DummyEvent(datetime(2010, 1, 1, 0, t, 0)) for t in range(10)]
+        )
+        return exp
+
+    def test_replays_as_fast_as_possible(self, exp):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        gevent.spawn(ReplayBackend(exp, speed=0)).join(timeout=5)
+
+        assert exp.finished is True
+        assert len(exp.replayed) == 10
+
+    def test_replays_faster_than_realtime(self, exp):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        exp._events = DummyEvents(exp._events[:2])
+        gevent.spawn(ReplayBackend(exp, speed=600)).join(timeout=5)
+
+        assert exp.finished is True
+        elapsed = exp.replayed[1]["replay_time"] - exp.replayed[0]["replay_time"]
+        assert 0.05 <= elapsed.total_seconds() < 1
+
+    def test_seek_replays_intermediate_events(self, exp):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        task = ReplayBackend(exp)
+        gevent.spawn(task)
+        gevent.sleep(0.5)
+        assert len(exp.replayed) == 1
+
+        task.send('replay:{"seek": 300}')
+        gevent.sleep(0.1)
+        assert len(exp.replayed) == 6
+        assert exp.finished is False
+
+        task.send('replay:{"speed": 0}')
+        gevent.sleep(0.1)
+        assert exp.finished is True
+
+    def test_cannot_seek_backwards(self, exp):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        task = ReplayBackend(exp, speed=0)
+        task.seek(300)
+        task.seek(60)
+
+        assert task.position() == 300
+
+    def test_ignores_invalid_controls(self, exp):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        task = ReplayBackend(exp)
+        task.send("replay:not json")
+        task.send('replay:{"speed": -1}')
+        task.send('replay:{"speed": "nan"}')
+        task.send('replay:{"speed": "inf"}')
+        task.send('replay:{"seek": "inf"}')
+
+        assert task.speed == 1.0
+        assert task.position() < 60
+
+    @pytest.mark.parametrize("speed", [-1, float("nan"), float("inf"), "fast"])
+    def test_rejects_invalid_initial_speed(self, exp, speed):
+        from dallinger.experiment_server.replay import ReplayBackend
+
+        with pytest.raises(ValueError):
+            ReplayBackend(exp, speed=speed)
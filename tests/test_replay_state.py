@@ -35,6 +35,31 @@ class TestReplayState(object):
         ) as scrubber:
             yield scrubber
 
+    def replay(self, experiment, db_session, **kwargs):
+        with experiment.restore_state_from_replay(
+            "bartlett-test",
+            session=db_session,
+            zip_path=self.bartlett_export,
+            **kwargs
+        ):
+            pass
+
+    def test_reuses_imported_dataset(self, experiment, db_session):
+        from dallinger.data import ingest_zip
+
+        self.replay(experiment, db_session)
+        with mock.patch("dallinger.experiment.ingest_zip", wraps=ingest_zip) as ingest:
+            self.replay(experiment, db_session)
+        ingest.assert_not_called()
+
+    def test_rebuild_imports_dataset_again(self, experiment, db_session):
+        from dallinger.data import ingest_zip
+
+        self.replay(experiment, db_session)
+        with mock.patch("dallinger.experiment.ingest_zip", wraps=ingest_zip) as ingest:
+            self.replay(experiment, db_session, rebuild=True)
+        assert ingest.call_count == 1
+
     def test_scrub_forwards(self, scrubber):
         target = datetime(2017, 6, 23, 12, 0, 29, 941148)
         with mock.patch(
@@ -56,3 +81,10 @@ class TestReplayState(object):
             assert replay_event.call_count == 5
             with pytest.raises(NotImplementedError):
                 scrubber(target)
+
+    @pytest.mark.parametrize("speed", [-1, float("nan"), float("inf")])
+    def test_scrubber_rejects_invalid_speed(self, experiment, speed):
+        from dallinger.experiment import Scrubber
+
+        with pytest.raises(ValueError):
+            Scrubber(experiment, session=None, speed=speed)
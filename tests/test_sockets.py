@@ -90,6 +90,40 @@ class TestChannel:
 
         client.send.assert_called_once_with("quorum:Calloo! Callay!")
 
+    def test_listen_sends_frames_to_binary_clients(self, sockets):
+        sockets.redis_conn.pubsub.return_value = pubsub = Mock()
+        pubsub.listen.return_value = [
+            {"type": "message", "channel": b"quorum", "data": b"\x82\xa1n\x01"}
+        ]
+
+        channel = sockets.Channel("custom")
+        client = sockets.BinaryClient(Mock())
+        channel.subscribe(client)
+        channel.start()
+        gevent.wait()  # wait for event loop
+
+        client.ws.send.assert_called_once_with(
+            b"\x00\x06quorum\x82\xa1n\x01", binary=True
+        )
+
+    def test_listen_skips_binary_data_for_text_clients(self, sockets):
+        sockets.redis_conn.pubsub.return_value = pubsub = Mock()
+        pubsub.listen.return_value = [
+            {"type": "message", "channel": b"quorum", "data": b"\x82\xa1n\xff"},
+            {"type": "message", "channel": b"quorum", "data": b"Calloo! Callay!"},
+        ]
+
+        channel = sockets.Channel("custom")
+        text_client = Mock()
+        binary_client = sockets.BinaryClient(Mock())
+        channel.subscribe(text_client)
+        channel.subscribe(binary_client)
+        channel.start()
+        gevent.wait()  # wait for event loop
+
+        text_client.send.assert_called_once_with("quorum:Calloo! Callay!")
+        assert binary_client.ws.send.call_count == 2
+
     def test_stop(self, channel):
         channel.start()
         channel.stop()
@@ -114,6 +148,20 @@ class TestChatBackend:
         assert client not in chat.channels["quorum"].clients
 
 
+class TestFrames:
+    def test_encode_frame(self, sockets):
+        frame = sockets.encode_frame("chat", b"\x01\x02")
+        assert frame == b"\x00\x04chat\x01\x02"
+
+    def test_decode_frame(self, sockets):
+        frame = bytearray(b"\x00\x04chat\x01\x02")
+        assert sockets.decode_frame(frame) == ("chat", b"\x01\x02")
+
+    def test_round_trip_preserves_colons_in_channel_name(self, sockets):
+        frame = sockets.encode_frame("a:b", b":")
+        assert sockets.decode_frame(frame) == ("a:b", b":")
+
+
 @pytest.mark.slow
 class TestClient:
     def test_send(self, client):
@@ -161,6 +209,16 @@ class TestChatEndpoint:
             "special", "incoming message!"
         )
 
+    def test_binary_format_publishes_raw_payload(self, sockets, mocksocket):
+        ws = mocksocket
+        ws.receive.return_value = bytearray(b"\x00\x07special\x93\x01\x02\x03")
+        sockets.request = Mock()
+        sockets.request.args = {"format": "binary"}
+        sockets.chat(ws)
+        sockets.redis_conn.publish.assert_called_once_with(
+            "special", b"\x93\x01\x02\x03"
+        )
+
     def test_sleeps_for_requested_time(self, sockets, mocksocket):
         ws = mocksocket
         ws.receive.return_value = "somechannel:incoming message!"